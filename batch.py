@@ -0,0 +1,224 @@
+"""
+Headless batch runs of the interface, without matplotlib or a display.
+
+    python batch.py JOB [--output FILE] [--workers N] [--chunk-size N] [--restart]
+
+JOB is either a csv file with one scenario per row (see modules/scenario.py, load_scenarios)
+or a json sweep specification:
+
+    {"base_file" : "ideal_inputs.csv",
+     "base" : {"lifetime" : 25},
+     "axes" : {"tilt" : {"start" : 10, "stop" : 50, "num" : 5}, "pitch" : [8, 9, 10]}}
+
+with the base scenario (an input file and/or values, missing inputs use the defaults of interface)
+and the grid of the swept inputs, as explicit values or a np.linspace range. Instead of axes,
+"scenarios" can give a list of scenarios, each a dictionary of values that override the base.
+
+Every finished chunk of points is appended to the output (output/<job>.csv by default,
+or a .parquet dataset directory) and recorded in <output>.checkpoint. Running the same job again
+resumes after the last recorded chunk, --restart starts over.
+"""
+import os
+import json
+import argparse
+import itertools
+import numpy as np
+
+# Plotting is never needed here, make sure matplotlib does not look for a display if it is imported
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import pandas as pd
+from interface import dir_path, results_table
+from modules.scenario import Scenario, load_scenarios
+from modules.sweep import run_sweep
+from modules.tableWriter import TableWriter
+from modules.resultStore import content_hash
+
+def read_job(job_file : str):
+    """
+    Description
+    -----------
+    Scenarios of a job file, see the description of batch.py
+
+    Parameters
+    ----------
+    job_file : str
+        csv list of scenarios or json sweep specification
+
+    Returns
+    -------
+    scenarios : list
+        List of Scenario, in the order of the points of the job
+
+    Raises
+    ------
+    ValueError
+        If the job file is not valid
+    """
+    if job_file.lower().endswith(".csv"):
+        return load_scenarios(job_file)
+    if not job_file.lower().endswith(".json"):
+        raise ValueError(f"Job file {job_file} not recognized. Choose a .csv scenario list or a .json sweep specification")
+
+    with open(job_file) as file:
+        job = json.load(file)
+    unknown = [key for key in job if key not in ["base_file", "base", "axes", "scenarios"]]
+    if unknown:
+        raise ValueError(f"Keys {unknown} of {job_file} not recognized. Choose from: base_file, base, axes, scenarios")
+    if "axes" in job and "scenarios" in job:
+        raise ValueError(f"{job_file} has both axes and scenarios, choose one")
+
+    base = Scenario.from_file(job["base_file"]) if "base_file" in job else Scenario()
+    base = base.replace(**job.get("base", {}))
+    if "scenarios" in job:
+        return [base.replace(**overrides) for overrides in job["scenarios"]]
+
+    axes = {}
+    for name, values in job.get("axes", {}).items():
+        axes[name] = np.linspace(values["start"], values["stop"], int(values["num"])) if isinstance(values, dict) else values
+    return [base.replace(**dict(zip(axes, combination))) for combination in itertools.product(*axes.values())]
+
+def run_chunk(indices : list, points : list):
+    """
+    Description
+    -----------
+    Evaluate a chunk of points of a job inside a worker
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The index of every point in the job, its inputs and its results (see results_table)
+    """
+    return pd.concat([pd.DataFrame({"point" : indices}), pd.DataFrame(points), results_table(points)], axis=1)
+
+def read_checkpoint(checkpoint_file : str):
+    """
+    Description
+    -----------
+    Read a checkpoint file: a first line with the hash of the job,
+    then one line per written chunk with its points and the output position after it.
+    An incomplete last line (from an interrupted run) is ignored.
+
+    Returns
+    -------
+    job : str
+        Hash of the job, None if there is no checkpoint
+    done : set
+        Indices of the finished points
+    position : int
+        Output position after the last finished chunk
+    """
+    if not os.path.exists(checkpoint_file):
+        return None, set(), 0
+    job, done, position = None, set(), 0
+    with open(checkpoint_file) as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if "job" in record:
+                job = record["job"]
+            else:
+                done.update(record["points"])
+                position = record["position"]
+    return job, done, position
+
+def run_job(job_file : str,
+            output : str = None,
+            workers : int = None,
+            chunk_size : int = 256,
+            restart : bool = False,
+            progress : bool = True):
+    """
+    Description
+    -----------
+    Evaluate all points of a job file and append the results to the output as every chunk finishes,
+    resuming an interrupted run of the same job
+
+    Parameters
+    ----------
+    job_file : str
+        csv list of scenarios or json sweep specification, see the description of batch.py
+    output : str
+        Output file, .csv or .parquet (a dataset directory, requires pyarrow), defaults to output/<job>.csv
+    workers : int
+        Number of processes, see run_sweep
+    chunk_size : int
+        Number of points evaluated in one batch and written at once
+    restart : bool
+        Discard the output and checkpoint of an earlier run
+    progress : bool
+        Show a progress bar over the chunks
+
+    Returns
+    -------
+    output : str
+        Path of the output
+
+    Raises
+    ------
+    ValueError
+        If the output belongs to a different job or exists without a checkpoint
+    """
+    scenarios = read_job(job_file)
+    job = content_hash([scenario.to_dict(measure_time=False) for scenario in scenarios])
+    if output is None:
+        output = os.path.join(dir_path, "output", os.path.splitext(os.path.basename(job_file))[0] + ".csv")
+    checkpoint_file = output + ".checkpoint"
+
+    if restart:
+        TableWriter(output).close()
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+    checkpoint_job, done, position = read_checkpoint(checkpoint_file)
+    if checkpoint_job is None and os.path.exists(output):
+        raise ValueError(f"{output} exists without a checkpoint, use --restart to overwrite it")
+    if checkpoint_job is not None and checkpoint_job != job:
+        raise ValueError(f"{output} belongs to a different job, use --restart to overwrite it or choose another output")
+
+    writer = TableWriter(output, append=True)
+    # Anything written after the last recorded chunk is from an interrupted write
+    writer.truncate(position)
+    if checkpoint_job is None:
+        with open(checkpoint_file, "w") as file:
+            file.write(json.dumps({"job" : job, "points" : len(scenarios)}) + "\n")
+    else:
+        # Drop an incomplete last line, so that the next chunk is recorded on a line of its own
+        with open(checkpoint_file, "rb+") as file:
+            file.truncate(file.read().rfind(b"\n") + 1)
+
+    pending = [i for i in range(len(scenarios)) if i not in done]
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    if done:
+        print(f"Resuming {job_file}: {len(done)} of {len(scenarios)} points done")
+
+    def record(index, df):
+        position = writer.write(df)
+        with open(checkpoint_file, "a") as file:
+            file.write(json.dumps({"points" : [int(i) for i in df["point"]], "position" : position}) + "\n")
+
+    run_sweep(run_chunk, [{"indices" : chunk, "points" : [scenarios[i].to_dict(measure_time=False) for i in chunk]}
+                          for chunk in chunks],
+              workers=workers, chunk_size=1, progress=progress, callback=record)
+    writer.close()
+    return output
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Headless batch runs of the interface, see the description of batch.py")
+    parser.add_argument("job", help="csv list of scenarios or json sweep specification")
+    parser.add_argument("-o", "--output", help="output .csv file or .parquet dataset, defaults to output/<job>.csv")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes, defaults to the number of cores")
+    parser.add_argument("-c", "--chunk-size", type=int, default=256, help="points per batch and per write")
+    parser.add_argument("--restart", action="store_true", help="discard the output and checkpoint of an earlier run")
+    parser.add_argument("--quiet", action="store_true", help="no progress bar")
+    arguments = parser.parse_args(arguments)
+    try:
+        output = run_job(arguments.job, output=arguments.output, workers=arguments.workers,
+                         chunk_size=arguments.chunk_size, restart=arguments.restart, progress=not arguments.quiet)
+    except (ValueError, ImportError, FileNotFoundError) as error:
+        parser.exit(1, f"error: {error}\n")
+    print(f"Results written to {output}")
+
+if __name__ == '__main__':
+    main()
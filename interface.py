@@ -1,18 +1,36 @@
 import pandas as pd
-from modules.energyOutput import energy_output
+from modules.energyOutput import energy_output, energy_output_batch, energy_output_tracking_batch, sites_weather, output_columns, months
 from modules.energyUsage import energy_usage
-from modules.economics import economics
-from modules.agriculture import agricultural
-from modules.utils import save_plot
+from modules.economics import economics, economics_batch
+from modules.agriculture import agricultural, agricultural_batch, compiled_requirements, crop_library_version
+from modules.utils import save_plot, plot_style
+from modules.sweep import run_sweep, SweepResult
+from modules.surrogate import surrogate_minimize
+from modules.pareto import nsga2
+from modules.sensitivity import saltelli_sample, sobol_indices, morris_sample, morris_indices
+from modules.stageCache import memoize_stage
+from modules.resultStore import enable_result_store
+from modules.tableWriter import TableWriter
+from modules.scenario import Scenario
+from modules.weather import weather_version
+from modules.profiling import get_profiler, enable_profiling
 import os as os
-import matplotlib.pyplot as plt
 import numpy as np
-from tqdm import tqdm
-import time
-import scienceplots
+import inspect
+import itertools
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 
+# Directory of the result store that keeps computed results between runs
+store_path = os.path.join(dir_path, "output", "store")
+
+# Every module is memoized on exactly the inputs it uses, so changing e.g. the lifetime
+# only reruns the economics module. See modules/stageCache.py for the disk cache.
+cached_energy_output = memoize_stage(energy_output, file_versions={"weather_file" : weather_version})
+cached_energy_usage = memoize_stage(energy_usage)
+cached_agricultural = memoize_stage(agricultural, version=crop_library_version)
+cached_economics = memoize_stage(economics)
+
 def interface(crop_type : str = "potatoes", 
               area : float  = 100000,
               latitude : float = 36,
@@ -26,8 +44,10 @@ def interface(crop_type : str = "potatoes",
               panel_area : float = 2.42,
               rated_power : float = 580,
               lifetime : float = 30,
+              weather_file : str = None,
               measure_time : bool = False,
-            #   tilt_tracking : bool = False,
+              tilt_tracking : bool = False,
+              max_angle : float = 60,
               ):
     """
     Description
@@ -61,6 +81,15 @@ def interface(crop_type : str = "potatoes",
         Area of a single panel [m^2]
     lifetime : float 
         Lifetime of the system in years
+    weather_file : str
+        Hourly weather file (TMY3, EPW or CSV) used instead of the clear-sky model, see modules/weather.py
+    tilt_tracking : bool
+        Single-axis trackers rotating around an axis in the direction of azimuth, tilt is not used
+    max_angle : float
+        Maximum rotation of the trackers [deg]
+    measure_time : bool
+        Record the time of every stage of the model. Profiling is enabled in the current process
+        if it is not enabled yet, the timings are read with modules.profiling.profile_summary()
 
     Returns
     -------
@@ -82,89 +111,287 @@ def interface(crop_type : str = "potatoes",
     See overview.svg
     """
 
-    if measure_time == True:
-        start_time = time.time()
-    df_energyOut = energy_output(latitude = latitude, 
-                                longitude  = longitude,
-                                elevation  = elevation,
-                                height  = height,
-                                azimuth  = azimuth,
-                                tilt  = tilt,
-                                row_width  = row_width,
-                                pitch  = pitch,
-                                area  = area,
-                                panel_area  = panel_area,
-                                rated_power  = rated_power,
-                                # tilt_tracking = tilt_tracking,
-                                )
-    if measure_time == True:
-        print("Energy out module")
-        print("--- %s seconds ---" % (time.time() - start_time))
-        start_time = time.time()
-        
-    df_energyUse = energy_usage()
+    # Timings per stage of the model are recorded on the active profiler, see modules/profiling.py
+    if measure_time == True and get_profiler() is None:
+        enable_profiling()
+
+    df_energyOut = cached_energy_output(latitude = latitude, 
+                                        longitude  = longitude,
+                                        elevation  = elevation,
+                                        height  = height,
+                                        azimuth  = azimuth,
+                                        tilt  = tilt,
+                                        row_width  = row_width,
+                                        pitch  = pitch,
+                                        area  = area,
+                                        panel_area  = panel_area,
+                                        rated_power  = rated_power,
+                                        weather_file = weather_file,
+                                        tilt_tracking = tilt_tracking,
+                                        max_angle = max_angle,
+                                        )
+
+    monthly_df, single_df = downstream(df_energyOut,
+                                       crop_type = crop_type,
+                                       area = area,
+                                       row_width = row_width,
+                                       pitch = pitch,
+                                       panel_area = panel_area,
+                                       lifetime = lifetime)
+
+    return monthly_df, single_df
+
+def downstream(df_energyOut : pd.DataFrame,
+               crop_type : str = "potatoes", 
+               area : float  = 100000,
+               row_width : float = 4,
+               pitch : float = 9,
+               panel_area : float = 2.42,
+               lifetime : float = 30,
+               ):
+    """
+    Description
+    -----------
+    Part of the interface after the energy output module: energy usage, agricultural and economical module.
+    Split from interface so that an energy output can be reused for several downstream parameters.
+
+    Parameters
+    ----------
+    df_energyOut : pd.DataFrame
+        Monthly output of energy_output
+    See interface for the other parameters
+
+    Returns
+    -------
+    monthly_df, single_df : pd.Dataframe
+        See interface
+    """
+    df_energyOut = df_energyOut.copy()
+    df_energyUse = cached_energy_usage()
     df_energyOut["Energy export [kWh]"] = df_energyOut["Energy output [kWh]"] - df_energyUse["Energy usage [kWh]"]
 
-    if measure_time == True:
-        print("Energy use module")
-        print("--- %s seconds ---" % (time.time() - start_time))
-        start_time = time.time()
+    df_agricultural = cached_agricultural(crop_type = crop_type, 
+                                          irradiation_crop= np.array(df_energyOut["Irradiation crops [W/m^2]"]))
 
-    df_agricultural = agricultural(crop_type = crop_type, 
-                                   irradiation_crop= np.array(df_energyOut["Irradiation crops [W/m^2]"]))
-    
-    if measure_time == True:
-        print("Agricultural module")
-        print("--- %s seconds ---" % (time.time() - start_time))
-        start_time = time.time()
-
-    df_economicsSingle = economics(area = area,
-                                   coverage = row_width/pitch,
-                                   panel_area = panel_area,
-                                   energy = df_energyOut["Energy export [kWh]"],
-                                   subsidy = 0.0,
-                                   lifetime = lifetime)
-    
-    if measure_time == True:
-        print("Economics module")
-        print("--- %s seconds ---" % (time.time() - start_time))
+    df_economicsSingle = cached_economics(area = area,
+                                          coverage = row_width/pitch,
+                                          panel_area = panel_area,
+                                          energy = df_energyOut["Energy export [kWh]"],
+                                          subsidy = 0.0,
+                                          lifetime = lifetime)
 
     monthly_df = pd.concat([df_energyOut, df_energyUse, df_agricultural], axis=1)
     single_df = pd.concat([df_economicsSingle], axis=1)
 
     return monthly_df, single_df
 
-def vary_energy_output():
-    plt.style.use(['science','ieee'])
+# Parameters of interface that are used by the energy output module, in the order of energy_output_batch
+energy_parameters = ["latitude", "longitude", "elevation", "height", "azimuth", "tilt",
+                     "row_width", "pitch", "area", "panel_area", "rated_power"]
+
+def evaluate_points(points : list, progress : bool = False, workers : int = 1, sites : dict = None, dtype = np.float64):
+    """
+    Description
+    -----------
+    Batched interface for a list of parameter sets. The energy output of all unique designs 
+    at a site is computed in one batched call, the crop impact and economics of all points as arrays.
+
+    Parameters
+    ----------
+    points : list
+        List of dictionaries with all parameters of interface (except measure_time), or of Scenario
+    progress : bool
+        Show a progress bar over the sites
+    workers : int
+        Number of processes, the points are split in one batch per process (see run_sweep)
+    sites : dict
+        {(latitude, longitude, elevation) : site} with precomputed site data (see sites_weather)
+        of the points without a weather file
+    dtype : np.dtype
+        Precision of the hourly intermediates of the energy output, np.float32 for large batches
+        (see energy_output_batch for the accuracy)
+
+    Returns
+    -------
+    monthly_data : dict
+        {column : np.array} of shape (point x month) for every monthly column of interface
+    single_data : dict
+        {column : np.array} of shape (point) for every single-time column of interface
+    """
+    points = [point.to_dict(measure_time=False) if isinstance(point, Scenario) else point for point in points]
+    if workers > 1 and len(points) > 1:
+        splits = np.array_split(np.arange(len(points)), min(workers, len(points)))
+        def chunk_sites(split):
+            # Only the precomputed sites of the points in the chunk are sent to its worker
+            if sites is None:
+                return None
+            keys = {(float(points[i]["latitude"]), float(points[i]["longitude"]), float(points[i]["elevation"])) 
+                    for i in split if points[i]["weather_file"] is None}
+            return {key : sites[key] for key in keys if key in sites}
+        results = run_sweep(evaluate_points, [{"points" : [points[i] for i in split], "dtype" : dtype, "sites" : chunk_sites(split)} 
+                                              for split in splits], 
+                            workers=workers, chunk_size=1, progress=progress)
+        return tuple({column : np.concatenate([result[j][column] for result in results]) for column in results[0][j]} 
+                     for j in range(2))
+
+    # Energy output of every unique design, one batched call per site and type of mounting.
+    # The tilt of trackers is not used, their maximum angle is
+    def energy_key(point):
+        tracking = bool(point["tilt_tracking"])
+        values = [0.0 if tracking and name == "tilt" else float(point[name]) for name in energy_parameters]
+        return ((None if point["weather_file"] is None else str(point["weather_file"]),) + tuple(values)
+                + (tracking, float(point["max_angle"]) if tracking else 0.0))
+
+    energy_keys = [energy_key(point) for point in points]
+    designs = list(dict.fromkeys(energy_keys))
+    from tqdm import tqdm
+    energy = {}
+    for group in tqdm(list(dict.fromkeys(key[:4] + key[-2:-1] for key in designs)), disable=not progress):
+        group_designs = [key for key in designs if key[:4] + key[-2:-1] == group]
+        columns = dict(zip(energy_parameters[3:], np.array([key[4:-2] for key in group_designs]).T))
+        site = None if sites is None or group[0] is not None else sites.get(group[1:4])
+        if group[-1]:
+            columns.pop("tilt")
+            monthly = energy_output_tracking_batch(latitude = group[1], 
+                                                   longitude = group[2], 
+                                                   elevation = group[3], 
+                                                   weather_file = group[0], 
+                                                   max_angle = np.array([key[-1] for key in group_designs]),
+                                                   site = site,
+                                                   dtype = dtype,
+                                                   **columns)
+        else:
+            monthly = energy_output_batch(latitude = group[1], 
+                                          longitude = group[2], 
+                                          elevation = group[3], 
+                                          weather_file = group[0], 
+                                          site = site,
+                                          dtype = dtype,
+                                          **columns)
+        energy.update(zip(group_designs, monthly))
+
+    # Energy usage and export, the same usage for every point
+    df_energyUse = cached_energy_usage()
+    monthly = np.array([energy[key] for key in energy_keys])
+    monthly_data = {column : monthly[:, :, j] for j, column in enumerate(output_columns)}
+    monthly_data["Energy export [kWh]"] = monthly_data["Energy output [kWh]"] - df_energyUse["Energy usage [kWh]"].values
+    for column in df_energyUse:
+        monthly_data[column] = np.broadcast_to(df_energyUse[column].values, monthly.shape[:2])
+
+    # Agricultural module, one vectorized call per crop type
+    crop_types = np.array([str(point["crop_type"]).lower() for point in points])
+    monthly_data["Crop impact [W/m^2]"] = np.empty(monthly.shape[:2])
+    monthly_data["Minimum crop [W/m^2]"] = np.empty(monthly.shape[:2])
+    monthly_data["Maximum crop [W/m^2]"] = np.empty(monthly.shape[:2])
+    for crop_type in np.unique(crop_types):
+        selection = crop_types == crop_type
+        min_req_Wm2, max_req_Wm2, _ = compiled_requirements(crop_type)
+        monthly_data["Crop impact [W/m^2]"][selection] = agricultural_batch(monthly_data["Irradiation crops [W/m^2]"][selection], crop_type)
+        monthly_data["Minimum crop [W/m^2]"][selection] = min_req_Wm2
+        monthly_data["Maximum crop [W/m^2]"][selection] = max_req_Wm2
+
+    # Economical module, vectorized over all points
+    single_data = economics_batch(area = [float(point["area"]) for point in points],
+                                  coverage = [float(point["row_width"]) / float(point["pitch"]) for point in points],
+                                  panel_area = [float(point["panel_area"]) for point in points],
+                                  annual_energy = monthly_data["Energy export [kWh]"].sum(axis=1),
+                                  subsidy = 0.0,
+                                  lifetime = [float(point["lifetime"]) for point in points])
+
+    return monthly_data, single_data
+
+def results_table(points : list, progress : bool = False, sites : dict = None):
+    """
+    Description
+    -----------
+    evaluate_points as a table with one row per point, e.g. to write large batches to a file
+
+    Parameters
+    ----------
+    See evaluate_points
+
+    Returns
+    -------
+    df : pd.DataFrame
+        Every monthly column of interface as '<column> <month>' and every single-time column
+    """
+    monthly_data, single_data = evaluate_points(points, progress=progress, sites=sites)
+    columns = {f"{column} {month}" : values[:, i] for column, values in monthly_data.items() for i, month in enumerate(months)}
+    columns.update(single_data)
+    return pd.DataFrame(columns)
+
+def parameter_sweep(axes : dict, base : dict = None, progress : bool = True):
+    """
+    Description
+    -----------
+    Evaluate the interface on the full grid spanned by any subset of its parameters.
+    The energy output of all unique designs at a site is computed in one batched call,
+    points that only differ in downstream parameters (crop_type, lifetime) reuse it and 
+    the crop impact and economics of all points are evaluated as arrays.
+
+    Parameters
+    ----------
+    axes : dict
+        {parameter : values} for every swept parameter of interface. 
+        values is either a list/array of explicit values or a (start, stop, num) tuple for np.linspace
+    base : dict
+        Values of the parameters that are not swept, missing parameters use the defaults of interface
+    progress : bool
+        Show a progress bar over the sites
+
+    Returns
+    -------
+    result : SweepResult
+        dims and coords of the grid (in the order of axes), 
+        monthly (grid x month) and single (grid) arrays for every column of the interface output
+
+    Raises
+    ------
+    ValueError
+        If a parameter is not an input of interface
+
+    Examples
+    --------
+    >>> result = parameter_sweep({"tilt" : (10, 50, 10), "lifetime" : [20, 30]}, base={"pitch" : 10})
+    >>> result.single["LCOE [EUR/MWh]"].shape
+    (10, 2)
+    """
+    parameters = {name : parameter.default for name, parameter in inspect.signature(interface).parameters.items() 
+                  if name != "measure_time"}
+    unknown = [name for name in list(axes) + list(base or {}) if name not in parameters]
+    if unknown:
+        raise ValueError(f"Parameters {unknown} not recognized. Choose from: {list(parameters)}")
+    parameters.update(base or {})
+
+    dims = list(axes)
+    coords = {name : np.linspace(*values) if isinstance(values, tuple) else np.atleast_1d(values) 
+              for name, values in axes.items()}
+    shape = tuple(len(coords[name]) for name in dims)
+
+    points = []
+    for combination in itertools.product(*(coords[name] for name in dims)):
+        point = dict(parameters)
+        point.update(zip(dims, combination))
+        points.append(point)
+
+    monthly_data, single_data = evaluate_points(points, progress=progress)
+
+    return SweepResult(dims = dims,
+                       coords = coords,
+                       monthly = {column : data.reshape(shape + (len(months),)) for column, data in monthly_data.items()},
+                       single = {column : data.reshape(shape) for column, data in single_data.items()})
+
+def vary_energy_output(workers=None):
+    import matplotlib.pyplot as plt
+    plot_style()
     areas = np.linspace(10,2e5, 10)
     monthly_dfs = []
     single_dfs = []
 
-    input_file = "ideal_inputs"
-    if input_file.split('.')[-1] == "csv":
-        input_file = input_file.replace(".csv", "")
+    scenario = Scenario.from_file("ideal_inputs")
+    points = [scenario.replace(area=area).to_dict() for area in areas]
 
-    input_data_path = os.path.join(dir_path, "inputs", rf"{input_file}.csv")
-    input_data = pd.read_csv(input_data_path, skipinitialspace=True, index_col=0, header=None).transpose()
-    input_data = (input_data.to_dict(orient="records"))[0]
-
-    for area in tqdm(areas):
-        monthly_df, _ = interface(crop_type      = str(input_data['crop_type']), 
-                                  area           = float(input_data['area']),
-                                  latitude       = float(input_data['latitude']),
-                                  longitude      = float(input_data['longitude']),
-                                  elevation      = float(input_data['elevation']),
-                                  height         = float(input_data['height']),
-                                  azimuth        = float(input_data['azimuth']), 
-                                  tilt           = float(input_data['tilt']), 
-                                  row_width      = float(input_data['row_width']),
-                                  pitch          = float(input_data['pitch']),
-                                  panel_area     = float(input_data['panel_area']),
-                                  rated_power    = float(input_data['rated_power']),
-                                  lifetime       = float(input_data['lifetime']),
-                                  measure_time   = str(input_data['measure_time']) == "True",
-                              )
-        monthly_df, single_df = interface(area=area)
+    for monthly_df, single_df in run_sweep(interface, points, workers=workers):
         monthly_dfs.append(monthly_df)
         single_dfs.append(single_df)
 
@@ -179,42 +406,53 @@ def vary_energy_output():
     plt.tight_layout()
     save_plot(os.path.join(dir_path, "output", rf"determine_area.svg"))
 
-def panel_placement(name="panel_placement", parameter_1 = "tilt", parameter_2 = "azimuth"):
-    plt.style.use(['science','ieee'])
+# Axis labels and default sweep ranges (start, stop, num) of panel_placement
+parameter_labels = {"tilt" : "Tilt angle [degrees]",
+                    "azimuth" : "Azimuth Angle [degrees]",
+                    "pitch" : "Pitch [m]",
+                    "height" : "Height [m]",
+                    "row_width" : "Row width [m]",
+                    "area" : "Area [m$^2$]",
+                    "lifetime" : "Lifetime [y]"}
 
-    input_file = "ideal_inputs"
-    if input_file.split('.')[-1] == "csv":
-        input_file = input_file.replace(".csv", "")
+def panel_placement(name="panel_placement", parameter_1 = "tilt", parameter_2 = "azimuth", values_1 = None, values_2 = None, N = 10):
+    """
+    Description
+    -----------
+    Heatmaps of the average energy output and crop impact for two swept interface parameters,
+    all other parameters are read from ideal_inputs.csv
+
+    Parameters
+    ----------
+    name : str
+        Name of the output figures
+    parameter_1, parameter_2 : str
+        Parameters of interface on the vertical and horizontal axis
+    values_1, values_2 : list or tuple
+        Explicit values or a (start, stop, num) range, see parameter_sweep.
+        Defaults to N values in a range depending on the parameter
+    N : int
+        Number of values for the default ranges
+    """
+    import matplotlib.pyplot as plt
+    plot_style()
+
+    scenario = Scenario.from_file("ideal_inputs")
+    base = scenario.to_dict(measure_time=False)
 
-    input_data_path = os.path.join(dir_path, "inputs", rf"{input_file}.csv")
-    input_data = pd.read_csv(input_data_path, skipinitialspace=True, index_col=0, header=None).transpose()
-    input_data = (input_data.to_dict(orient="records"))[0]
-
-    N = 10
-    energy_outputs = np.array([[0]*N]*N)
-    crop_impacts = np.array([[0]*N]*N, dtype=np.float16)
-
-    interface_lambda = lambda az, til, pit : interface(crop_type      = str(input_data['crop_type']), 
-                                                       area           = float(input_data['area']),
-                                                       latitude       = float(input_data['latitude']),
-                                                       longitude      = float(input_data['longitude']),
-                                                       elevation      = float(input_data['elevation']),
-                                                       height         = float(input_data['height']),
-                                                       azimuth        = az, 
-                                                       tilt           = til, 
-                                                       row_width      = float(input_data['row_width']),
-                                                       pitch          = pit,
-                                                       panel_area     = float(input_data['panel_area']),
-                                                       rated_power    = float(input_data['rated_power']),
-                                                       lifetime       = float(input_data['lifetime']),
-                                                       measure_time   = str(input_data['measure_time']) == "True",
-                                                       )
-
-    def extract_data(monthly_df):
-        monthly_df.loc[monthly_df["Crop impact [W/m^2]"] > 0, "Crop impact [W/m^2]"]=0
-        out = monthly_df.mean()
-        energy_outputs[t, a] = out["Energy output [kWh]"]
-        crop_impacts[t, a] = out["Crop impact [W/m^2]"]
+    min_pitch = scenario.row_width
+    default_ranges = {"tilt" : (10, 50, N),
+                      "azimuth" : (120, 240, N),
+                      "pitch" : (min_pitch+1, min_pitch + 10, N),
+                      "height" : (1, 5, N),
+                      "row_width" : (1, scenario.pitch - 1, N)}
+    values_1 = default_ranges[parameter_1] if values_1 is None else values_1
+    values_2 = default_ranges[parameter_2] if values_2 is None else values_2
+
+    result = parameter_sweep({parameter_1 : values_1, parameter_2 : values_2}, base=base)
+
+    energy_outputs = result.monthly["Energy output [kWh]"].mean(axis=-1)
+    crop_impacts = result.monthly["Crop impact [W/m^2]"].clip(max=0).mean(axis=-1)
 
     def plot_results(data, title, unit, xlabel, ylabel, xlabeldata, ylabeldata, subname):
         print("Plotting ...")
@@ -228,8 +466,8 @@ def panel_placement(name="panel_placement", parameter_1 = "tilt", parameter_2 =
         ax.set_xlabel(xlabel, fontsize=14)
         ax.set_ylabel(ylabel, fontsize=14)
 
-        ax.set_xticks(np.arange(N))
-        ax.set_yticks(np.arange(N))
+        ax.set_xticks(np.arange(len(xlabeldata)))
+        ax.set_yticks(np.arange(len(ylabeldata)))
 
         ax.set_xticklabels(np.round(xlabeldata, 1), rotation=45, ha='right')
         ax.set_yticklabels(np.round(ylabeldata, 1))
@@ -237,74 +475,457 @@ def panel_placement(name="panel_placement", parameter_1 = "tilt", parameter_2 =
         fig.tight_layout()
         save_plot(os.path.join(dir_path, "output", rf"{name}_{subname}.svg"))
 
-    if parameter_1 == "tilt" and parameter_2 == "azimuth":
-        tilts = np.linspace(10, 50, N)
-        azimuths = np.linspace(120, 240, N)
-        for t, tilt in (enumerate(tqdm(tilts))):
-            for a, azimuth in enumerate(azimuths):
-                monthly_df, _ = interface_lambda(azimuth, tilt, float(input_data['pitch']))
-                extract_data(monthly_df)
-        plot_results(energy_outputs,'Average Energy Output', "kWh", "Azimuth Angle [degrees]", "Tilt angle [degrees]", azimuths, tilts, "energy")
-        plot_results(crop_impacts, 'Average Crop Impact', "W/m$^2$", "Azimuth Angle [degrees]", "Tilt angle [degrees]", azimuths, tilts, "crop")
-        
-    if parameter_1 == "tilt" and parameter_2 == "pitch":
-        tilts = np.linspace(10, 50, N)
-
-        min_pitch = float(input_data["row_width"])
-        pitchs = np.linspace(min_pitch+1, min_pitch + 10, N)
-        for t, tilt in (enumerate(tqdm(tilts))):
-            for a, pitch in enumerate(pitchs):
-                monthly_df, _ = interface_lambda(float(input_data['azimuth']), tilt, pitch)
-                extract_data(monthly_df)
-        plot_results(energy_outputs,'Average Energy Output', "kWh", "Pitch [m]", "Tilt angle [degrees]", pitchs, tilts, "energy")
-        plot_results(crop_impacts, 'Average Crop Impact', "W/m$^2$", "Pitch [m]", "Tilt angle [degrees]", pitchs, tilts, "crop")
+    xlabel = parameter_labels.get(parameter_2, parameter_2)
+    ylabel = parameter_labels.get(parameter_1, parameter_1)
+    xdata = result.coords[parameter_2]
+    ydata = result.coords[parameter_1]
+    plot_results(energy_outputs,'Average Energy Output', "kWh", xlabel, ylabel, xdata, ydata, "energy")
+    plot_results(crop_impacts, 'Average Crop Impact', "W/m$^2$", xlabel, ylabel, xdata, ydata, "crop")
+
+# Bounds of the design parameters for optimize_design
+parameter_bounds = {"tilt" : (0, 60),
+                    "azimuth" : (90, 270),
+                    "pitch" : (2, 20),
+                    "height" : (1, 5),
+                    "row_width" : (1, 10)}
+
+# Default weights of the design objective, see design_scores
+objective_weights = {"energy" : 1.0, "LCOE" : 1.0, "crop" : 1.0}
+
+def design_scores(monthly_df : pd.DataFrame, single_df : pd.DataFrame):
+    """
+    Description
+    -----------
+    Scores of a design used by optimize_design
+
+    Parameters
+    ----------
+    monthly_df, single_df : pd.DataFrame
+        Output of interface
+
+    Returns
+    -------
+    scores : dict
+        'energy' : yearly energy export [kWh], 'LCOE' : LCOE [EUR/MWh] and 
+        'crop' : average shortage of irradiation at the crops as fraction of the minimum requirement (0-1)
+    """
+    shortage = -monthly_df["Crop impact [W/m^2]"].clip(upper=0)
+    required = monthly_df["Minimum crop [W/m^2]"]
+    return {"energy" : float(monthly_df["Energy export [kWh]"].sum()),
+            "LCOE" : float(single_df["LCOE [EUR/MWh]"].iloc[0]),
+            "crop" : float(shortage[required > 0].mean() / required[required > 0].mean()) if (required > 0).any() else 0.0}
+
+def optimize_design(parameters = ("tilt", "azimuth", "pitch"),
+                    bounds : dict = None,
+                    base : dict = None,
+                    weights : dict = None,
+                    min_gap : float = 0.5,
+                    n_calls : int = 50,
+                    seed : int = None,
+                    progress : bool = True):
+    """
+    Description
+    -----------
+    Find a good design with a surrogate model of the interface instead of a full grid.
+    Minimizes the weighted objective
+        - w_energy * energy / energy_base + w_LCOE * LCOE / LCOE_base + w_crop * crop
+    with the scores of design_scores, relative to the scores of the base design.
+
+    Parameters
+    ----------
+    parameters : list
+        Optimized parameters of interface
+    bounds : dict
+        {parameter : (lower, upper)}, overrides parameter_bounds
+    base : dict
+        Values of the other parameters, missing parameters use the defaults of interface
+    weights : dict
+        {'energy', 'LCOE', 'crop' : weight}, overrides objective_weights
+    min_gap : float
+        Minimum space between the rows, pitch - row_width [m]
+    n_calls : int
+        Number of interface evaluations, plus one for the base design
+    seed : int
+        Seed of the random generator
+    progress : bool
+        Show a progress bar
+
+    Returns
+    -------
+    best : dict
+        Parameters of the best design
+    history : pd.DataFrame
+        Every evaluated design with its scores and objective, in the order of evaluation
+
+    Raises
+    ------
+    ValueError
+        If a parameter or weight is not recognized
+
+    Examples
+    --------
+    >>> best, history = optimize_design(("tilt", "pitch"), weights={"crop" : 5})
+    """
+    bounds = dict(parameter_bounds, **(bounds or {}))
+    weights = dict(objective_weights, **(weights or {}))
+    unknown = [name for name in parameters if name not in bounds] + [name for name in weights if name not in objective_weights]
+    if unknown:
+        raise ValueError(f"Parameters or weights {unknown} not recognized. Choose from: {list(bounds)} and {list(objective_weights)}")
+
+    defaults = {name : parameter.default for name, parameter in inspect.signature(interface).parameters.items()}
+    base = dict(defaults, **(base or {}))
+    reference = design_scores(*interface(**base))
+
+    def design(x):
+        return dict(base, **dict(zip(parameters, map(float, x))))
+
+    def gap(points):
+        pitch = points[:, parameters.index("pitch")] if "pitch" in parameters else base["pitch"]
+        row_width = points[:, parameters.index("row_width")] if "row_width" in parameters else base["row_width"]
+        return pitch - row_width >= min_gap
+
+    history = []
+    def objective(x):
+        scores = design_scores(*interface(**design(x)))
+        value = (- weights["energy"] * scores["energy"] / abs(reference["energy"])
+                 + weights["LCOE"] * scores["LCOE"] / abs(reference["LCOE"])
+                 + weights["crop"] * scores["crop"])
+        history.append(dict(zip(parameters, x), **scores, objective=value))
+        return value
+
+    parameters = list(parameters)
+    surrogate_minimize(objective,
+                       bounds = [bounds[name] for name in parameters],
+                       n_calls = n_calls,
+                       constraints = [gap],
+                       seed = seed,
+                       progress = progress)
+
+    history = pd.DataFrame(history).rename(columns={"energy" : "Energy export [kWh]", 
+                                                    "LCOE" : "LCOE [EUR/MWh]",
+                                                    "crop" : "Crop shortage", 
+                                                    "objective" : "Objective"})
+    best = history.loc[history["Objective"].idxmin(), parameters].to_dict()
+    return best, history
+
+def pareto_front(name = "pareto_front",
+                 parameters = ("tilt", "pitch", "height"),
+                 bounds : dict = None,
+                 base : dict = None,
+                 min_gap : float = 0.5,
+                 population : int = 40,
+                 generations : int = 20,
+                 workers : int = 1,
+                 seed : int = None,
+                 plot : bool = True,
+                 progress : bool = True):
+    """
+    Description
+    -----------
+    Pareto front of the yearly energy output and the crop impact over the interface parameters (NSGA-II).
+    Every generation is evaluated as one batch (evaluate_points), designs that were already
+    evaluated are not evaluated again. The front is saved as output/<name>.csv and output/<name>.svg
+
+    Parameters
+    ----------
+    name : str
+        Name of the output table and figure
+    parameters : list
+        Optimized parameters of interface
+    bounds : dict
+        {parameter : (lower, upper)}, overrides parameter_bounds
+    base : dict
+        Values of the other parameters, missing parameters use the defaults of interface
+    min_gap : float
+        Minimum space between the rows, pitch - row_width [m]
+    population : int
+        Number of designs per generation
+    generations : int
+        Number of generations
+    workers : int
+        Number of processes that evaluate a generation, see run_sweep
+    seed : int
+        Seed of the random generator
+    plot : bool
+        Save the table and figure
+    progress : bool
+        Show a progress bar over the generations
+
+    Returns
+    -------
+    front : pd.DataFrame
+        Non-dominated designs, in increasing energy output
+        | parameters | Energy output [kWh] | Crop impact [W/m^2] |
+        with the yearly energy output and the average shortage of the crop impact (negative)
+
+    Raises
+    ------
+    ValueError
+        If a parameter is not recognized
+    """
+    bounds = dict(parameter_bounds, **(bounds or {}))
+    unknown = [name for name in parameters if name not in bounds]
+    if unknown:
+        raise ValueError(f"Parameters {unknown} not recognized. Choose from: {list(bounds)}")
+    parameters = list(parameters)
+
+    defaults = {name : parameter.default for name, parameter in inspect.signature(interface).parameters.items() 
+                if name != "measure_time"}
+    base = dict(defaults, **(base or {}))
+
+    def gap(points):
+        pitch = points[:, parameters.index("pitch")] if "pitch" in parameters else base["pitch"]
+        row_width = points[:, parameters.index("row_width")] if "row_width" in parameters else base["row_width"]
+        return pitch - row_width >= min_gap
+
+    def evaluate(X):
+        points = [dict(base, **dict(zip(parameters, map(float, x)))) for x in X]
+        monthly_data, _ = evaluate_points(points, workers=workers)
+        energy = monthly_data["Energy output [kWh]"].sum(axis=-1)
+        crop = monthly_data["Crop impact [W/m^2]"].clip(max=0).mean(axis=-1)
+        return np.column_stack([-energy, -crop])
+
+    result = nsga2(evaluate, 
+                   bounds = [bounds[name] for name in parameters], 
+                   population = population, 
+                   generations = generations,
+                   constraints = [gap], 
+                   seed = seed,
+                   progress = progress)
+
+    front = pd.DataFrame(result.X, columns=parameters)
+    front["Energy output [kWh]"] = -result.F[:, 0]
+    front["Crop impact [W/m^2]"] = -result.F[:, 1]
+    front = front.sort_values("Energy output [kWh]", ignore_index=True)
+
+    if plot:
+        import matplotlib.pyplot as plt
+        plot_style()
+        front.round(3).to_csv(os.path.join(dir_path, "output", f"{name}.csv"), index=False)
+
+        fig, ax = plt.subplots(figsize=(4, 3))
+        ax.scatter(-result.all_F[:, 0] / 1e6, -result.all_F[:, 1], s=2, color="lightgray", label="Evaluated designs")
+        ax.plot(front["Energy output [kWh]"] / 1e6, front["Crop impact [W/m^2]"], "-o", markersize=2, label="Pareto front")
+        ax.set_xlabel("Energy output [GWh/y]")
+        ax.set_ylabel("Average crop impact [W/m$^2$]")
+        ax.set_title("Energy output and crop impact")
+        ax.legend(fancybox=True, frameon=True)
+        fig.tight_layout()
+        save_plot(os.path.join(dir_path, "output", f"{name}.svg"))
+
+    return front
+
+# Ranges of the inputs of interface for sensitivity_analysis
+sensitivity_bounds = {"area" : (50000, 150000),
+                      "latitude" : (34, 38),
+                      "longitude" : (12, 17),
+                      "elevation" : (0, 500),
+                      "height" : (1, 5),
+                      "azimuth" : (90, 270),
+                      "tilt" : (0, 60),
+                      "row_width" : (1, 6),
+                      "pitch" : (7, 20),
+                      "panel_area" : (1.7, 2.8),
+                      "rated_power" : (400, 700),
+                      "lifetime" : (20, 40)}
+
+def sensitivity_analysis(parameters = ("area", "height", "azimuth", "tilt", "row_width", "pitch", 
+                                       "panel_area", "rated_power", "lifetime"),
+                         method : str = "sobol",
+                         N : int = 1024,
+                         bounds : dict = None,
+                         base : dict = None,
+                         workers : int = 1,
+                         n_bootstrap : int = 1000,
+                         seed : int = None):
+    """
+    Description
+    -----------
+    Global sensitivity of the LCOE, yearly energy export and crop impact to the inputs of interface.
+    The sample is evaluated in batches (evaluate_points), optionally over several processes.
+
+    Parameters
+    ----------
+    parameters : list
+        Varied inputs of interface. The location (latitude, longitude, elevation) is not varied by default, 
+        every location needs its own solar position calculation
+    method : str
+        "sobol" for first- and total-order Sobol indices (N * (len(parameters) + 2) evaluations) or 
+        "morris" for elementary effects of N trajectories (N * (len(parameters) + 1) evaluations)
+    N : int
+        Number of base samples (sobol, preferably a power of 2) or trajectories (morris)
+    bounds : dict
+        {parameter : (lower, upper)}, overrides sensitivity_bounds
+    base : dict
+        Values of the other parameters, missing parameters use the defaults of interface
+    workers : int
+        Number of processes
+    n_bootstrap : int
+        Number of bootstrap resamples of the 95% confidence intervals
+    seed : int
+        Seed of the sample and bootstrap
+
+    Returns
+    -------
+    indices : dict
+        {output : pd.DataFrame} for "LCOE [EUR/MWh]", "Energy export [kWh]" and "Crop impact [W/m^2]"
+        (average shortage, negative), indexed by parameter with the columns of sobol_indices or morris_indices
+
+    Raises
+    ------
+    ValueError
+        If a parameter or method is not recognized
+
+    Examples
+    --------
+    >>> indices = sensitivity_analysis(N=1024)
+    >>> indices["LCOE [EUR/MWh]"].sort_values("ST", ascending=False)
+    """
+    bounds = dict(sensitivity_bounds, **(bounds or {}))
+    unknown = [name for name in parameters if name not in bounds]
+    if unknown:
+        raise ValueError(f"Parameters {unknown} not recognized. Choose from: {list(bounds)}")
+    if method not in ("sobol", "morris"):
+        raise ValueError(f"Method {method} not recognized. Choose one of: sobol, morris")
+    parameters = list(parameters)
+    parameter_ranges = [bounds[name] for name in parameters]
+
+    defaults = {name : parameter.default for name, parameter in inspect.signature(interface).parameters.items() 
+                if name != "measure_time"}
+    base = dict(defaults, **(base or {}))
+
+    if method == "sobol":
+        X = saltelli_sample(parameter_ranges, N, seed=seed)
+    else:
+        X = morris_sample(parameter_ranges, N, seed=seed)
+
+    points = [dict(base, **dict(zip(parameters, map(float, x)))) for x in X]
+    monthly_data, single_data = evaluate_points(points, progress=workers > 1, workers=workers)
+    outputs = {"LCOE [EUR/MWh]" : single_data["LCOE [EUR/MWh]"],
+               "Energy export [kWh]" : monthly_data["Energy export [kWh]"].sum(axis=-1),
+               "Crop impact [W/m^2]" : monthly_data["Crop impact [W/m^2]"].clip(max=0).mean(axis=-1)}
+    Y = np.column_stack(list(outputs.values()))
+
+    if method == "sobol":
+        indices = sobol_indices(Y, len(parameters), n_bootstrap=n_bootstrap, seed=seed)
+    else:
+        indices = morris_indices(X, Y, parameter_ranges, n_bootstrap=n_bootstrap, seed=seed)
+
+    return {output : pd.DataFrame({name : value[:, j] for name, value in indices.items()}, index=parameters)
+            for j, output in enumerate(outputs)}
+
+def site_group(sites : list, base : dict = None):
+    """
+    Description
+    -----------
+    Evaluate the interface for a group of sites. The solar position and clear-sky irradiance
+    of all sites without a weather file are computed at once (sites_weather),
+    the designs of all sites in one call to evaluate_points.
+
+    Parameters
+    ----------
+    sites : list
+        One dictionary per site with at least the latitude and longitude,
+        other parameters of interface override base, other keys are copied to the result
+    base : dict
+        Values of the parameters that are not given per site, missing parameters use the defaults of interface
+
+    Returns
+    -------
+    df : pd.DataFrame
+        One row per site: the keys of the site, every monthly column of interface as
+        '<column> <month>' and every single-time column
+    """
+    defaults = {name : parameter.default for name, parameter in inspect.signature(interface).parameters.items()
+                if name != "measure_time"}
+    base = dict(defaults, **(base or {}))
+    points = [dict(base, **{name : value for name, value in site.items() if name in defaults}) for site in sites]
+
+    clearsky = [point for point in points if point["weather_file"] is None]
+    keys = list(dict.fromkeys((float(point["latitude"]), float(point["longitude"]), float(point["elevation"]))
+                              for point in clearsky))
+    weather = dict(zip(keys, sites_weather(*np.array(keys).T))) if keys else None
+    return pd.concat([pd.DataFrame(sites), results_table(points, sites=weather)], axis=1)
+
+def multi_site(sites = "sites.csv",
+               name : str = "multi_site",
+               base : dict = None,
+               group_size : int = 32,
+               workers : int = None,
+               file_format : str = "csv",
+               progress : bool = True):
+    """
+    Description
+    -----------
+    Evaluate the interface for a table of sites, e.g. a latitude/longitude grid.
+    The sites are evaluated in groups (site_group) that share the time index and the
+    time dependent solar geometry, the groups are spread over a pool of processes.
+    Every finished group is appended to output/<name>.<file_format>, so the finished sites
+    are kept when the run is interrupted.
+
+    Parameters
+    ----------
+    sites : str or pd.DataFrame
+        Table of sites, or a csv file in inputs/, with the columns latitude and longitude.
+        Columns with the name of another parameter of interface (e.g. elevation or tilt) override base,
+        other columns (e.g. a site name) are copied to the output
+    name : str
+        Name of the output file
+    base : dict
+        Values of the parameters that are not given per site, missing parameters use the defaults of interface
+    group_size : int
+        Number of sites per group
+    workers : int
+        Number of processes, see run_sweep
+    file_format : str
+        'csv' or 'parquet' (requires pyarrow)
+    progress : bool
+        Show a progress bar over the groups
+
+    Returns
+    -------
+    path : str
+        Path of the output file, with one row per site (see site_group).
+        The rows of a group are written when the group is finished, so they are not in the order of the table
+
+    Raises
+    ------
+    ValueError
+        If the file format is not recognized or the table has no latitude and longitude
+
+    Examples
+    --------
+    >>> grid = pd.DataFrame([(lat, lon) for lat in range(35, 45) for lon in range(10, 20)], columns=["latitude", "longitude"])
+    >>> df = pd.read_csv(multi_site(grid, "grid", base={"tilt" : 20}))
+    """
+    if file_format not in ["csv", "parquet"]:
+        raise ValueError(f"File format {file_format} not recognized. Choose one of: csv, parquet")
+    if isinstance(sites, str):
+        sites = pd.read_csv(os.path.join(dir_path, "inputs", sites), skipinitialspace=True)
+    if not {"latitude", "longitude"} <= set(sites.columns):
+        raise ValueError(f"The table of sites needs the columns latitude and longitude, got: {list(sites.columns)}")
+
+    records = sites.to_dict(orient="records")
+    groups = [{"sites" : records[i:i + group_size], "base" : base} for i in range(0, len(records), group_size)]
+    path = os.path.join(dir_path, "output", f"{name}.{file_format}")
+    with TableWriter(path) as writer:
+        run_sweep(site_group, groups, workers=workers, chunk_size=1, progress=progress,
+                  callback=lambda index, df: writer.write(df))
+    return path
 
 def crop_testing(name="crop_testing"):
-    plt.style.use(['science','ieee'])
+    import matplotlib.pyplot as plt
+    plot_style()
 
-    input_file = "ideal_inputs"
-    if input_file.split('.')[-1] == "csv":
-        input_file = input_file.replace(".csv", "")
+    scenario = Scenario.from_file("ideal_inputs")
 
-    input_data_path = os.path.join(dir_path, "inputs", rf"{input_file}.csv")
-    input_data = pd.read_csv(input_data_path, skipinitialspace=True, index_col=0, header=None).transpose()
-    input_data = (input_data.to_dict(orient="records"))[0]
-
-    monthly_df, _ = interface(crop_type      = str(input_data['crop_type']), 
-                              area           = float(input_data['area']),
-                              latitude       = float(input_data['latitude']),
-                              longitude      = float(input_data['longitude']),
-                              elevation      = float(input_data['elevation']),
-                              height         = float(input_data['height']),
-                              azimuth        = float(input_data['azimuth']), 
-                              tilt           = 33, 
-                              row_width      = float(input_data['row_width']),
-                              pitch          = float(input_data['pitch']),
-                              panel_area     = float(input_data['panel_area']),
-                              rated_power    = float(input_data['rated_power']),
-                              lifetime       = float(input_data['lifetime']),
-                              measure_time   = str(input_data['measure_time']) == "True",
-                              )
+    monthly_df, _ = interface(**scenario.replace(tilt=33).to_dict())
     print(monthly_df)
     fig, ax = plt.subplots(figsize=(4, 3))
 
     ax.plot(np.linspace(1,12,12), monthly_df["Irradiation crops [W/m^2]"], label="33 degree tilt")
 
-    monthly_df, _ = interface(crop_type      = str(input_data['crop_type']), 
-                              area           = float(input_data['area']),
-                              latitude       = float(input_data['latitude']),
-                              longitude      = float(input_data['longitude']),
-                              elevation      = float(input_data['elevation']),
-                              height         = float(input_data['height']),
-                              azimuth        = float(input_data['azimuth']), 
-                              tilt           = 0, 
-                              row_width      = float(input_data['row_width']),
-                              pitch          = float(input_data['pitch']),
-                              panel_area     = float(input_data['panel_area']),
-                              rated_power    = float(input_data['rated_power']),
-                              lifetime       = float(input_data['lifetime']),
-                              measure_time   = str(input_data['measure_time']) == "True",
-                              )
+    monthly_df, _ = interface(**scenario.replace(tilt=0).to_dict())
     
     ax.plot(np.linspace(1,12,12), monthly_df["Irradiation crops [W/m^2]"], label="0 degree tilt")
     
@@ -324,25 +945,9 @@ def main(input_file = "verification_inputs.csv"):
     if input_file.split('.')[-1] == "csv":
         input_file = input_file.replace(".csv", "")
 
-    input_data_path = os.path.join(dir_path, "inputs", rf"{input_file}.csv")
-    input_data = pd.read_csv(input_data_path, skipinitialspace=True, index_col=0, header=None).transpose()
-    input_data = (input_data.to_dict(orient="records"))[0]
-
-    monthly_df, single_df = interface(crop_type      = str(input_data['crop_type']), 
-                                     area           = float(input_data['area']),
-                                     latitude       = float(input_data['latitude']),
-                                     longitude      = float(input_data['longitude']),
-                                     elevation      = float(input_data['elevation']),
-                                     height         = float(input_data['height']),
-                                     azimuth        = float(input_data['azimuth']), 
-                                     tilt           = float(input_data['tilt']), 
-                                     row_width      = float(input_data['row_width']),
-                                     pitch          = float(input_data['pitch']),
-                                     panel_area     = float(input_data['panel_area']),
-                                     rated_power    = float(input_data['rated_power']),
-                                     lifetime       = float(input_data['lifetime']),
-                                     measure_time   = str(input_data['measure_time']) == "True",
-                                     )
+    scenario = Scenario.from_file(input_file)
+
+    monthly_df, single_df = interface(**scenario.to_dict())
 
     monthly_df["Crop impact [W/m^2]"][monthly_df["Crop impact [W/m^2]"] > 0]=0
     
@@ -355,9 +960,17 @@ def main(input_file = "verification_inputs.csv"):
     print(monthly_df.mean())
     print(single_df)
 
-# main("verification_inputs.csv")
-# main("ideal_inputs.csv")
-# vary_energy_output()
-# panel_placement("tilt_azimuth", "tilt", "azimuth")
-# panel_placement("tilt_pitch", "tilt", "pitch")
-crop_testing()
+if __name__ == '__main__':
+    # Reload results of earlier runs, see modules/resultStore.py
+    enable_result_store(store_path)
+
+    # main("verification_inputs.csv")
+    # main("ideal_inputs.csv")
+    # vary_energy_output()
+    # panel_placement("tilt_azimuth", "tilt", "azimuth")
+    # panel_placement("tilt_pitch", "tilt", "pitch")
+    # print(optimize_design(("tilt", "azimuth", "pitch")))
+    # pareto_front("pareto_front", ("tilt", "pitch", "height"))
+    # print(sensitivity_analysis(N=1024))
+    # multi_site("sites.csv")
+    crop_testing()
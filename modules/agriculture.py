@@ -1,11 +1,220 @@
+import os
 import pandas as pd
 import numpy as np
+from functools import lru_cache
+from modules.resultStore import content_hash
+from modules.profiling import profiled
 
 months = [
     "January", "February", "March", "April", "May", "June",
     "July", "August", "September", "October", "November", "December"
 ]
 
+# Directory with one CSV file per crop (or regional calendar of a crop), see crop_library
+crop_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "inputs", "crops")
+
+# Conversion factor: 1 μmol/m²/s = 0.217 W/m²
+conversion_factor = 0.217
+
+# Days of a leap year, the columns of the compiled crop library
+library_days = pd.date_range("2024-01-01", "2024-12-31", freq="D")
+
+def crop_library_version(directory : str = None):
+    """
+    Description
+    -----------
+    Hash of the names, sizes and modification times of the crop files, changes when a crop is edited
+    """
+    directory = directory or crop_directory
+    files = sorted(file for file in os.listdir(directory) if file.endswith(".csv"))
+    return content_hash([(file, os.stat(os.path.join(directory, file)).st_size, 
+                          os.stat(os.path.join(directory, file)).st_mtime_ns) for file in files])[:16]
+
+@lru_cache(maxsize=4)
+def _load_crop_library(directory):
+    names = []
+    stages = []
+    ppfd_min = []
+    ppfd_max = []
+    for file in sorted(os.listdir(directory)):
+        if not file.endswith(".csv"):
+            continue
+        calendar = pd.read_csv(os.path.join(directory, file), dtype={"start" : str})
+        missing = [column for column in ["start", "stage", "ppfd_min", "ppfd_max"] if column not in calendar]
+        if missing or len(calendar) == 0:
+            raise ValueError(f"Crop file {file} misses the columns {missing} or has no stages")
+        starts = np.array([pd.Timestamp(f"2024-{start}").dayofyear - 1 for start in calendar["start"]])
+        if np.any(np.diff(starts) <= 0):
+            raise ValueError(f"Stages of crop file {file} do not start in increasing order")
+
+        # Every day belongs to the last stage that started, the last stage of the year continues in January
+        day_stage = np.searchsorted(starts, np.arange(len(library_days)), side="right") - 1
+        names.append(file[:-len(".csv")].lower())
+        stages.append(calendar["stage"].to_numpy(dtype=str)[day_stage])
+        ppfd_min.append(calendar["ppfd_min"].to_numpy(dtype=float)[day_stage])
+        ppfd_max.append(calendar["ppfd_max"].to_numpy(dtype=float)[day_stage])
+
+    library = {
+        'names' : tuple(names),
+        'index' : {name : i for i, name in enumerate(names)},
+        'stages' : np.array(stages),
+        'min_Wm2' : np.array(ppfd_min) * conversion_factor,
+        'max_Wm2' : np.array(ppfd_max) * conversion_factor,
+        'dormant' : np.array(stages) == "dormant",
+    }
+    for name in ['stages', 'min_Wm2', 'max_Wm2', 'dormant']:
+        library[name].flags.writeable = False
+    return library
+
+def crop_library(directory : str = None):
+    """
+    Description
+    -----------
+    Registry of all crops, read once from the crop files and compiled into dense 
+    (crop x day of the year) arrays. Use reload_crop_library after editing a crop file.
+
+    Parameters
+    ----------
+    directory : str
+        Directory with the crop files, defaults to inputs/crops.
+        Every file <name>.csv defines the crop <name> by the columns
+            | start | stage | ppfd_min | ppfd_max |
+        with the first day of every stage as MM-DD and the PPFD requirements in [μmol/m^2/s]. 
+        A stage lasts until the next one starts, the last stage continues at the start of the year.
+        Stages named "dormant" have no irradiation requirements. 
+        Regional calendars are added as separate crops, e.g. potatoes_north.csv
+
+    Returns
+    -------
+    library : dict
+        'names' : tuple of the crop names, 'index' : {name : row},
+        'stages' : stage names, 'min_Wm2' / 'max_Wm2' : requirements [W/m^2] and 
+        'dormant' : True without requirements, as read-only arrays of shape (crop x 366)
+
+    Raises
+    ------
+    ValueError
+        If a crop file is not valid
+    """
+    directory = directory or crop_directory
+    return _load_crop_library(directory)
+
+def reload_crop_library():
+    """
+    Description
+    -----------
+    Read the crop files again after they were edited in a running session
+    """
+    _load_crop_library.cache_clear()
+    compiled_requirements.cache_clear()
+    _stacked_requirements.cache_clear()
+
+@lru_cache(maxsize=None)
+def compiled_requirements(crop_type : str = "potatoes", resolution : int = 12):
+    """
+    Description
+    -----------
+    Requirements of a crop per month or per day, taken from the crop library
+
+    Parameters
+    ----------
+    crop_type : str
+        Crop type, one of crop_library()['names']
+    resolution : int
+        12 for months, or 365/366 for the days of a (leap) year
+
+    Returns
+    -------
+    min_req_Wm2 : np.array
+        Minimum irradiation per period [W/m^2]
+    max_req_Wm2 : np.array
+        Maximum irradiation per period [W/m^2]
+    dormant : np.array
+        True in periods without irradiation requirements
+
+    Raises
+    ------
+    ValueError
+        If crop_type or resolution not recognized.
+
+    Notes
+    -----
+    The monthly requirements are the mean of the daily requirements, a month is dormant 
+    if all its days are dormant. This is exact for crops whose stages start at the first of a month.
+    """
+    if resolution not in (12, 365, 366):
+        raise ValueError(f"Resolution {resolution} not recognized. Choose one of: 12, 365, 366")
+    library = crop_library()
+    if crop_type.lower() not in library['index']:
+        raise ValueError(f"Crop type {crop_type.lower()} not recognized. Choose one of: {list(library['names'])}")
+    row = library['index'][crop_type.lower()]
+    min_req_Wm2, max_req_Wm2, dormant = library['min_Wm2'][row], library['max_Wm2'][row], library['dormant'][row]
+
+    if resolution == 365:
+        # Skip the 29th of February
+        days = library_days != pd.Timestamp("2024-02-29")
+        min_req_Wm2, max_req_Wm2, dormant = min_req_Wm2[days], max_req_Wm2[days], dormant[days]
+    elif resolution == 12:
+        month = library_days.month - 1
+        counts = np.bincount(month, minlength=12)
+        min_req_Wm2 = np.bincount(month, weights=min_req_Wm2, minlength=12) / counts
+        max_req_Wm2 = np.bincount(month, weights=max_req_Wm2, minlength=12) / counts
+        dormant = np.bincount(month, weights=dormant, minlength=12) == counts
+
+    min_req_Wm2, max_req_Wm2, dormant = np.array(min_req_Wm2), np.array(max_req_Wm2), np.array(dormant)
+    for array in (min_req_Wm2, max_req_Wm2, dormant):
+        array.flags.writeable = False
+    return min_req_Wm2, max_req_Wm2, dormant
+
+@lru_cache(maxsize=64)
+def _stacked_requirements(crop_types : tuple, resolution : int):
+    """
+    Description
+    -----------
+    compiled_requirements of several crops stacked into (crop x period) arrays
+    """
+    stacked = tuple(np.array(requirement) for requirement in 
+                    zip(*(compiled_requirements(crop_type, resolution) for crop_type in crop_types)))
+    for array in stacked:
+        array.flags.writeable = False
+    return stacked
+
+@profiled("agriculture")
+def agricultural_batch(irradiation_crop, crop_type = "potatoes"):
+    """
+    Description
+    -----------
+    Vectorized crop impact for many designs and crops at once, see agricultural
+
+    Parameters
+    ----------
+    irradiation_crop : np.array
+        Irradiation per m^2 [W/m2] still arriving at crop, of shape (..., 12) for months 
+        or (..., 365/366) for days
+    crop_type : str or list
+        Crop type, a list of crop types or None for all crops of the crop library
+
+    Returns
+    -------
+    impact : np.array
+        Crop impact [W/m^2] with the same shape as irradiation_crop for a single crop type,
+        or of shape (..., crop, period) for a list of crop types or None
+
+    Examples
+    --------
+    >>> impact = agricultural_batch(np.full((1000, 12), 50.0), crop_type=None)
+    >>> impact.shape
+    (1000, len(crop_library()['names']), 12)
+    """
+    irradiation_crop = np.asarray(irradiation_crop, dtype=float)
+    if isinstance(crop_type, str):
+        min_req_Wm2, max_req_Wm2, dormant = compiled_requirements(crop_type.lower(), irradiation_crop.shape[-1])
+    else:
+        crop_types = crop_library()['names'] if crop_type is None else tuple(name.lower() for name in crop_type)
+        min_req_Wm2, max_req_Wm2, dormant = _stacked_requirements(crop_types, irradiation_crop.shape[-1])
+        irradiation_crop = irradiation_crop[..., np.newaxis, :]
+    return np.where(dormant, 0.0, irradiation_crop - np.clip(irradiation_crop, min_req_Wm2, max_req_Wm2))
+
 def agricultural(
     crop_type="potatoes",
     irradiation_crop=[20] * 12,
@@ -20,7 +229,7 @@ def agricultural(
     irradiation_crop : np.array
        Irradiation per m^2 [W/m2] still arriving at crop 
     crop_type : str
-        Crop type (currently supports only 'potatoes')
+        Crop type, one of crop_library()['names']
 
     Returns
     -------
@@ -60,57 +269,8 @@ def agricultural(
     }
     """
 
-    # Define possible crops and their requirements
-    possible_crops = ["potatoes"]
-    crop_requirements = {
-        "potatoes": {
-            "stages": [
-                "flowering","fruiting", "dormant","dormant", "dormant", "dormant","dormant", "dormant", "dormant", 
-                "seedling", "vegetative", "vegetative",  
-            ],
-            "stage_ppfd_min": {
-                "dormant": 0,
-                "seedling": 100,
-                "vegetative": 200,
-                "flowering": 500,
-                "fruiting": 500
-            },
-            "stage_ppfd_max": {
-                "dormant": 0,  # Dormant period - no irradiation requirements
-                "seedling": 200,
-                "vegetative": 600,
-                "flowering": 600,
-                "fruiting": 600
-            }
-        }
-    }
-
-    # Check if crop is valid
-    if crop_type.lower() not in possible_crops:
-        raise ValueError(f"Crop type {crop_type.lower()} not recognized. Choose one of: {possible_crops}")
-
-    # Conversion factor: 1 μmol/m²/s = 0.217 W/m²
-    conversion_factor = 0.217
-
-    crop = crop_requirements[crop_type.lower()]
-    stages = crop["stages"]
-
-    # Calculate min and max PPFD lists in W/m²
-    min_req_Wm2 = [crop["stage_ppfd_min"][stage] * conversion_factor for stage in stages]
-    max_req_Wm2 = [crop["stage_ppfd_max"][stage] * conversion_factor for stage in stages]
-
-    # Compare actual irradiation with required range
-    impact=[]
-    for i, month in enumerate(months):
-        if stages[i] == "dormant":
-            impact.append(0)
-        else:
-            if irradiation_crop[i] < min_req_Wm2[i]:
-                impact.append(irradiation_crop[i] - min_req_Wm2[i])
-            elif irradiation_crop[i] > max_req_Wm2[i]:     
-                impact.append(irradiation_crop[i] - max_req_Wm2[i])
-            else:
-                impact.append(0)
+    min_req_Wm2, max_req_Wm2, _ = compiled_requirements(crop_type.lower())
+    impact = agricultural_batch(np.asarray(irradiation_crop, dtype=float)[:len(months)], crop_type)
 
     # Build DataFrame
     crop_impact = pd.DataFrame(np.transpose([impact, min_req_Wm2, max_req_Wm2]), columns=["Crop impact [W/m^2]", "Minimum crop [W/m^2]", "Maximum crop [W/m^2]"], index=months)
@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# History of all benchmark runs, one entry per run
+history_path = os.path.join(root_path, "output", "benchmark_history.json")
+
+# A benchmark fails when its throughput is more than this fraction below the baseline
+regression_threshold = 0.25
+
+# Number of earlier runs (on the same machine) of which the median throughput is the baseline
+baseline_runs = 5
+
+def _energy_output():
+    from modules.energyOutput import energy_output
+    # The hourly site data is cached, as in every sweep, so this only times the panel model
+    return (lambda: energy_output(tilt=20)), 8784
+
+def _energy_output_stream(freq):
+    from modules.energyOutput import energy_output_stream
+    # Solar position and clear-sky weather are computed in every call, at every resolution
+    steps = {"1h" : 8784, "15min" : 4 * 8784, "1min" : 60 * 8784}[freq]
+    return (lambda: energy_output_stream(tilt=20, freq=freq)), steps
+
+def _sweep():
+    from interface import parameter_sweep
+    from modules.scenario import Scenario
+    base = Scenario.from_file("ideal_inputs").to_dict(measure_time=False)
+    return (lambda: parameter_sweep({"tilt" : (10, 50, 10), "azimuth" : (120, 240, 10)}, base=base, progress=False)), 100
+
+def _economics(n):
+    from modules.economics import economics_batch
+    rng = np.random.default_rng(0)
+    area = rng.uniform(1e4, 1e5, n)
+    coverage = rng.uniform(0.2, 0.6, n)
+    annual_energy = rng.uniform(1e5, 1e7, n)
+    lifetime = rng.integers(20, 35, n)
+    return (lambda: economics_batch(area, coverage, 2.42, annual_energy, 0.0, lifetime)), n
+
+def _agricultural(n):
+    from modules.agriculture import agricultural_batch
+    irradiation = np.random.default_rng(0).uniform(0, 300, (n, 12))
+    return (lambda: agricultural_batch(irradiation, "potatoes")), n
+
+# name : (setup, unit of the work). A setup returns the benchmarked function and its amount of work
+benchmarks = {
+    "energy_output 1h cached site" : (_energy_output, "time steps"),
+    **{f"energy_output_stream {freq}" : ((lambda freq=freq: _energy_output_stream(freq)), "time steps")
+       for freq in ["1h", "15min", "1min"]},
+    "sweep 10x10" : (_sweep, "designs"),
+    **{f"economics_batch 1e{k}" : ((lambda k=k: _economics(10**k)), "designs") for k in range(3, 7)},
+    **{f"agricultural_batch 1e{k}" : ((lambda k=k: _agricultural(10**k)), "designs") for k in range(3, 7)},
+}
+
+def measure(func, repeats : int = 5, min_time : float = 0.2):
+    """
+    Description
+    -----------
+    Time a function after one warm-up call. Fast functions are called several times per repeat,
+    so that a repeat takes at least min_time
+
+    Parameters
+    ----------
+    func : callable
+        Benchmarked function without arguments
+    repeats : int
+        Number of timed repeats
+    min_time : float
+        Minimum duration of a repeat [s]
+
+    Returns
+    -------
+    times : list
+        Time of a single call per repeat [s]
+    """
+    start = time.perf_counter()
+    func()
+    number = max(1, int(np.ceil(min_time / max(time.perf_counter() - start, 1e-9))))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return times
+
+def run_benchmarks(names : list = None, repeats : int = 5):
+    """
+    Description
+    -----------
+    Run benchmarks in the current process, and the cold import time of interface in fresh interpreters
+
+    Parameters
+    ----------
+    names : list
+        Names of the benchmarks (keys of benchmarks and 'cold import'), defaults to all
+    repeats : int
+        Number of timed repeats of every benchmark
+
+    Returns
+    -------
+    results : dict
+        {name : {'seconds' : median time of a call [s], 'times' : all times [s],
+                 'throughput' : work per second, 'unit' : unit of the work}}
+
+    Raises
+    ------
+    ValueError
+        If a benchmark name is not recognized
+    """
+    available = list(benchmarks) + ["cold import"]
+    names = available if names is None else names
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Benchmarks {unknown} not recognized. Choose from: {', '.join(available)}")
+
+    results = {}
+    for name in names:
+        if name == "cold import":
+            from modules.coldStart import cold_start
+            times = cold_start("interface", repeats)["times"]
+            work, unit = 1, "imports"
+        else:
+            setup, unit = benchmarks[name]
+            func, work = setup()
+            times = measure(func, repeats)
+        seconds = float(np.median(times))
+        results[name] = {"seconds" : seconds, "times" : times, "throughput" : work / seconds, "unit" : unit}
+    return results
+
+def machine():
+    """
+    Description
+    -----------
+    Identification of the machine, results are only compared to runs on the same machine
+    """
+    return f"{platform.node()} {platform.machine()} {platform.python_version()}"
+
+def load_history(path : str = history_path):
+    """
+    Description
+    -----------
+    List of earlier runs, see save_run
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return json.load(file)
+
+def save_run(results : dict, path : str = history_path):
+    """
+    Description
+    -----------
+    Append a run to the history, with the time, machine and git commit
+
+    Returns
+    -------
+    run : dict
+        {'time' : ISO time, 'machine' : see machine, 'commit' : git hash (None outside a repository),
+         'results' : see run_benchmarks}
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root_path,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    run = {"time" : time.strftime("%Y-%m-%dT%H:%M:%S"), "machine" : machine(), "commit" : commit, "results" : results}
+    history = load_history(path) + [run]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(history, file, indent=1)
+    return run
+
+def regressions(results : dict, history : list, threshold : float = regression_threshold, runs : int = baseline_runs):
+    """
+    Description
+    -----------
+    Compare the throughput of every benchmark to the median of its last runs on this machine.
+    Results that were regressions themselves are not part of the baseline.
+
+    Parameters
+    ----------
+    results : dict
+        Results of run_benchmarks
+    history : list
+        Earlier runs, see load_history
+    threshold : float
+        Allowed relative drop in throughput
+    runs : int
+        Number of earlier runs in the baseline
+
+    Returns
+    -------
+    regressed : dict
+        {name : (throughput, baseline)} of the benchmarks that dropped by more than threshold.
+        Every result gets the keys 'baseline' (None without earlier runs) and 'regressed'
+    """
+    regressed = {}
+    for name, result in results.items():
+        earlier = [run["results"][name]["throughput"] for run in history
+                   if run["machine"] == machine() and name in run["results"] and not run["results"][name].get("regressed", False)]
+        baseline = float(np.median(earlier[-runs:])) if earlier else None
+        result["baseline"] = baseline
+        result["regressed"] = baseline is not None and result["throughput"] < (1 - threshold) * baseline
+        if result["regressed"]:
+            regressed[name] = (result["throughput"], baseline)
+    return regressed
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the model, compared to the earlier runs in the history")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, defaults to all")
+    parser.add_argument("-r", "--repeats", type=int, default=5, help="timed repeats per benchmark")
+    parser.add_argument("-t", "--threshold", type=float, default=regression_threshold, help="allowed relative drop in throughput")
+    parser.add_argument("--history", default=history_path, help="json file with the earlier runs")
+    parser.add_argument("--no-save", action="store_true", help="do not add this run to the history")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    arguments = parser.parse_args(arguments)
+    if arguments.list:
+        print("\n".join(list(benchmarks) + ["cold import"]))
+        return
+
+    try:
+        results = run_benchmarks(arguments.names or None, arguments.repeats)
+    except ValueError as error:
+        parser.exit(2, f"error: {error}\n")
+    regressed = regressions(results, load_history(arguments.history), arguments.threshold)
+
+    for name, result in results.items():
+        change = "" if result["baseline"] is None else f" ({result['throughput'] / result['baseline'] - 1:+.1%})"
+        print(f"{name:<26} {result['seconds'] * 1e3:10.2f} ms {result['throughput']:12.4g} {result['unit']}/s{change}"
+              + ("  REGRESSION" if result["regressed"] else ""))
+    if not arguments.no_save:
+        save_run(results, arguments.history)
+    if regressed:
+        parser.exit(1, f"{len(regressed)} benchmark(s) more than {arguments.threshold:.0%} slower than the baseline: {', '.join(regressed)}\n")
+
+if __name__ == '__main__':
+    sys.exit(main())
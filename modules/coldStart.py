@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import subprocess
+import numpy as np
+
+root_path = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Packages that are only imported on first use, not when the core is imported
+lazy_packages = ["matplotlib", "scienceplots", "tqdm", "scipy", "pvlib"]
+
+# Maximum median cold import time of interface [s]; NumPy and pandas take about 0.35 s of it
+cold_start_budget = 0.8
+
+def cold_start(module : str = "interface", repeats : int = 5):
+    """
+    Description
+    -----------
+    Time to import module in a fresh interpreter, as paid by every worker process and command line run
+
+    Parameters
+    ----------
+    module : str
+        Imported module, relative to the repository root
+    repeats : int
+        Number of fresh interpreters
+
+    Returns
+    -------
+    result : dict
+        'seconds' : median import time [s], 'times' : all import times [s] and
+        'loaded' : the lazy_packages that were imported anyway
+    """
+    code = ("import sys, time, json\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "seconds = time.perf_counter() - start\n"
+            f"loaded = [name for name in {lazy_packages!r} if name in sys.modules and "
+            "type(sys.modules[name]).__name__ != '_LazyModule']\n"
+            "print(json.dumps({'seconds' : seconds, 'loaded' : loaded}))")
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([root_path, os.environ.get("PYTHONPATH", "")]))
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=root_path, env=environment,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    times = [run["seconds"] for run in runs]
+    return {"seconds" : float(np.median(times)),
+            "times" : times,
+            "loaded" : sorted(set(name for run in runs for name in run["loaded"]))}
+
+def check_cold_start(module : str = "interface", budget : float = cold_start_budget, repeats : int = 5):
+    """
+    Description
+    -----------
+    Check that importing module does not import the lazy_packages and stays within the budget
+
+    Returns
+    -------
+    result : dict
+        See cold_start
+
+    Raises
+    ------
+    RuntimeError
+        If a lazy package is imported or the median import time exceeds the budget
+    """
+    result = cold_start(module, repeats)
+    if result["loaded"]:
+        raise RuntimeError(f"Importing {module} imported {result['loaded']}, import them on first use")
+    if result["seconds"] > budget:
+        raise RuntimeError(f"Cold import of {module} took {result['seconds']:.3f} s, the budget is {budget} s")
+    return result
+
+if __name__ == '__main__':
+    result = check_cold_start()
+    print(f"Cold import of interface: {result['seconds']:.3f} s (budget {cold_start_budget} s)")
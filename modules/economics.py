@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from modules.profiling import profiled
 
 
 months = [
@@ -7,6 +8,322 @@ months = [
         "July", "August", "September", "October", "November", "December"
     ]
 
+# Cost assumptions, see report
+panel_power = 580               # rated power of a panel [W]
+panel_cost = 499 * 0.8          # installed cost of a panel [EUR]
+mounting_fraction = 1 / 250     # mounting costs as fraction of the panel costs
+installation_cost = 100         # [EUR/kW]
+BOP_cost = 1048.5               # balance of plant [EUR/kW]
+OM_cost = 35                    # operation & maintenance [EUR/kW/y]
+discount_rate = 0.0215
+energy_price = 0.1301           # [EUR/kWh]
+
+# Lifecycle assumptions of the cash flow model
+degradation = 0.005             # yearly loss of panel output
+price_escalation = 0.02         # yearly increase of the energy price
+inverter_cost = 60              # replacement of the inverters [EUR/kW]
+inverter_lifetime = 12          # years between inverter replacements
+
+# Default uncertainty of the cost assumptions for monte_carlo_economics,
+# triangular distributions as (minimum, most likely, maximum)
+cost_uncertainty = {
+    "panel_cost" : (0.8 * panel_cost, panel_cost, 1.3 * panel_cost),
+    "BOP_cost" : (0.8 * BOP_cost, BOP_cost, 1.25 * BOP_cost),
+    "energy_price" : (0.09, energy_price, 0.17),
+    "discount_rate" : (0.01, discount_rate, 0.05),
+}
+
+@profiled("economics")
+def economics_batch(area = 70000,
+                    coverage = 0.4,
+                    panel_area = 2.42,
+                    annual_energy = 150,
+                    subsidy = 0.0,
+                    lifetime = 30,
+                    discount_rate = discount_rate,
+                    panel_cost = panel_cost,
+                    BOP_cost = BOP_cost,
+                    energy_price = energy_price):
+    """
+    Description
+    -----------
+    Vectorized version of economics for many designs and cost assumptions at once.
+    All parameters are floats or arrays that are broadcast against each other.
+
+    Parameters
+    ----------
+    area : np.array
+        Total farm area [m^2]
+    coverage : np.array
+        Fraction of area covered by PV (0-1)
+    panel_area : np.array
+        Area of a single panel [m^2]
+    annual_energy : np.array
+        Yearly energy production [kWh/y]
+    subsidy : np.array
+        Subsidy, subtracted from the CAPEX [EUR]
+    lifetime : np.array
+        Lifetime of the system in years
+    discount_rate : np.array
+        Discount rate of the capital recovery factor
+    panel_cost : np.array
+        Installed cost of a panel [EUR]
+    BOP_cost : np.array
+        Balance of plant costs [EUR/kW]
+    energy_price : np.array
+        Selling price of the energy [EUR/kWh]
+
+    Returns
+    -------
+    single_parameters : dict
+        {column : np.array} with the columns of economics, in the broadcast shape of the inputs
+    """
+    area, coverage, panel_area, annual_energy, subsidy, lifetime, r, panel_cost, BOP_cost, energy_price = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in 
+          (area, coverage, panel_area, annual_energy, subsidy, lifetime, discount_rate, panel_cost, BOP_cost, energy_price)))
+
+    # area calculations
+    n_panels = area * coverage / panel_area
+    p_sys_kW = n_panels * panel_power / 1000  # total system capacity [kW]
+    OM = OM_cost * p_sys_kW #[€]
+
+    # estimated CAPEX costs
+    panel_costs = panel_cost * n_panels
+    CAPEX = panel_costs * (1 + mounting_fraction) + (installation_cost + BOP_cost) * p_sys_kW     # [€]
+
+    # capital recovery factor, 1 / lifetime for a zero discount rate
+    growth = (1 + r) ** lifetime
+    alpha = np.divide(r * growth, growth - 1, out=np.array(1 / lifetime, dtype=float), where=r != 0)
+
+    # LCOE and ROI
+    LCOE = (alpha * (CAPEX - subsidy) + OM) / annual_energy
+    ROI = (energy_price - LCOE) * annual_energy / CAPEX * 100
+
+    return {
+        "LCOE [EUR/MWh]" : LCOE * 1e3,
+        "ROI" : ROI,
+        "Operation & Maintenance cost [EUR/y]" : OM,
+        "Energy price [EUR/kWh]" : energy_price,
+    }
+
+def monte_carlo_economics(area = 70000,
+                          coverage = 0.4,
+                          panel_area = 2.42,
+                          annual_energy = 150,
+                          subsidy = 0.0,
+                          lifetime = 30,
+                          samples : int = 10**6,
+                          uncertainty : dict = None,
+                          seed : int = None):
+    """
+    Description
+    -----------
+    Distribution of the economical parameters for uncertain cost assumptions.
+    The cost assumptions are sampled once and evaluated for all samples in a single vectorized pass.
+
+    Parameters
+    ----------
+    area, coverage, panel_area, annual_energy, subsidy, lifetime : np.array
+        Design, see economics_batch. Arrays get an extra last axis for the samples
+    samples : int
+        Number of samples
+    uncertainty : dict
+        {assumption : (minimum, most likely, maximum)} of triangular distributions, 
+        overrides cost_uncertainty for the given assumptions 
+        ("panel_cost", "BOP_cost", "energy_price", "discount_rate")
+    seed : int
+        Seed of the random generator
+
+    Returns
+    -------
+    draws : dict
+        {assumption : np.array} with the sampled cost assumptions of shape (samples)
+    single_parameters : dict
+        {column : np.array} with the columns of economics, of shape (*design, samples)
+
+    Raises
+    ------
+    ValueError
+        If an assumption is not recognized
+
+    Examples
+    --------
+    >>> draws, single = monte_carlo_economics(annual_energy=1.5e7, samples=10**6, seed=0)
+    >>> np.percentile(single["LCOE [EUR/MWh]"], [5, 50, 95])
+    """
+    unknown = [name for name in (uncertainty or {}) if name not in cost_uncertainty]
+    if unknown:
+        raise ValueError(f"Cost assumptions {unknown} not recognized. Choose from: {list(cost_uncertainty)}")
+    distributions = dict(cost_uncertainty, **(uncertainty or {}))
+
+    generator = np.random.default_rng(seed)
+    draws = {name : generator.triangular(*distributions[name], size=samples) for name in cost_uncertainty}
+
+    design = [np.asarray(value, dtype=float)[..., np.newaxis] for value in 
+              (area, coverage, panel_area, annual_energy, subsidy, lifetime)]
+    return draws, economics_batch(*design, **draws)
+
+def internal_rate_of_return(cash_flows, low : float = -0.99, high : float = 1.0, tolerance : float = 1e-12, iterations : int = 100):
+    """
+    Description
+    -----------
+    Vectorized internal rate of return of many cash flows at once.
+    Newton steps on the net present value, with a bisection step when Newton leaves the bracket.
+
+    Parameters
+    ----------
+    cash_flows : np.array
+        Cash flows of shape (... x year), the first year is year 0 (the investment)
+    low, high : float
+        Bracket of the rate
+    tolerance : float
+        Stop when the bracket or step of all scenarios is smaller than tolerance
+    iterations : int
+        Maximum number of steps
+
+    Returns
+    -------
+    irr : np.array
+        Internal rate of return of shape (...), NaN if the net present value does not change sign in the bracket
+    """
+    cash_flows = np.asarray(cash_flows, dtype=float)
+    shape = cash_flows.shape[:-1]
+    cash_flows = cash_flows.reshape(-1, cash_flows.shape[-1])
+    years = np.arange(cash_flows.shape[-1])
+
+    def npv(flows, rate):
+        discount = (1 + rate[:, np.newaxis]) ** -years
+        return np.sum(flows * discount, axis=-1), np.sum(-years * flows * discount, axis=-1) / (1 + rate)
+
+    low = np.full(len(cash_flows), low)
+    high = np.full(len(cash_flows), high)
+    npv_low, _ = npv(cash_flows, low)
+    npv_high, _ = npv(cash_flows, high)
+    irr = np.full(len(cash_flows), np.nan)
+
+    # Only the scenarios that did not converge yet are iterated
+    active = np.flatnonzero(np.sign(npv_low) != np.sign(npv_high))
+    low, high, npv_low = low[active], high[active], npv_low[active]
+    rate = (low + high) / 2
+    for _ in range(iterations):
+        if len(active) == 0:
+            break
+        value, derivative = npv(cash_flows[active], rate)
+        same_sign = np.sign(value) == np.sign(npv_low)
+        low = np.where(same_sign, rate, low)
+        npv_low = np.where(same_sign, value, npv_low)
+        high = np.where(same_sign, high, rate)
+
+        newton = rate - np.divide(value, derivative, out=np.full_like(rate, np.inf), where=derivative != 0)
+        new_rate = np.where((newton > low) & (newton < high), newton, (low + high) / 2)
+        converged = (np.abs(new_rate - rate) < tolerance) | (high - low < tolerance) | (value == 0)
+        irr[active[converged]] = new_rate[converged]
+        active, low, high, npv_low, rate = (array[~converged] for array in (active, low, high, npv_low, new_rate))
+
+    irr[active] = rate
+    return irr.reshape(shape)
+
+@profiled("economics")
+def cash_flow(area = 70000,
+              coverage = 0.4,
+              panel_area = 2.42,
+              annual_energy = 150,
+              subsidy = 0.0,
+              lifetime = 30,
+              discount_rate = discount_rate,
+              panel_cost = panel_cost,
+              BOP_cost = BOP_cost,
+              energy_price = energy_price,
+              degradation = degradation,
+              price_escalation = price_escalation,
+              inverter_cost = inverter_cost,
+              inverter_lifetime = inverter_lifetime,
+              return_matrices : bool = False):
+    """
+    Description
+    -----------
+    Year-by-year cash flow of many scenarios at once, with panel degradation, 
+    escalation of the energy price and replacement of the inverters.
+    All parameters are floats or arrays that are broadcast against each other into the scenarios.
+
+    Parameters
+    ----------
+    area, coverage, panel_area, annual_energy, subsidy, lifetime, discount_rate, panel_cost, BOP_cost, energy_price : np.array
+        See economics_batch, annual_energy is the energy export of the first year [kWh/y]
+    degradation : np.array
+        Yearly loss of panel output (0-1)
+    price_escalation : np.array
+        Yearly increase of the energy price (0-1)
+    inverter_cost : np.array
+        Cost of replacing the inverters [EUR/kW]
+    inverter_lifetime : np.array
+        Years between inverter replacements, not replaced in the last year
+    return_matrices : bool
+        Also return the (scenario x year) matrices
+
+    Returns
+    -------
+    single_parameters : dict
+        {column : np.array} in the broadcast shape of the inputs with the columns 
+        "NPV [EUR]", "IRR", "Payback time [y]" (NaN if never paid back, 0 if the subsidy covers the investment) and "Discounted LCOE [EUR/MWh]"
+    matrices : dict
+        Only if return_matrices. {name : np.array} of shape (*scenarios, year) with the years 0 to 
+        the longest lifetime for "Energy [kWh]", "Revenue [EUR]", "Costs [EUR]", "Cash flow [EUR]" and 
+        "Discount factor". Years after the lifetime of a scenario are zero.
+
+    Notes
+    -----
+    Without degradation, escalation and inverter replacement the discounted LCOE equals the LCOE of economics.
+    """
+    (area, coverage, panel_area, annual_energy, subsidy, lifetime, r, panel_cost, BOP_cost, energy_price, 
+     degradation, price_escalation, inverter_cost, inverter_lifetime) = (value[..., np.newaxis] for value in np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in 
+          (area, coverage, panel_area, annual_energy, subsidy, lifetime, discount_rate, panel_cost, BOP_cost, energy_price, 
+           degradation, price_escalation, inverter_cost, inverter_lifetime))))
+
+    # area calculations and investment, as in economics_batch
+    n_panels = area * coverage / panel_area
+    p_sys_kW = n_panels * panel_power / 1000
+    CAPEX = panel_cost * n_panels * (1 + mounting_fraction) + (installation_cost + BOP_cost) * p_sys_kW
+
+    # (scenario x year) matrices, year 0 is the investment
+    years = np.arange(int(np.ceil(lifetime.max())) + 1)
+    operating = (years >= 1) & (years <= lifetime)
+    energy = np.where(operating, annual_energy * (1 - degradation) ** (years - 1), 0.0)
+    revenue = energy * energy_price * (1 + price_escalation) ** (years - 1)
+    replacement = (years % inverter_lifetime == 0) & (years < lifetime)
+    costs = np.where(operating, OM_cost * p_sys_kW + replacement * inverter_cost * p_sys_kW, 0.0)
+    costs = np.where(years == 0, CAPEX - subsidy, costs)
+    flows = revenue - costs
+    discount = (1 + r) ** -years
+
+    # Payback time, interpolated within the year in which the cumulative cash flow becomes positive
+    cumulative = np.cumsum(flows, axis=-1)
+    positive = cumulative >= 0
+    year = np.argmax(positive, axis=-1)
+    paid_back = positive.any(axis=-1)
+    previous = np.take_along_axis(cumulative, np.maximum(year - 1, 0)[..., np.newaxis], axis=-1)[..., 0]
+    flow = np.take_along_axis(flows, year[..., np.newaxis], axis=-1)[..., 0]
+    payback = np.where(paid_back & (year > 0), year - 1 - np.divide(previous, flow, out=np.zeros_like(flow), where=flow != 0), np.nan)
+    # Paid back at once when the subsidy covers the investment
+    payback = np.where(paid_back & (year == 0), 0.0, payback)
+
+    single_parameters = {
+        "NPV [EUR]" : np.sum(flows * discount, axis=-1),
+        "IRR" : internal_rate_of_return(flows),
+        "Payback time [y]" : payback,
+        "Discounted LCOE [EUR/MWh]" : np.sum(costs * discount, axis=-1) / np.sum(energy * discount, axis=-1) * 1e3,
+    }
+    if not return_matrices:
+        return single_parameters
+    return single_parameters, {
+        "Energy [kWh]" : energy,
+        "Revenue [EUR]" : revenue,
+        "Costs [EUR]" : costs,
+        "Cash flow [EUR]" : flows,
+        "Discount factor" : np.broadcast_to(discount, flows.shape),
+    }
+
 def economics(area=70000,
               coverage: float =0.4,
               panel_area : float = 2.42,
@@ -24,16 +341,12 @@ def economics(area=70000,
         Total farm area [m^2]
     coverage : float 
         Fraction of area covered by PV (0-1)
-    rows : float
-        Number of rows in the farm
-    length_rows : float 
-        Length of each row [m]
-    height_panel : float 
-        Heights of panels 
+    panel_area : float
+        Area of a single panel [m^2]
     energy : np.array
         Monthly energy production [kWh/month]
     subsidy : float 
-        Subsidy faction of CAPEX (0-1)
+        Subsidy, subtracted from the CAPEX [EUR]
     lifetime : float 
         Lifetime of the system in years
         
@@ -47,46 +360,19 @@ def economics(area=70000,
     
     Notes
     -----
-    See report for more information
+    See report for more information. Use economics_batch for many designs at once.
     
     """
-    # area calculations
-    area_pv = area * coverage
-    n_panels = area_pv / panel_area
-    p_sys_kW = (n_panels * 580) / 1000  # total system capacity [kW]
-    OM = 35 * p_sys_kW #[€]
-
-    print(p_sys_kW)
-    # estimated CAPEX costs 
-    panel_costs=499*n_panels*0.8          # installed cost [€]
-    #mounting_costs= 19.22*rows*length_rows + 72.89*rows*n_panels*height_panel
-    mounting_costs=panel_costs/250
-    installation_costs=100*p_sys_kW 
-    BOP_costs=1048.5*p_sys_kW 
-    CAPEX = panel_costs + mounting_costs + installation_costs + BOP_costs      # [€]
-
-
-    #capital recovery factor
-    r=0.0215
-    alpha =  (r * (1 + r) ** lifetime) / ((1 + r) ** lifetime - 1)
-    #LCOE 
-    annual_energy_kWh = np.sum(energy)   # sum of 12 months
-    LCOE= ( (alpha * (CAPEX - subsidy))+ OM ) / (annual_energy_kWh)
-    #ROI
-    energy_price = 0.1301 #€/kWh
-    net_profit= (energy_price-LCOE)*(annual_energy_kWh)
-    ROI=(net_profit/CAPEX)*100
-
-    single_parameters = pd.DataFrame({
-         "LCOE [EUR/MWh]" : [LCOE*1e3],
-         "ROI" : [ROI],
-         "Operation & Maintenance cost [EUR/y]" : [OM],
-         "Energy price [EUR/kWh]" : [energy_price],
-         })
-
-    return single_parameters
+    single_parameters = economics_batch(area = area,
+                                        coverage = coverage,
+                                        panel_area = panel_area,
+                                        annual_energy = np.sum(energy),   # sum of 12 months
+                                        subsidy = subsidy,
+                                        lifetime = lifetime)
+
+    return pd.DataFrame({column : [float(value)] for column, value in single_parameters.items()})
 
 # ===== Test the function =====
 if __name__ == '__main__':
     s = economics()
-    print(s)
\ No newline at end of file
+    print(s)
@@ -1,14 +1,198 @@
 import pandas as pd
 import numpy as np
-import pvlib
-from pvlib.tools import cosd
-import matplotlib.pyplot as plt
+from functools import lru_cache
+from modules.resultStore import get_result_store, content_hash, code_version
+from modules.weather import file_weather, weather_version
+from modules.utils import lazy_import
+from modules.profiling import stage
+
+# pvlib is imported on first use, see modules/utils.py
+pvlib = lazy_import("pvlib")
 
 months = [
         "January", "February", "March", "April", "May", "June",
         "July", "August", "September", "October", "November", "December"
     ]
 
+# Columns of the monthly output, also the order of the last axis of energy_output_batch
+output_columns = ['Energy output [kWh]', 'Irradiation panels [W/m^2]', 'Irradiation crops [W/m^2]']
+
+# Bound on the difference between the float32 and float64 monthly outputs of energy_output_batch,
+# relative to the largest month of a design
+float32_tolerance = 1e-5
+
+# Maximum number of sites kept in memory by site_weather
+site_cache_size = 16
+
+# Grid of the ground view factor table: tilt [deg], gcr and height / pitch
+vf_table_tilts = np.linspace(0, 90, 46)
+vf_table_gcrs = np.linspace(0.05, 1, 20)
+vf_table_heights = np.linspace(0.05, 1.5, 30)
+
+@lru_cache(maxsize=site_cache_size)
+def site_weather(latitude : float = 35,
+                 longitude : float = 15,
+                 elevation : float = 10,
+                 start : str = '2024-01-01',
+                 end : str = '2024-12-31 23:00',
+                 freq : str = '1h',
+                 clearsky_model : str = 'ineichen',
+                 ):
+    """
+    Description
+    -----------
+    Location dependent part of the energy output: time index, solar position, 
+    clear-sky irradiance and extra-terrestrial radiation. 
+    This only depends on the site and not on the panel placement, so it is cached. 
+    The least recently used site is evicted when more than site_cache_size sites are stored.
+
+    Parameters
+    ----------
+    latitude : float
+        Latitude of the farm
+    longitude : float
+        Longitude of the farm
+    elevation : float 
+        Elevation of the farm
+    start : str
+        First timestamp of the simulation (UTC)
+    end : str
+        Last timestamp of the simulation (UTC)
+    freq : str
+        Time step of the simulation
+    clearsky_model : str
+        Clear-sky model used by pvlib
+
+    Returns
+    -------
+    site : dict
+        Dictionary with the keys 'times', 'solpos', 'irradiance' (clear-sky ghi, dni and dhi) and 'dni_extra'
+
+    Notes
+    -----
+    The returned objects are shared between calls and should not be modified.
+    Use site_weather.cache_clear() to empty the cache.
+    When a result store is enabled (modules.resultStore), the hourly data is also loaded from 
+    and saved to the store.
+    """
+    times = pd.date_range(start, end, freq=freq, tz='UTC')
+
+    store = get_result_store()
+    key = content_hash(code_version(site_weather), pvlib.__version__, 
+                       latitude, longitude, elevation, start, end, freq, clearsky_model)
+    arrays = None if store is None else store.get("sites", key)
+    if arrays is not None:
+        return {
+            'times' : times,
+            'solpos' : pd.DataFrame(arrays['solpos'], index=times, columns=list(arrays['solpos_columns'])),
+            'irradiance' : pd.DataFrame(arrays['irradiance'], index=times, columns=list(arrays['irradiance_columns'])),
+            'dni_extra' : pd.Series(arrays['dni_extra'], index=times),
+        }
+
+    location = pvlib.location.Location(latitude, longitude, altitude=elevation)
+    with stage("solar position"):
+        solpos = location.get_solarposition(times)
+    with stage("clear-sky"):
+        site = {
+            'times' : times,
+            'solpos' : solpos,
+            'irradiance' : location.get_clearsky(times, model=clearsky_model, solar_position=solpos),
+            'dni_extra' : pvlib.irradiance.get_extra_radiation(times),
+        }
+
+    if store is not None:
+        store.put("sites", key, {
+            'solpos' : site['solpos'].to_numpy(dtype=float),
+            'solpos_columns' : np.array(site['solpos'].columns, dtype=str),
+            'irradiance' : site['irradiance'].to_numpy(dtype=float),
+            'irradiance_columns' : np.array(site['irradiance'].columns, dtype=str),
+            'dni_extra' : site['dni_extra'].to_numpy(dtype=float),
+        })
+    return site
+
+def sites_weather(latitude,
+                  longitude,
+                  elevation,
+                  start : str = '2024-01-01',
+                  end : str = '2024-12-31 23:00',
+                  freq : str = '1h',
+                  clearsky_model : str = 'ineichen',
+                  ):
+    """
+    Description
+    -----------
+    site_weather for many sites at once. The time index, extra-terrestrial radiation and the
+    time dependent part of the solar position (NREL SPA) are computed once and broadcast
+    against the sites, so the solar position and clear-sky irradiance are (site x hour) arrays.
+
+    Parameters
+    ----------
+    latitude : np.array
+        Latitude of every site
+    longitude : np.array
+        Longitude of every site
+    elevation : np.array
+        Elevation of every site
+    See site_weather for the other parameters
+
+    Returns
+    -------
+    sites : list
+        One dictionary per site, with the same keys and values as site_weather
+
+    Raises
+    ------
+    ValueError
+        If the clear-sky model is not recognized
+
+    Notes
+    -----
+    Uses the same settings as pvlib.location.Location (NREL SPA with delta_t = 67 s,
+    12 °C and the pressure of the elevation), so the values equal those of site_weather.
+    Only the Linke turbidity lookup of the ineichen model is done per site.
+    """
+    latitude, longitude, elevation = [np.ravel(x).astype(float)[:, None] for x in
+                                      np.broadcast_arrays(latitude, longitude, elevation)]
+    if clearsky_model not in ['ineichen', 'haurwitz', 'simplified_solis']:
+        raise ValueError(f"Clear-sky model {clearsky_model} not recognized. Choose one of: ineichen, haurwitz, simplified_solis")
+
+    times = pd.date_range(start, end, freq=freq, tz='UTC')
+    dni_extra = pvlib.irradiance.get_extra_radiation(times)
+    pressure = pvlib.atmosphere.alt2pres(elevation)
+
+    # Solar position of all sites, shape (site x hour)
+    unixtime = np.asarray(times.as_unit('ns').asi8, dtype=float) / 1e9
+    with stage("solar position"):
+        apparent_zenith, zenith, apparent_elevation, elevation_angle, azimuth, equation_of_time = \
+            pvlib.spa.solar_position_numpy(unixtime, latitude, longitude, elevation, pressure / 100, 12, 67.0, 0.5667, 1)
+
+    # Clear-sky irradiance of all sites
+    with stage("clear-sky"), np.errstate(divide='ignore', invalid='ignore'):
+        if clearsky_model == 'ineichen':
+            airmass = pvlib.atmosphere.get_absolute_airmass(
+                pvlib.atmosphere.get_relative_airmass(apparent_zenith, 'kastenyoung1989'), pressure)
+            linke_turbidity = np.array([pvlib.clearsky.lookup_linke_turbidity(times, lat, lon).to_numpy()
+                                        for lat, lon in zip(latitude[:, 0], longitude[:, 0])])
+            irradiance = pvlib.clearsky.ineichen(apparent_zenith, airmass, linke_turbidity,
+                                                 altitude=elevation, dni_extra=dni_extra.to_numpy())
+        elif clearsky_model == 'haurwitz':
+            # pvlib only accepts a Series for this model
+            irradiance = {'ghi' : np.array([pvlib.clearsky.haurwitz(pd.Series(z, index=times))['ghi'].to_numpy()
+                                            for z in apparent_zenith])}
+        else:
+            irradiance = pvlib.clearsky.simplified_solis(apparent_elevation, pressure=pressure,
+                                                         dni_extra=dni_extra.to_numpy())
+
+    solpos = {'apparent_zenith' : apparent_zenith, 'zenith' : zenith,
+              'apparent_elevation' : apparent_elevation, 'elevation' : elevation_angle,
+              'azimuth' : azimuth, 'equation_of_time' : np.broadcast_to(equation_of_time, azimuth.shape)}
+    return [{
+        'times' : times,
+        'solpos' : pd.DataFrame({column : values[i] for column, values in solpos.items()}, index=times),
+        'irradiance' : pd.DataFrame({column : np.asarray(irradiance[column])[i] for column in irradiance}, index=times),
+        'dni_extra' : dni_extra,
+    } for i in range(len(latitude))]
+
 def energy_output(latitude: float = 35, 
                   longitude : float = 15,
                   elevation : float = 10,
@@ -21,7 +205,9 @@ def energy_output(latitude: float = 35,
                   panel_area : float = 1.7,
                   rated_power : float = 440,
                   plot : bool = False,
-                #   tilt_tracking : bool = False,
+                  weather_file : str = None,
+                  tilt_tracking : bool = False,
+                  max_angle : float = 60,
                 ):
     """
     Description
@@ -50,6 +236,14 @@ def energy_output(latitude: float = 35,
         Rated power of the panels in Watt [W]
     panel_area : float
         Area of a single panel [m^2]
+    weather_file : str
+        Hourly weather file of one year (TMY3, EPW or CSV) used instead of the clear-sky model, 
+        see modules.weather. Also provides the air temperature and wind speed if available
+    tilt_tracking : bool
+        Single-axis trackers with backtracking instead of fixed panels. The rotation axis is horizontal
+        in the direction of azimuth and tilt is not used
+    max_angle : float
+        Maximum rotation of the trackers [deg]
 
     Returns
     -------
@@ -64,88 +258,95 @@ def energy_output(latitude: float = 35,
     -----
     Do not consider on-site usage of energy
     """
-    # --- 1. Location and time setup (yearly hourly timeseries)
-    location = pvlib.location.Location(latitude, longitude, altitude=elevation)
-    times = pd.date_range('2024-01-01', '2024-12-31 23:00', freq='1h', tz='UTC')
-
-    solpos = location.get_solarposition(times)
-    clearsky = location.get_clearsky(times, model='ineichen')
-    dni_extra = pvlib.irradiance.get_extra_radiation(times)
+    # --- 1. Location and time setup (yearly hourly timeseries, cached per site)
+    if weather_file is None:
+        site = site_weather(latitude, longitude, elevation)
+    else:
+        site = file_weather(weather_file, latitude, longitude, elevation)
+    solpos = site['solpos']
+    clearsky = site['irradiance']
+    dni_extra = site['dni_extra']
 
     # --- 2. Ground coverage ratio from coverage input
     gcr = row_width / pitch
 
-    # --- 3. Simple fixed-tilt POA model
-    poa = pvlib.irradiance.get_total_irradiance(
-        surface_tilt=tilt,
-        surface_azimuth=azimuth,
-        dni=clearsky['dni'],
-        ghi=clearsky['ghi'],
-        dhi=clearsky['dhi'],
-        solar_zenith=solpos['apparent_zenith'],
-        solar_azimuth=solpos['azimuth'],
-        dni_extra=dni_extra,
-        model='haydavies'
-    )
+    # --- 3. Orientation of the panels, hourly for trackers
+    if tilt_tracking:
+        surface_tilt, surface_azimuth = tracker_orientation(solpos['apparent_zenith'].to_numpy(), solpos['azimuth'].to_numpy(),
+                                                            axis_azimuth=azimuth, max_angle=max_angle, gcr=gcr)
+        surface_tilt = pd.Series(surface_tilt, index=solpos.index)
+        surface_azimuth = pd.Series(surface_azimuth, index=solpos.index)
+    else:
+        surface_tilt, surface_azimuth = tilt, azimuth
+
+    # --- 4. Simple POA model
+    with stage("POA"):
+        poa = pvlib.irradiance.get_total_irradiance(
+            surface_tilt=surface_tilt,
+            surface_azimuth=surface_azimuth,
+            dni=clearsky['dni'],
+            ghi=clearsky['ghi'],
+            dhi=clearsky['dhi'],
+            solar_zenith=solpos['apparent_zenith'],
+            solar_azimuth=solpos['azimuth'],
+            dni_extra=dni_extra,
+            model='haydavies'
+        )
     
 
-    monthly_panel_irradiance = clearsky['ghi'].resample('ME').mean()
+    monthly_panel_irradiance = clearsky['ghi'].groupby(clearsky.index.month).mean()
     monthly_panel_irradiance.index = months
 
-    # --- 4. PVWatts power model
-    temp_air = 20  # °C, assumed
-    temp_cell = pvlib.temperature.faiman(
-        poa_global=poa['poa_global'], temp_air=temp_air
-    )
+    # --- 5. PVWatts power model
+    temp_air = site.get('temp_air', 20)  # °C, assumed without weather file
+    with stage("temperature"):
+        temp_cell = pvlib.temperature.faiman(
+            poa_global=poa['poa_global'], temp_air=temp_air, wind_speed=site.get('wind_speed', 1.0)
+        )
     gamma_pdc = -0.004  # power temp coefficient
 
     N_modules = int((area * gcr) / panel_area)
-    power_dc = pvlib.pvsystem.pvwatts_dc(
-        effective_irradiance=poa['poa_global'],
-        temp_cell=temp_cell,
-        pdc0= rated_power * N_modules,  
-        gamma_pdc=gamma_pdc
-    )
+    with stage("PVWatts"):
+        power_dc = pvlib.pvsystem.pvwatts_dc(
+            effective_irradiance=poa['poa_global'],
+            temp_cell=temp_cell,
+            pdc0= rated_power * N_modules,  
+            gamma_pdc=gamma_pdc
+        )
 
-    # --- 5. Apply efficiency and panel area scaling (optional realism)
+    # --- 6. Apply efficiency and panel area scaling (optional realism)
     power_kw = (power_dc / 1000.0)
 
-    # --- 6. Monthly aggregation
-    monthly_avg_power = power_kw.resample('ME').sum()
+    # --- 7. Monthly aggregation
+    monthly_avg_power = power_kw.groupby(power_kw.index.month).sum()
     monthly_avg_power.index = months
 
-    # if tilt_tracking:
-    #     tracking_orientations = pvlib.tracking.singleaxis(
-    #         apparent_zenith=solpos['apparent_zenith'],
-    #         solar_azimuth=solpos['azimuth'],
-    #         axis_azimuth=azimuth,
-    #         max_angle=tilt*2,
-    #         backtrack=True,
-    #         gcr=gcr,
-    #     )
-
-        # tilt = tracking_orientations['surface_tilt']
+    # --- 8. Irradiance at crop level
+    with stage("view factors"):
+        if tilt_tracking:
+            vf_ground_sky = tracking_view_factor(surface_tilt.to_numpy(), gcr, height, pitch)
+        else:
+            vf_ground_sky = pvlib.bifacial.utils.vf_ground_sky_2d_integ(
+            surface_tilt=tilt,
+            gcr=gcr,
+            height=height,
+            pitch=pitch,
+            )
 
-    vf_ground_sky = pvlib.bifacial.utils.vf_ground_sky_2d_integ(
-    surface_tilt=tilt,
-    gcr=gcr,
-    height=height,
-    pitch=pitch,
-    )
+    with stage("crop irradiance"):
+        unshaded_ground_fraction = pvlib.bifacial.utils._unshaded_ground_fraction(
+            surface_tilt=surface_tilt,
+            surface_azimuth=surface_azimuth,
+            solar_zenith=solpos['apparent_zenith'],
+            solar_azimuth=solpos['azimuth'],
+            gcr=gcr,
+        )
 
-    unshaded_ground_fraction = pvlib.bifacial.utils._unshaded_ground_fraction(
-        surface_tilt=tilt,
-        surface_azimuth=azimuth,
-        solar_zenith=solpos['apparent_zenith'],
-        solar_azimuth=solpos['azimuth'],
-        gcr=gcr,
-    )
-
-    crop_avg_irradiance = (unshaded_ground_fraction * clearsky['dni']
-                           * cosd(solpos['apparent_zenith'])
-                            + vf_ground_sky * clearsky['dhi'])
+        crop_avg_irradiance = (unshaded_ground_fraction * clearsky['dni']
+                               * pvlib.tools.cosd(solpos['apparent_zenith'])
+                                + vf_ground_sky * clearsky['dhi'])
     
-    monthly_crop_irradiance = crop_avg_irradiance.resample('ME').mean()
+    monthly_crop_irradiance = crop_avg_irradiance.groupby(crop_avg_irradiance.index.month).mean()
     monthly_crop_irradiance.index = months
 
     result = pd.DataFrame({
@@ -156,6 +357,7 @@ def energy_output(latitude: float = 35,
 
 
     if plot:
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(10, 6))
         # (a) Irradiance comparison
         plt.subplot(2, 1, 1)
@@ -180,6 +382,1032 @@ def energy_output(latitude: float = 35,
         plt.show()
     return result
 
+def _month_matrix(times):
+    """
+    Description
+    -----------
+    One-hot (hour x month) matrix, so that monthly sums of a (design x hour) array
+    are a single matrix product that does not depend on the order of the timestamps
+
+    Parameters
+    ----------
+    times : pd.DatetimeIndex
+        Time index
+
+    Returns
+    -------
+    month_matrix : np.array
+        month_matrix[i, m] is 1 if timestamp i is in month m+1
+    counts : np.array
+        Number of timestamps in each month
+    """
+    month_matrix = (np.asarray(times.month)[:, None] == np.arange(1, 13)).astype(float)
+    return month_matrix, month_matrix.sum(axis=0)
+
+def _site_arrays(latitude, longitude, elevation, weather_file=None, site=None):
+    """
+    Description
+    -----------
+    Hourly site data of site_weather or file_weather (or a precomputed site) as NumPy arrays, with the month matrix
+    """
+    if site is None and weather_file is None:
+        site = site_weather(latitude, longitude, elevation)
+    elif site is None:
+        site = file_weather(weather_file, latitude, longitude, elevation)
+    month_matrix, counts = _month_matrix(site['times'])
+    return {'zenith' : site['solpos']['apparent_zenith'].to_numpy(),
+            'solar_azimuth' : site['solpos']['azimuth'].to_numpy(),
+            'dni' : site['irradiance']['dni'].to_numpy(),
+            'ghi' : site['irradiance']['ghi'].to_numpy(),
+            'dhi' : site['irradiance']['dhi'].to_numpy(),
+            'dni_extra' : site['dni_extra'].to_numpy(),
+            'temp_air' : np.asarray(site.get('temp_air', 20)),  # °C, assumed without weather file
+            'wind_speed' : np.asarray(site.get('wind_speed', 1.0)),
+            'month_matrix' : month_matrix,
+            'counts' : counts}
+
+def _monthly_outputs(site, surface_tilt, surface_azimuth, gcr, vf_ground_sky, pdc0):
+    """
+    Description
+    -----------
+    Monthly outputs of a chunk of designs, the (design x 1) orientation of fixed panels 
+    or the (design x hour) orientation of trackers flows through every step
+
+    Parameters
+    ----------
+    site : dict
+        Output of _site_arrays
+    surface_tilt, surface_azimuth : np.array
+        Orientation of the panels, (design x 1) or (design x hour) [deg]
+    gcr : np.array
+        Ground coverage ratio per design
+    vf_ground_sky : np.array
+        View factor of the ground to the sky, (design x 1) or (design x hour)
+    pdc0 : np.array
+        Rated power of the plant per design [W]
+
+    Returns
+    -------
+    monthly : np.array
+        Array of shape (design x month x metric), see energy_output_batch
+    """
+    zenith, solar_azimuth = site['zenith'], site['solar_azimuth']
+    dni, ghi, dhi = site['dni'], site['ghi'], site['dhi']
+    month_matrix, counts = site['month_matrix'], site['counts']
+    monthly = np.empty((len(gcr), len(months), len(output_columns)))
+    monthly[:, :, 1] = ghi @ month_matrix / counts
+
+    # --- 4. POA model (design x hour)
+    with stage("POA"):
+        poa = pvlib.irradiance.get_total_irradiance(
+            surface_tilt=surface_tilt,
+            surface_azimuth=surface_azimuth,
+            dni=dni,
+            ghi=ghi,
+            dhi=dhi,
+            solar_zenith=zenith,
+            solar_azimuth=solar_azimuth,
+            dni_extra=site['dni_extra'],
+            model='haydavies'
+        )
+
+    # --- 5. PVWatts power model
+    with stage("temperature"):
+        temp_cell = pvlib.temperature.faiman(
+            poa_global=poa['poa_global'], temp_air=site['temp_air'], wind_speed=site['wind_speed']
+        )
+    gamma_pdc = -0.004  # power temp coefficient
+
+    with stage("PVWatts"):
+        power_dc = pvlib.pvsystem.pvwatts_dc(
+            effective_irradiance=poa['poa_global'],
+            temp_cell=temp_cell,
+            pdc0=pdc0[:, None],
+            gamma_pdc=gamma_pdc
+        )
+        monthly[:, :, 0] = (power_dc / 1000.0) @ month_matrix
+
+    # --- 6. Irradiance at crop level
+    with stage("crop irradiance"):
+        unshaded_ground_fraction = pvlib.bifacial.utils._unshaded_ground_fraction(
+            surface_tilt=surface_tilt,
+            surface_azimuth=surface_azimuth,
+            solar_zenith=zenith,
+            solar_azimuth=solar_azimuth,
+            gcr=gcr[:, None],
+        )
+
+        crop_irradiance = (unshaded_ground_fraction * dni * pvlib.tools.cosd(zenith)
+                           + vf_ground_sky * dhi)
+        monthly[:, :, 2] = crop_irradiance @ month_matrix / counts
+    return monthly
+
+def _compact_site(site, dtype):
+    """
+    Description
+    -----------
+    Hourly terms of _monthly_outputs_compact that do not depend on the design, computed in float64
+    from the site arrays (_site_arrays) and stored as dtype
+    """
+    zenith = site['zenith']
+    cos_zenith = pvlib.tools.cosd(zenith)
+    anisotropy = site['dni'] / site['dni_extra']
+    compact = {
+        'solar_azimuth' : site['solar_azimuth'],
+        'cos_zenith' : cos_zenith,
+        'sin_zenith' : pvlib.tools.sind(zenith),
+        'tan_zenith' : pvlib.tools.tand(zenith),
+        # Hay-Davies: the beam and circumsolar part scale with the AOI projection, the isotropic part with the tilt
+        'beam' : site['dni'] + site['dhi'] * anisotropy / np.maximum(cos_zenith, 0.01745),
+        'isotropic' : 0.5 * site['dhi'] * (1 - anisotropy),
+        'ghi' : site['ghi'],
+        'ground' : 0.5 * 0.25 * site['ghi'],  # albedo of 0.25
+        'crop_direct' : site['dni'] * cos_zenith,
+        'dhi' : site['dhi'],
+        # Faiman with u0 = 25 and u1 = 6.84
+        'inverse_loss' : 1 / (25.0 + 6.84 * site['wind_speed']),
+        'temp_air' : site['temp_air'],
+        'month_matrix' : site['month_matrix'],
+    }
+    compact = {name : np.asarray(value, dtype=dtype) for name, value in compact.items()}
+    compact['night'] = zenith > 87  # max_zenith of the unshaded ground fraction
+    compact['counts'] = site['counts']
+    return compact
+
+def _work_buffers(n_designs, n_hours, dtype, tracking : bool = False):
+    """
+    Description
+    -----------
+    (design x hour) buffers of _monthly_outputs_compact, allocated once and reused for every chunk of designs
+    """
+    names = ["a", "b", "c"] + (["cos_tilt", "sin_tilt"] if tracking else [])
+    return {name : np.empty((n_designs, n_hours), dtype=dtype) for name in names}
+
+def _monthly_outputs_compact(site, surface_tilt, surface_azimuth, gcr, vf_ground_sky, pdc0, work):
+    """
+    Description
+    -----------
+    Same model as _monthly_outputs in the precision of the work buffers. The POA (Hay-Davies), 
+    Faiman and PVWatts equations of pvlib are written out so that every (design x hour) intermediate 
+    is computed in place in one of the buffers instead of allocating new float64 arrays.
+
+    Parameters
+    ----------
+    site : dict
+        Output of _compact_site
+    surface_tilt, surface_azimuth, gcr, vf_ground_sky, pdc0
+        See _monthly_outputs
+    work : dict
+        Output of _work_buffers with at least as many designs as this chunk
+
+    Returns
+    -------
+    monthly : np.array
+        Array of shape (design x month x metric), see energy_output_batch
+    """
+    n = len(gcr)
+    dtype = work["a"].dtype
+    a, b, c = work["a"][:n], work["b"][:n], work["c"][:n]
+    month_matrix, counts = site['month_matrix'], site['counts']
+
+    # Tilt terms, (design x 1) for fixed panels and in the buffers for trackers
+    if np.shape(surface_tilt)[-1] == 1:
+        cos_tilt = pvlib.tools.cosd(surface_tilt).astype(dtype)
+        sin_tilt = pvlib.tools.sind(surface_tilt).astype(dtype)
+    else:
+        cos_tilt, sin_tilt = work["cos_tilt"][:n], work["sin_tilt"][:n]
+        np.radians(surface_tilt, out=cos_tilt, casting='same_kind')
+        np.sin(cos_tilt, out=sin_tilt)
+        np.cos(cos_tilt, out=cos_tilt)
+
+    # Cosine of the solar azimuth relative to the panels
+    np.subtract(site['solar_azimuth'], np.asarray(surface_azimuth, dtype=dtype), out=a)
+    np.radians(a, out=a)
+    np.cos(a, out=a)
+
+    # AOI projection, clipped as in pvlib.irradiance.aoi_projection
+    np.multiply(sin_tilt, site['sin_zenith'], out=b)
+    b *= a
+    np.multiply(cos_tilt, site['cos_zenith'], out=c)
+    b += c
+    np.clip(b, -1, 1, out=b)
+
+    monthly = np.empty((n, len(months), len(output_columns)))
+    monthly[:, :, 1] = site['ghi'] @ month_matrix / counts
+
+    # --- 6. Irradiance at crop level, unshaded ground fraction as in pvlib.bifacial.utils
+    with stage("crop irradiance"):
+        a *= site['tan_zenith']
+        a *= sin_tilt
+        a += cos_tilt
+        np.abs(a, out=a)
+        a *= np.asarray(gcr, dtype=dtype)[:, None]
+        np.minimum(a, 1, out=a)
+        np.subtract(1, a, out=a)
+        np.copyto(a, 0, where=site['night'])
+        a *= site['crop_direct']
+        np.multiply(np.asarray(vf_ground_sky, dtype=dtype), site['dhi'], out=c)
+        a += c
+        monthly[:, :, 2] = a @ month_matrix / counts
+
+    # --- 4. POA model: beam and circumsolar, isotropic sky and ground diffuse
+    with stage("POA"):
+        np.maximum(b, 0, out=b)
+        b *= site['beam']
+        np.add(cos_tilt, 1, out=c)
+        c *= site['isotropic']
+        np.maximum(c, 0, out=c)
+        b += c
+        np.subtract(1, cos_tilt, out=c)
+        c *= site['ground']
+        b += c
+
+    # --- 5. PVWatts power model
+    with stage("temperature"):
+        np.multiply(b, site['inverse_loss'], out=c)
+        c += site['temp_air']
+    gamma_pdc = -0.004  # power temp coefficient
+
+    with stage("PVWatts"):
+        c -= 25.0
+        c *= gamma_pdc
+        c += 1
+        c *= b
+        c *= np.asarray(pdc0 * 1e-6, dtype=dtype)[:, None]  # W/m^2 to kW
+        monthly[:, :, 0] = c @ month_matrix
+    return monthly
+
+def energy_output_batch(latitude: float = 35, 
+                        longitude : float = 15,
+                        elevation : float = 10,
+                        height = 2.5,
+                        azimuth = 186,
+                        tilt = 0,
+                        row_width = 2*2.384,
+                        pitch =  7,
+                        area = 10000,
+                        panel_area = 1.7,
+                        rated_power = 440,
+                        weather_file : str = None,
+                        site : dict = None,
+                        chunk_size : int = 256,
+                        dtype = np.float64,
+                        ):
+    """
+    Description
+    -----------
+    Vectorized version of energy_output for many panel placements at the same site.
+    All designs are evaluated as (design x hour) NumPy arrays instead of one call per design.
+    
+    Parameters
+    ----------
+    latitude : float
+        Latitude of the farm
+    longitude : float
+        Longitude of the farm
+    elevation : float 
+        Elevation of the farm
+    height : float or np.array
+        Height of the panels above the crops [m]
+    azimuth : float or np.array
+        Azimuth in degrees [deg]
+    tilt : float or np.array
+        Angle in degrees [deg]
+    row width : float or np.array
+        Width of each row of panels [m]
+    area : float or np.array
+        Area in m2 [m^2]
+    rated_power : float or np.array
+        Rated power of the panels in Watt [W]
+    panel_area : float or np.array
+        Area of a single panel [m^2]
+    weather_file : str
+        Hourly weather file used instead of the clear-sky model, see energy_output
+    site : dict
+        Precomputed site data of the same site (an element of sites_weather), 
+        used instead of site_weather
+    chunk_size : int
+        Number of designs evaluated at once, limits the memory usage to roughly
+        chunk_size * 8784 * 8 bytes per intermediate array
+    dtype : np.dtype
+        Precision of the hourly intermediates. np.float32 keeps them in three (chunk_size x hour) 
+        buffers that are reused for every chunk, see the notes
+
+    Returns
+    -------
+    monthly : np.array
+        Array of shape (design x month x metric), the metrics are given by output_columns:
+        'Energy output [kWh]', 'Irradiation panels [W/m^2]' and 'Irradiation crops [W/m^2]'.
+        monthly[i] contains the same values as energy_output for the i-th design.
+
+    Notes
+    -----
+    The design parameters are broadcast against each other, so scalars can be mixed with arrays.
+    When a result store is enabled (modules.resultStore), the result is loaded from and saved to the store.
+
+    With dtype=np.float32 the hourly memory is 3 * chunk_size * hours * 4 bytes, instead of about a dozen 
+    float64 arrays per chunk. The monthly values stay within float32_tolerance (relative to the largest 
+    month of the design) of float64: over tilts of 0 to 60 deg, azimuths of 90 to 270 deg, pitches of 
+    5 to 15 m and latitudes of -60 to 60 deg the largest difference was 7e-7 for the energy, 
+    5e-7 for the panel irradiation and 6e-7 for the crop irradiation (1e-6 for trackers).
+    """
+    height, azimuth, tilt, row_width, pitch, area, panel_area, rated_power = [
+        np.ravel(x).astype(float) for x in np.broadcast_arrays(
+            height, azimuth, tilt, row_width, pitch, area, panel_area, rated_power)]
+    n_designs = len(tilt)
+
+    store = get_result_store()
+    key = content_hash(code_version(energy_output_batch), pvlib.__version__, latitude, longitude, elevation,
+                       None if weather_file is None else weather_version(weather_file), np.dtype(dtype).name,
+                       height, azimuth, tilt, row_width, pitch, area, panel_area, rated_power)
+    arrays = None if store is None else store.get("designs", key)
+    if arrays is not None:
+        return arrays['monthly']
+
+    # --- 1. Location and time setup, shared by all designs
+    site = _site_arrays(latitude, longitude, elevation, weather_file, site)
+
+    # --- 2. Ground coverage ratio and number of modules per design
+    gcr = row_width / pitch
+    N_modules = ((area * gcr) / panel_area).astype(int)
+
+    # --- 3. Ground view factor, a single value per design; computed once per unique geometry
+    with stage("view factors"):
+        vf_ground_sky = ground_view_factor(tilt, gcr, height, pitch, interpolate=False)
+
+    compact = np.dtype(dtype) != np.float64
+    if compact:
+        site = _compact_site(site, dtype)
+        work = _work_buffers(min(chunk_size, n_designs), len(site['ghi']), dtype)
+
+    monthly = np.empty((n_designs, len(months), len(output_columns)))
+    for start in range(0, n_designs, chunk_size):
+        d = slice(start, start + chunk_size)
+        if compact:
+            monthly[d] = _monthly_outputs_compact(site, tilt[d, None], azimuth[d, None], gcr[d], vf_ground_sky[d, None], 
+                                                  rated_power[d] * N_modules[d], work)
+        else:
+            monthly[d] = _monthly_outputs(site, tilt[d, None], azimuth[d, None], gcr[d], vf_ground_sky[d, None], rated_power[d] * N_modules[d])
+
+    if store is not None:
+        store.put("designs", key, {'monthly' : monthly})
+    return monthly
+
+@lru_cache(maxsize=1)
+def view_factor_table():
+    """
+    Description
+    -----------
+    Table of vf_ground_sky_2d_integ over (tilt, gcr, height / pitch), the view factor only depends on
+    the ratio of height and pitch. Computed once (a few seconds) and kept in the result store if enabled.
+
+    Returns
+    -------
+    table : np.array
+        View factors of shape (len(vf_table_tilts), len(vf_table_gcrs), len(vf_table_heights))
+    """
+    store = get_result_store()
+    key = content_hash(code_version(view_factor_table), pvlib.__version__, 
+                       vf_table_tilts, vf_table_gcrs, vf_table_heights)
+    arrays = None if store is None else store.get("tables", key)
+    if arrays is not None:
+        return arrays['table']
+
+    table = np.empty((len(vf_table_tilts), len(vf_table_gcrs), len(vf_table_heights)))
+    for j, gcr in enumerate(vf_table_gcrs):
+        for k, height in enumerate(vf_table_heights):
+            table[:, j, k] = pvlib.bifacial.utils.vf_ground_sky_2d_integ(
+                surface_tilt=vf_table_tilts, gcr=gcr, height=height, pitch=1.0, vectorize=True)
+
+    if store is not None:
+        store.put("tables", key, {'table' : table})
+    return table
+
+def ground_view_factor(tilt, gcr, height, pitch, interpolate : bool = True):
+    """
+    Description
+    -----------
+    Integrated view factor to the sky from the ground between the rows (vf_ground_sky_2d_integ)
+    for arrays of designs, interpolated from view_factor_table where possible
+
+    Parameters
+    ----------
+    tilt : np.array
+        Angle in degrees [deg]
+    gcr : np.array
+        Ground coverage ratio
+    height : np.array
+        Height of the panels above the crops [m]
+    pitch : np.array
+        Distance between the rows [m]
+    interpolate : bool
+        Use the table, False computes every unique design exactly
+
+    Returns
+    -------
+    vf_ground_sky : np.array
+        View factor per design
+
+    Notes
+    -----
+    The table is only used when the lower edge of the panels stays above the ground for all 
+    surrounding grid points, the pvlib model is not physical otherwise. 
+    Other designs are computed exactly. Within the table the absolute error is below 1e-3 
+    (mean 1e-4), the view factor itself is between about 0.1 and 1.
+    """
+    tilt, gcr, height, pitch = [np.ravel(x).astype(float) for x in np.broadcast_arrays(tilt, gcr, height, pitch)]
+    tilt = np.abs(tilt)  # integrated over the full pitch, symmetric in the sign of the rotation
+    vf_ground_sky = np.full(len(tilt), np.nan)
+
+    if interpolate:
+        relative_height = height / pitch
+        steps = [np.diff(grid[:2])[0] for grid in (vf_table_tilts, vf_table_gcrs, vf_table_heights)]
+        in_table = ((tilt <= vf_table_tilts[-1]) 
+                    & (gcr >= vf_table_gcrs[0]) & (gcr <= vf_table_gcrs[-1])
+                    & (relative_height >= vf_table_heights[0]) & (relative_height <= vf_table_heights[-1])
+                    & (relative_height - steps[2] >= (gcr + steps[1]) / 2 * np.sin(np.radians(np.minimum(tilt + steps[0], 90)))))
+        if in_table.any():
+            from scipy.interpolate import RegularGridInterpolator
+            interpolator = RegularGridInterpolator((vf_table_tilts, vf_table_gcrs, vf_table_heights), view_factor_table())
+            vf_ground_sky[in_table] = interpolator(np.stack([tilt[in_table], gcr[in_table], relative_height[in_table]], axis=1))
+
+    exact = np.isnan(vf_ground_sky)
+    if exact.any():
+        geometries, inverse = np.unique(np.stack([tilt[exact], gcr[exact], height[exact], pitch[exact]], axis=1), 
+                                        axis=0, return_inverse=True)
+        vf_ground_sky[exact] = np.array([
+            pvlib.bifacial.utils.vf_ground_sky_2d_integ(surface_tilt=t, gcr=g, height=h, pitch=p)[0]
+            for t, g, h, p in geometries])[np.ravel(inverse)]
+    return vf_ground_sky
+
+def tracker_orientation(solar_zenith, solar_azimuth, axis_azimuth = 180, max_angle = 60, gcr = 2/7, backtrack : bool = True):
+    """
+    Description
+    -----------
+    Hourly orientation of single-axis trackers with a horizontal axis (pvlib.tracking.singleaxis),
+    vectorized over designs
+
+    Parameters
+    ----------
+    solar_zenith, solar_azimuth : np.array
+        Apparent solar zenith and solar azimuth per hour [deg]
+    axis_azimuth : float or np.array
+        Direction of the rotation axis per design [deg]
+    max_angle : float or np.array
+        Maximum rotation of the trackers per design [deg]
+    gcr : float or np.array
+        Ground coverage ratio per design, used for backtracking
+    backtrack : bool
+        Rotate back to avoid shading between the rows
+
+    Returns
+    -------
+    surface_tilt, surface_azimuth : np.array
+        Orientation of shape (design x hour), or (hour) for scalar designs [deg].
+        At night the trackers are horizontal
+    """
+    axis_azimuth, max_angle, gcr = (np.asarray(x, dtype=float)[..., np.newaxis] for x in (axis_azimuth, max_angle, gcr))
+    solar_zenith = np.asarray(solar_zenith, dtype=float)
+
+    omega_ideal = pvlib.shading.projected_solar_zenith_angle(
+        solar_zenith=solar_zenith, solar_azimuth=solar_azimuth, axis_tilt=0, axis_azimuth=axis_azimuth)
+
+    tracker_theta = omega_ideal
+    if backtrack:
+        temp = np.abs(pvlib.tools.cosd(omega_ideal) / gcr)
+        with np.errstate(invalid='ignore'):
+            omega_correction = np.degrees(-np.sign(omega_ideal) * np.arccos(np.minimum(temp, 1)))
+        tracker_theta = omega_ideal + np.where(temp < 1, omega_correction, 0)
+
+    tracker_theta = np.where(solar_zenith > 90, 0.0, np.clip(tracker_theta, -max_angle, max_angle))
+    surface_tilt = np.abs(tracker_theta)
+    surface_azimuth = np.mod(np.where(tracker_theta > 0, axis_azimuth + 90, axis_azimuth - 90), 360)
+    return surface_tilt, surface_azimuth
+
+def tracking_view_factor(surface_tilt, gcr, height, pitch, resolution : float = 0.5, interpolate : bool = False):
+    """
+    Description
+    -----------
+    View factor of the ground to the sky for a time-varying tilt. Computed per design on a grid of tilts
+    (ground_view_factor) and interpolated for every hour
+
+    Parameters
+    ----------
+    surface_tilt : np.array
+        Tilt of shape (design x hour) or (hour) [deg]
+    gcr, height, pitch : float or np.array
+        Geometry per design, see ground_view_factor
+    resolution : float
+        Step of the tilt grid [deg], the interpolation error is about 1e-5 for 0.5 degrees
+    interpolate : bool
+        Use the view factor table for the grid, see ground_view_factor
+
+    Returns
+    -------
+    vf_ground_sky : np.array
+        View factor with the shape of surface_tilt
+    """
+    surface_tilt = np.asarray(surface_tilt, dtype=float)
+    tilts = np.atleast_2d(np.abs(surface_tilt))
+    gcr, height, pitch = [np.ravel(x).astype(float) for x in np.broadcast_arrays(gcr, height, pitch, np.empty(len(tilts)))[:3]]
+
+    grid = np.linspace(0, 90, int(np.ceil(90 / resolution)) + 1)
+    geometries, inverse = np.unique(np.stack([gcr, height, pitch], axis=1), axis=0, return_inverse=True)
+    tables = ground_view_factor(grid[np.newaxis], geometries[:, 0, np.newaxis], geometries[:, 1, np.newaxis], 
+                                geometries[:, 2, np.newaxis], interpolate=interpolate).reshape(len(geometries), len(grid))
+
+    vf_ground_sky = np.empty_like(tilts)
+    for i, row in enumerate(tilts):
+        vf_ground_sky[i] = np.interp(row, grid, tables[np.ravel(inverse)[i]])
+    return vf_ground_sky.reshape(surface_tilt.shape)
+
+def energy_output_tracking_batch(latitude: float = 35, 
+                                 longitude : float = 15,
+                                 elevation : float = 10,
+                                 height = 2.5,
+                                 azimuth = 180,
+                                 max_angle = 60,
+                                 row_width = 2*2.384,
+                                 pitch =  7,
+                                 area = 10000,
+                                 panel_area = 1.7,
+                                 rated_power = 440,
+                                 backtrack : bool = True,
+                                 weather_file : str = None,
+                                 site : dict = None,
+                                 chunk_size : int = 256,
+                                 dtype = np.float64,
+                                 ):
+    """
+    Description
+    -----------
+    Vectorized energy output of single-axis trackers for many designs at the same site, 
+    see energy_output with tilt_tracking=True. The hourly tilt of every design flows through 
+    the POA, temperature, power and crop irradiance as (design x hour) arrays.
+
+    Parameters
+    ----------
+    azimuth : float or np.array
+        Direction of the rotation axis [deg]
+    max_angle : float or np.array
+        Maximum rotation of the trackers [deg]
+    backtrack : bool
+        Rotate back to avoid shading between the rows
+    dtype : np.dtype
+        Precision of the hourly intermediates, see energy_output_batch. The tracker orientation 
+        and view factors of a chunk are computed in float64 and then copied into the buffers
+    See energy_output_batch for the other parameters
+
+    Returns
+    -------
+    monthly : np.array
+        Array of shape (design x month x metric), see energy_output_batch
+    """
+    height, azimuth, max_angle, row_width, pitch, area, panel_area, rated_power = [
+        np.ravel(x).astype(float) for x in np.broadcast_arrays(
+            height, azimuth, max_angle, row_width, pitch, area, panel_area, rated_power)]
+    n_designs = len(max_angle)
+
+    store = get_result_store()
+    key = content_hash(code_version(energy_output_tracking_batch), pvlib.__version__, latitude, longitude, elevation,
+                       None if weather_file is None else weather_version(weather_file), backtrack, np.dtype(dtype).name,
+                       height, azimuth, max_angle, row_width, pitch, area, panel_area, rated_power)
+    arrays = None if store is None else store.get("designs", key)
+    if arrays is not None:
+        return arrays['monthly']
+
+    site = _site_arrays(latitude, longitude, elevation, weather_file, site)
+    gcr = row_width / pitch
+    N_modules = ((area * gcr) / panel_area).astype(int)
+
+    compact = np.dtype(dtype) != np.float64
+    if compact:
+        compact_site = _compact_site(site, dtype)
+        work = _work_buffers(min(chunk_size, n_designs), len(compact_site['ghi']), dtype, tracking=True)
+
+    monthly = np.empty((n_designs, len(months), len(output_columns)))
+    for start in range(0, n_designs, chunk_size):
+        d = slice(start, start + chunk_size)
+        surface_tilt, surface_azimuth = tracker_orientation(site['zenith'], site['solar_azimuth'], 
+                                                            azimuth[d], max_angle[d], gcr[d], backtrack)
+        with stage("view factors"):
+            vf_ground_sky = tracking_view_factor(surface_tilt, gcr[d], height[d], pitch[d])
+        if compact:
+            monthly[d] = _monthly_outputs_compact(compact_site, surface_tilt, surface_azimuth, gcr[d], vf_ground_sky, 
+                                                  rated_power[d] * N_modules[d], work)
+        else:
+            monthly[d] = _monthly_outputs(site, surface_tilt, surface_azimuth, gcr[d], vf_ground_sky, rated_power[d] * N_modules[d])
+
+    if store is not None:
+        store.put("designs", key, {'monthly' : monthly})
+    return monthly
+
+def crop_irradiance(latitude: float = 35, 
+                    longitude : float = 15,
+                    elevation : float = 10,
+                    height = 2.5,
+                    azimuth = 186,
+                    tilt = 0,
+                    row_width = 2*2.384,
+                    pitch =  7,
+                    weather_file : str = None,
+                    interpolate : bool = True,
+                    chunk_size : int = 1024,
+                    ):
+    """
+    Description
+    -----------
+    Only the irradiance at crop level ('Irradiation crops [W/m^2]' of energy_output) for many designs.
+    Skips the POA, temperature and PVWatts models and interpolates the ground view factor from a table,
+    for shading studies where the energy output is not needed.
+
+    Parameters
+    ----------
+    See energy_output_batch for the location and design parameters
+    interpolate : bool
+        Interpolate the ground view factor from view_factor_table, see ground_view_factor
+    chunk_size : int
+        Number of designs evaluated at once
+
+    Returns
+    -------
+    monthly_crop_irradiance : np.array
+        Array of shape (design x month) with the average irradiance at crop level [W/m^2]
+    """
+    height, azimuth, tilt, row_width, pitch = [
+        np.ravel(x).astype(float) for x in np.broadcast_arrays(height, azimuth, tilt, row_width, pitch)]
+    gcr = row_width / pitch
+
+    if weather_file is None:
+        site = site_weather(latitude, longitude, elevation)
+    else:
+        site = file_weather(weather_file, latitude, longitude, elevation)
+    zenith = site['solpos']['apparent_zenith'].to_numpy()
+    solar_azimuth = site['solpos']['azimuth'].to_numpy()
+    direct_ground = site['irradiance']['dni'].to_numpy() * pvlib.tools.cosd(zenith)
+    dhi = site['irradiance']['dhi'].to_numpy()
+    month_matrix, counts = _month_matrix(site['times'])
+    monthly_diffuse = dhi @ month_matrix
+
+    # Same model as _unshaded_ground_fraction, but the sun projection is split in an hourly and a
+    # design part, so no trigonometry is done per design and hour. Hours without direct light
+    # on the ground (including zenith > 87 deg) do not contribute and are skipped.
+    sun = (zenith <= 87) & (direct_ground > 0)
+    tan_zenith = np.tan(np.radians(zenith[sun]))
+    sun_x = tan_zenith * pvlib.tools.cosd(solar_azimuth[sun])
+    sun_y = tan_zenith * np.sin(np.radians(solar_azimuth[sun]))
+    direct_month = direct_ground[sun, None] * month_matrix[sun]
+
+    vf_ground_sky = ground_view_factor(tilt, gcr, height, pitch, interpolate=interpolate)
+
+    monthly = np.empty((len(tilt), len(months)))
+    for start in range(0, len(tilt), chunk_size):
+        d = slice(start, start + chunk_size)
+        tan_phi = sun_x * pvlib.tools.cosd(azimuth[d, None]) + sun_y * np.sin(np.radians(azimuth[d, None]))
+        shaded = np.abs(pvlib.tools.cosd(tilt[d, None]) + np.sin(np.radians(tilt[d, None])) * tan_phi)
+        unshaded_ground_fraction = 1.0 - np.minimum(1.0, gcr[d, None] * shaded)
+        monthly[d] = (unshaded_ground_fraction @ direct_month 
+                      + vf_ground_sky[d, None] * monthly_diffuse) / counts
+    return monthly
+
+# Parameters of energy_output_gradient, in the order of the last axis of the gradient
+gradient_parameters = ['tilt', 'azimuth', 'pitch', 'height', 'row_width']
+
+def energy_output_gradient(latitude: float = 35, 
+                           longitude : float = 15,
+                           elevation : float = 10,
+                           height = 2.5,
+                           azimuth = 186,
+                           tilt = 0,
+                           row_width = 2*2.384,
+                           pitch =  7,
+                           area = 10000,
+                           panel_area = 1.7,
+                           rated_power = 440,
+                           weather_file : str = None,
+                           chunk_size : int = 256,
+                           ):
+    """
+    Description
+    -----------
+    energy_output_batch together with the derivatives of the monthly outputs with respect to 
+    the geometry, in a single pass. The derivatives are taken analytically through the 
+    Hay-Davies transposition, the Faiman temperature model, PVWatts and the unshaded ground fraction.
+
+    Parameters
+    ----------
+    See energy_output_batch
+
+    Returns
+    -------
+    monthly : np.array
+        Array of shape (design x month x metric), see energy_output_batch
+    gradient : np.array
+        Array of shape (design x month x metric x parameter) with the derivatives of monthly 
+        with respect to gradient_parameters: tilt and azimuth [per degree], pitch, height and row_width [per m]
+
+    Notes
+    -----
+    The number of modules is rounded down in energy_output, the derivatives use the continuous number of modules 
+    area * row_width / pitch / panel_area, so they describe the trend instead of the steps of the rounding.
+    The view factor of the ground is a single integral per design, its derivatives are central differences 
+    of the exact pvlib function (no extra hourly runs). Kinks of the model (sunrise, the edge of the shadow) 
+    have a one-sided derivative.
+    """
+    height, azimuth, tilt, row_width, pitch, area, panel_area, rated_power = [
+        np.ravel(x).astype(float) for x in np.broadcast_arrays(
+            height, azimuth, tilt, row_width, pitch, area, panel_area, rated_power)]
+    n_designs = len(tilt)
+    k = np.pi / 180  # derivatives per degree
+
+    # --- 1. Location and time setup, shared by all designs
+    site = _site_arrays(latitude, longitude, elevation, weather_file)
+    zenith, solar_azimuth = site['zenith'], site['solar_azimuth']
+    dni, ghi, dhi, dni_extra = site['dni'], site['ghi'], site['dhi'], site['dni_extra']
+    temp_air, wind_speed = site['temp_air'], site['wind_speed']
+    month_matrix, counts = site['month_matrix'], site['counts']
+    albedo = 0.25
+    gamma_pdc = -0.004
+    loss_factor = 25.0 + 6.84 * wind_speed  # Faiman defaults
+
+    # --- 2. Ground coverage ratio, number of modules and their derivatives
+    gcr = row_width / pitch
+    N_modules = ((area * gcr) / panel_area).astype(int)
+    dgcr = {'pitch' : -row_width / pitch**2, 'row_width' : 1 / pitch}
+
+    # --- 3. Ground view factor and its central differences
+    vf_ground_sky = ground_view_factor(tilt, gcr, height, pitch, interpolate=False)
+    dvf = {}
+    for name, step in [('tilt', 1e-3), ('pitch', 1e-4), ('height', 1e-4), ('row_width', 1e-4)]:
+        values = {'tilt' : tilt, 'pitch' : pitch, 'height' : height, 'row_width' : row_width}
+        upper = dict(values, **{name : values[name] + step})
+        lower = dict(values, **{name : values[name] - step})
+        if name == 'height':
+            lower['height'] = np.maximum(lower['height'], 0)
+        vf_upper = ground_view_factor(upper['tilt'], upper['row_width'] / upper['pitch'], upper['height'], upper['pitch'], interpolate=False)
+        vf_lower = ground_view_factor(lower['tilt'], lower['row_width'] / lower['pitch'], lower['height'], lower['pitch'], interpolate=False)
+        dvf[name] = (vf_upper - vf_lower) / (upper[name] - lower[name])
+
+    monthly = np.empty((n_designs, len(months), len(output_columns)))
+    gradient = np.zeros((n_designs, len(months), len(output_columns), len(gradient_parameters)))
+    monthly[:, :, 1] = ghi @ month_matrix / counts
+    index = {name : i for i, name in enumerate(gradient_parameters)}
+
+    cos_zenith, sin_zenith, tan_zenith = pvlib.tools.cosd(zenith), np.sin(np.radians(zenith)), np.tan(np.radians(zenith))
+    anisotropy = dni / dni_extra
+    for start in range(0, n_designs, chunk_size):
+        d = slice(start, start + chunk_size)
+        t = np.radians(tilt[d, None])
+        rotation = np.radians(solar_azimuth - azimuth[d, None])
+
+        # --- 4. Hay-Davies POA irradiance (design x hour) and its derivatives
+        projection = np.clip(np.cos(t) * cos_zenith + np.sin(t) * sin_zenith * np.cos(rotation), -1, 1)
+        dprojection_tilt = k * (-np.sin(t) * cos_zenith + np.cos(t) * sin_zenith * np.cos(rotation))
+        dprojection_azimuth = k * np.sin(t) * sin_zenith * np.sin(rotation)
+
+        direct = dni * projection > 0
+        circumsolar = (projection > 0) & (dhi * anisotropy > 0)
+        isotropic_term = dhi * (1 - anisotropy) * 0.5
+        isotropic = isotropic_term * (1 + np.cos(t)) > 0
+        circumsolar_factor = dhi * anisotropy / np.maximum(cos_zenith, 0.01745)
+
+        poa_global = (np.maximum(dni * projection, 0)
+                      + np.maximum(isotropic_term * (1 + np.cos(t)), 0)
+                      + np.maximum(circumsolar_factor * np.maximum(projection, 0), 0)
+                      + ghi * albedo * (1 - np.cos(t)) * 0.5)
+        dpoa_projection = np.where(direct, dni, 0) + np.where(circumsolar, circumsolar_factor, 0)
+        dpoa = {'tilt' : dpoa_projection * dprojection_tilt 
+                         - k * np.sin(t) * np.where(isotropic, isotropic_term, 0)
+                         + k * ghi * albedo * np.sin(t) * 0.5,
+                'azimuth' : dpoa_projection * dprojection_azimuth}
+
+        # --- 5. Faiman temperature and PVWatts power per W of rated power
+        temp_cell = temp_air + poa_global / loss_factor
+        power_per_watt = poa_global * 0.001 * (1 + gamma_pdc * (temp_cell - 25))
+        pdc0 = (rated_power[d] * N_modules[d])[:, None]
+        monthly[d, :, 0] = (power_per_watt * pdc0 / 1000.0) @ month_matrix
+        for name in ['tilt', 'azimuth']:
+            dpower = 0.001 * dpoa[name] * (1 + gamma_pdc * (temp_cell - 25) + gamma_pdc * poa_global / loss_factor)
+            gradient[d, :, 0, index[name]] = (dpower * pdc0 / 1000.0) @ month_matrix
+        for name in ['pitch', 'row_width']:
+            dpdc0 = (rated_power[d] * area[d] * dgcr[name][d] / panel_area[d])[:, None]
+            gradient[d, :, 0, index[name]] = (power_per_watt * dpdc0 / 1000.0) @ month_matrix
+
+        # --- 6. Irradiance at crop level
+        tan_phi = np.cos(rotation) * tan_zenith
+        q = np.cos(t) + np.sin(t) * tan_phi
+        shade = gcr[d, None] * np.abs(q)
+        unshaded_ground_fraction = np.where(zenith > 87, 0.0, 1.0 - np.minimum(1.0, shade))
+        partial = (zenith <= 87) & (shade < 1)
+        beam = dni * cos_zenith
+        monthly[d, :, 2] = (unshaded_ground_fraction * beam + vf_ground_sky[d, None] * dhi) @ month_matrix / counts
+
+        dq = {'tilt' : k * (-np.sin(t) + np.cos(t) * tan_phi),
+              'azimuth' : k * np.sin(t) * np.sin(rotation) * tan_zenith}
+        for name in gradient_parameters:
+            dfraction = 0.0
+            if name in dq:
+                dfraction = dfraction - gcr[d, None] * np.sign(q) * dq[name]
+            if name in dgcr:
+                dfraction = dfraction - dgcr[name][d, None] * np.abs(q)
+            dcrop = np.where(partial, dfraction, 0.0) * beam
+            if name in dvf:
+                dcrop = dcrop + dvf[name][d, None] * dhi
+            gradient[d, :, 2, index[name]] = np.broadcast_to(dcrop, (len(tilt[d]), len(zenith))) @ month_matrix / counts
+
+    return monthly, gradient
+
+def clearsky_weather(latitude : float = 35,
+                     longitude : float = 15,
+                     elevation : float = 10,
+                     start : str = '2024-01-01',
+                     end : str = '2025-01-01',
+                     freq : str = '1h',
+                     chunk : str = 'MS',
+                     clearsky_model : str = 'ineichen',
+                     ):
+    """
+    Description
+    -----------
+    Generator of clear-sky weather in chunks of one month (or year), 
+    so that long simulations at a fine resolution never hold the full time series.
+
+    Parameters
+    ----------
+    latitude : float
+        Latitude of the farm
+    longitude : float
+        Longitude of the farm
+    elevation : float 
+        Elevation of the farm
+    start : str
+        First timestamp of the simulation (UTC)
+    end : str
+        End of the simulation (UTC), not included
+    freq : str
+        Time step of the simulation, e.g. '1h', '15min' or '1min'
+    chunk : str
+        Length of a chunk as a pandas frequency, 'MS' for months or 'YS' for years
+    clearsky_model : str
+        Clear-sky model used by pvlib
+
+    Yields
+    ------
+    weather : pd.DataFrame
+        Chunk with the columns 'ghi', 'dni', 'dhi', 'apparent_zenith' and 'azimuth', indexed by time
+    """
+    location = pvlib.location.Location(latitude, longitude, altitude=elevation)
+    start = pd.Timestamp(start, tz='UTC')
+    end = pd.Timestamp(end, tz='UTC')
+    edges = sorted({start, end, *pd.date_range(start, end, freq=chunk)})
+
+    for chunk_start, chunk_end in zip(edges[:-1], edges[1:]):
+        times = pd.date_range(chunk_start, chunk_end, freq=freq, inclusive='left')
+        if len(times) == 0:
+            continue
+        solpos = location.get_solarposition(times)
+        clearsky = location.get_clearsky(times, model=clearsky_model, solar_position=solpos)
+        yield pd.DataFrame({
+            'ghi' : clearsky['ghi'],
+            'dni' : clearsky['dni'],
+            'dhi' : clearsky['dhi'],
+            'apparent_zenith' : solpos['apparent_zenith'],
+            'azimuth' : solpos['azimuth'],
+        })
+
+def energy_output_stream(latitude: float = 35, 
+                         longitude : float = 15,
+                         elevation : float = 10,
+                         height : float = 2.5,
+                         azimuth : float = 186,
+                         tilt : float = 0,
+                         row_width : float = 2*2.384,
+                         pitch : float =  7,
+                         area : float = 10000,
+                         panel_area : float = 1.7,
+                         rated_power : float = 440,
+                         weather = None,
+                         start : str = '2024-01-01',
+                         end : str = '2025-01-01',
+                         freq : str = '1h',
+                         chunk : str = 'MS',
+                         ):
+    """
+    Description
+    -----------
+    Same model as energy_output, but for any time horizon and resolution.
+    The weather is processed one chunk at a time and only the monthly sums are kept,
+    so the memory usage does not depend on the length of the simulation.
+
+    Parameters
+    ----------
+    See energy_output for the location and panel parameters
+    weather : iterable of pd.DataFrame
+        Chunks of weather data indexed by time (UTC) with the columns 'ghi', 'dni' and 'dhi' [W/m^2], 
+        and optionally 'temp_air' [°C], 'wind_speed' [m/s], 'apparent_zenith' and 'azimuth' [deg].
+        Defaults to clearsky_weather(latitude, longitude, elevation, start, end, freq, chunk)
+    start, end, freq, chunk : str
+        Passed to clearsky_weather when no weather is given
+
+    Returns
+    -------
+    energy : pd.Dataframe
+        Same columns as energy_output, with one row per simulated month (pd.PeriodIndex)
+        | Month   | Energy output [kWh] | Irradiation panels [W/m^2] | Irradiation crops [W/m^2] |
+        | ------- | ------------------- | -------------------------- | ------------------------- |
+        | 2024-01 | xxx                 | xxx                        | xxx                       |
+
+    Raises
+    ------
+    ValueError
+        If the weather has no chunks
+
+    Notes
+    -----
+    The energy of a time step is the power times the length of the time step, 
+    which is taken from the chunk itself (or freq for chunks with one timestamp).
+    Without 'temp_air' the air temperature is assumed to be 20 °C, as in energy_output.
+    """
+    if weather is None:
+        weather = clearsky_weather(latitude, longitude, elevation, start, end, freq, chunk)
+
+    location = pvlib.location.Location(latitude, longitude, altitude=elevation)
+    gcr = row_width / pitch
+    N_modules = int((area * gcr) / panel_area)
+    gamma_pdc = -0.004  # power temp coefficient
+
+    # The ground view factor does not depend on time
+    vf_ground_sky = pvlib.bifacial.utils.vf_ground_sky_2d_integ(
+        surface_tilt=tilt,
+        gcr=gcr,
+        height=height,
+        pitch=pitch,
+    )
+
+    totals = None
+    for data in weather:
+        times = data.index
+        if 'apparent_zenith' in data and 'azimuth' in data:
+            solar_zenith, solar_azimuth = data['apparent_zenith'], data['azimuth']
+        else:
+            solpos = location.get_solarposition(times)
+            solar_zenith, solar_azimuth = solpos['apparent_zenith'], solpos['azimuth']
+
+        poa = pvlib.irradiance.get_total_irradiance(
+            surface_tilt=tilt,
+            surface_azimuth=azimuth,
+            dni=data['dni'],
+            ghi=data['ghi'],
+            dhi=data['dhi'],
+            solar_zenith=solar_zenith,
+            solar_azimuth=solar_azimuth,
+            dni_extra=pvlib.irradiance.get_extra_radiation(times),
+            model='haydavies'
+        )
+
+        temp_cell = pvlib.temperature.faiman(
+            poa_global=poa['poa_global'], 
+            temp_air=data['temp_air'] if 'temp_air' in data else 20,
+            wind_speed=data['wind_speed'] if 'wind_speed' in data else 1.0,
+        )
+        power_dc = pvlib.pvsystem.pvwatts_dc(
+            effective_irradiance=poa['poa_global'],
+            temp_cell=temp_cell,
+            pdc0= rated_power * N_modules,  
+            gamma_pdc=gamma_pdc
+        )
+
+        step = np.median(np.diff(times.asi8)) if len(times) > 1 else pd.Timedelta(freq).value
+        step_hours = step / pd.Timedelta('1h').value
+
+        unshaded_ground_fraction = pvlib.bifacial.utils._unshaded_ground_fraction(
+            surface_tilt=tilt,
+            surface_azimuth=azimuth,
+            solar_zenith=solar_zenith,
+            solar_azimuth=solar_azimuth,
+            gcr=gcr,
+        )
+        crop_irradiance = (unshaded_ground_fraction * data['dni'] * pvlib.tools.cosd(solar_zenith)
+                           + vf_ground_sky * data['dhi'])
+
+        chunk_totals = pd.DataFrame({
+            'energy' : np.asarray(power_dc) / 1000.0 * step_hours,
+            'panels' : np.asarray(data['ghi']),
+            'crops' : np.asarray(crop_irradiance),
+            'count' : 1,
+        }, index=times).groupby(times.tz_convert(None).to_period('M')).sum()
+        totals = chunk_totals if totals is None else totals.add(chunk_totals, fill_value=0)
+    if totals is None:
+        raise ValueError("The weather has no chunks, check the weather iterable or the start and end of the simulation")
+
+    result = pd.DataFrame({
+    'Energy output [kWh]': totals['energy'],
+    'Irradiation panels [W/m^2]': totals['panels'] / totals['count'],
+    'Irradiation crops [W/m^2]': totals['crops'] / totals['count'],
+    })
+    result.index.name = None
+    return result
+
 if __name__ == '__main__':
     database = energy_output(tilt_tracking=True)
     print(database)
\ No newline at end of file
@@ -0,0 +1,214 @@
+import numpy as np
+from dataclasses import dataclass
+
+@dataclass
+class ParetoResult:
+    """
+    Description
+    -----------
+    Result of nsga2
+
+    Attributes
+    ----------
+    X : np.array
+        Non-dominated points (front x dimension)
+    F : np.array
+        Objectives of the non-dominated points (front x objective)
+    all_X : np.array
+        All evaluated points
+    all_F : np.array
+        Objectives of all evaluated points
+    """
+    X : np.array
+    F : np.array
+    all_X : np.array
+    all_F : np.array
+
+def non_dominated_ranks(F):
+    """
+    Description
+    -----------
+    Rank of the front of every point for minimization, 0 for the non-dominated points
+
+    Parameters
+    ----------
+    F : np.array
+        Objectives of shape (point x objective)
+
+    Returns
+    -------
+    ranks : np.array
+        Front number of every point
+    """
+    F = np.asarray(F, dtype=float)
+    # dominated[i, j] is True if point j dominates point i
+    dominated = np.all(F[np.newaxis] <= F[:, np.newaxis], axis=-1) & np.any(F[np.newaxis] < F[:, np.newaxis], axis=-1)
+    ranks = np.full(len(F), -1)
+    remaining = np.ones(len(F), dtype=bool)
+    rank = 0
+    while remaining.any():
+        front = remaining & ~np.any(dominated & remaining[np.newaxis], axis=1)
+        ranks[front] = rank
+        remaining &= ~front
+        rank += 1
+    return ranks
+
+def crowding_distance(F):
+    """
+    Description
+    -----------
+    Crowding distance of the points of one front, infinite at the extremes of every objective
+    """
+    F = np.asarray(F, dtype=float)
+    distance = np.zeros(len(F))
+    for objective in F.T:
+        order = np.argsort(objective)
+        span = objective[order[-1]] - objective[order[0]]
+        distance[order[[0, -1]]] = np.inf
+        if span > 0 and len(F) > 2:
+            distance[order[1:-1]] += (objective[order[2:]] - objective[order[:-2]]) / span
+    return distance
+
+def _select(F, size):
+    """
+    Description
+    -----------
+    Indices of the size best points by rank and crowding distance
+    """
+    ranks = non_dominated_ranks(F)
+    crowding = np.zeros(len(F))
+    for rank in np.unique(ranks):
+        crowding[ranks == rank] = crowding_distance(F[ranks == rank])
+    return np.lexsort((-crowding, ranks))[:size], ranks, crowding
+
+def _offspring(X, ranks, crowding, generator, eta_crossover = 15, eta_mutation = 20):
+    """
+    Description
+    -----------
+    Binary tournament, simulated binary crossover and polynomial mutation on the unit cube.
+    Returns the children and, for every child, the parent it was mostly derived from
+    """
+    n, dimension = X.shape
+
+    # Binary tournament on rank and crowding distance
+    a, b = generator.integers(n, size=(2, n))
+    better = (ranks[a] < ranks[b]) | ((ranks[a] == ranks[b]) & (crowding[a] > crowding[b]))
+    parents = X[np.where(better, a, b)]
+
+    # Simulated binary crossover of consecutive parents
+    first, second = parents[0::2], parents[1::2][:len(parents[0::2])]
+    if len(second) < len(first):
+        second = np.vstack([second, parents[:1]])
+    u = generator.random(first.shape)
+    beta = np.where(u <= 0.5, (2 * u) ** (1 / (eta_crossover + 1)), (1 / (2 * (1 - u))) ** (1 / (eta_crossover + 1)))
+    cross = generator.random(first.shape) < 0.5
+    beta = np.where(cross, beta, 1.0)
+    children = np.vstack([0.5 * ((1 + beta) * first + (1 - beta) * second),
+                          0.5 * ((1 - beta) * first + (1 + beta) * second)])[:n]
+    parents = np.vstack([first, second])[:n]
+
+    # Polynomial mutation
+    u = generator.random(children.shape)
+    delta = np.where(u < 0.5, (2 * u) ** (1 / (eta_mutation + 1)) - 1, 1 - (2 * (1 - u)) ** (1 / (eta_mutation + 1)))
+    mutate = generator.random(children.shape) < 1 / dimension
+    return np.clip(children + mutate * delta, 0, 1), parents
+
+def nsga2(evaluate,
+          bounds,
+          population : int = 40,
+          generations : int = 25,
+          constraints : list = None,
+          decimals : int = 6,
+          seed : int = None,
+          progress : bool = True):
+    """
+    Description
+    -----------
+    Pareto front of several objectives with NSGA-II. Every generation is evaluated in a single batch,
+    points that were evaluated before (after rounding) are taken from a cache.
+
+    Parameters
+    ----------
+    evaluate : callable
+        Called with the new points (n x dimension), returns the objectives (n x objective) to minimize
+    bounds : list
+        (lower, upper) for every dimension
+    population : int
+        Size of the population
+    generations : int
+        Number of generations
+    constraints : list
+        Cheap constraints, callables that take points (n x dimension) and return True for feasible points.
+        Infeasible children are replaced by their parents
+    decimals : int
+        Points are rounded to decimals (in the unit cube) before the cache lookup
+    seed : int
+        Seed of the random generator
+    progress : bool
+        Show a progress bar
+
+    Returns
+    -------
+    result : ParetoResult
+        Non-dominated points of all evaluations and all evaluations
+
+    Raises
+    ------
+    ValueError
+        If no feasible initial points are found
+
+    Notes
+    -----
+    K. Deb, A. Pratap, S. Agarwal and T. Meyarivan, A fast and elitist multiobjective genetic algorithm:
+    NSGA-II, IEEE Transactions on Evolutionary Computation 6 (2002)
+    """
+    from scipy.stats import qmc
+    from tqdm import tqdm
+    bounds = np.asarray(bounds, dtype=float)
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    scale = lambda unit: lower + unit * (upper - lower)
+    generator = np.random.default_rng(seed)
+
+    def feasible(unit):
+        mask = np.ones(len(unit), dtype=bool)
+        for constraint in constraints or []:
+            mask &= np.asarray(constraint(scale(unit)), dtype=bool)
+        return mask
+
+    cache = {}
+    def objectives(unit):
+        unit = np.round(unit, decimals)
+        keys = [point.tobytes() for point in unit]
+        new = list(dict.fromkeys(key for key in keys if key not in cache))
+        if new:
+            points = np.array([np.frombuffer(key) for key in new])
+            cache.update(zip(new, np.asarray(evaluate(scale(points)), dtype=float)))
+        return unit, np.array([cache[key] for key in keys])
+
+    sample = qmc.LatinHypercube(d=len(bounds), seed=generator).random(20 * population)
+    sample = sample[feasible(sample)][:population]
+    if len(sample) == 0:
+        raise ValueError("No feasible initial points found, check the bounds and constraints")
+    X, F = objectives(sample)
+
+    for _ in tqdm(range(generations), disable=not progress):
+        _, ranks, crowding = _select(F, len(F))
+        children, parents = _offspring(X, ranks, crowding, generator)
+        children = np.where(feasible(children)[:, np.newaxis], children, parents)
+        children, children_F = objectives(children)
+
+        X = np.vstack([X, children])
+        F = np.vstack([F, children_F])
+        _, unique = np.unique(X, axis=0, return_index=True)
+        X, F = X[np.sort(unique)], F[np.sort(unique)]
+        selected, _, _ = _select(F, population)
+        X, F = X[selected], F[selected]
+
+    all_X = np.array([np.frombuffer(key) for key in cache])
+    all_F = np.array(list(cache.values()))
+    front = non_dominated_ranks(all_F) == 0
+    order = np.argsort(all_F[front, 0])
+    return ParetoResult(X = scale(all_X[front][order]),
+                        F = all_F[front][order],
+                        all_X = scale(all_X),
+                        all_F = all_F)
@@ -0,0 +1,425 @@
+import os
+import sys
+import io
+import json
+import time
+import glob
+import pstats
+import cProfile
+import tracemalloc
+import contextlib
+import functools
+import numpy as np
+import pandas as pd
+
+# Environment variables with the profiling settings, also seen by worker processes
+profile_variable = "MAGRIVOLTAICS_PROFILE"
+hook_variable = "MAGRIVOLTAICS_PROFILE_HOOK"
+
+# Instrumented stages of the model, in the order of the pipeline
+stages = ["solar position", "clear-sky", "POA", "temperature", "PVWatts",
+          "view factors", "crop irradiance", "agriculture", "economics"]
+
+# Hooks that can be attached to one stage
+hooks = ["cprofile", "tracemalloc"]
+
+class Profiler:
+    """
+    Description
+    -----------
+    Per-stage timings of the current process. Every call of a stage is recorded as an event with
+    the wall time (perf_counter_ns), the CPU time of the process (process_time_ns) and the net number
+    of allocated Python memory blocks. Optionally one stage runs under cProfile or tracemalloc.
+
+    Parameters
+    ----------
+    directory : str
+        Directory to which flush writes the events (and cProfile statistics) of this process,
+        so the events of worker processes can be combined. None keeps them in memory only
+    hook_stage : str
+        Stage that runs under the hook
+    hook : str
+        'cprofile' or 'tracemalloc'. tracemalloc adds the peak and net traced bytes to the events of the stage
+
+    Raises
+    ------
+    ValueError
+        If the hook is not recognized
+    """
+    def __init__(self, directory : str = None, hook_stage : str = None, hook : str = "cprofile"):
+        if hook not in hooks:
+            raise ValueError(f"Hook {hook} not recognized. Choose one of: {', '.join(hooks)}")
+        self.directory = directory
+        self.hook_stage = hook_stage
+        self.hook = hook
+        self.pid = os.getpid()
+        self.events = []
+        self.cprofile = cProfile.Profile() if hook_stage is not None and hook == "cprofile" else None
+        self._depth = 0
+        self._active = set()
+        self._hooked = False
+
+    @contextlib.contextmanager
+    def stage(self, name : str):
+        """
+        Description
+        -----------
+        Context manager that records one call of a stage.
+        A stage called inside the same stage is part of the outer call and not recorded again.
+        """
+        if name in self._active:
+            yield
+            return
+        hooked = name == self.hook_stage and not self._hooked
+        if hooked:
+            self._hooked = True
+            if self.hook == "cprofile":
+                self.cprofile.enable()
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                tracemalloc.reset_peak()
+                traced = tracemalloc.get_traced_memory()[0]
+        depth = self._depth
+        self._depth += 1
+        self._active.add(name)
+        blocks = sys.getallocatedblocks()
+        cpu = time.process_time_ns()
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter_ns() - start
+            cpu = time.process_time_ns() - cpu
+            event = {"stage" : name, "pid" : self.pid, "depth" : depth, "start_ns" : start,
+                     "wall_ns" : wall, "cpu_ns" : cpu, "blocks" : sys.getallocatedblocks() - blocks}
+            self._depth -= 1
+            self._active.discard(name)
+            if hooked:
+                self._hooked = False
+                if self.hook == "cprofile":
+                    self.cprofile.disable()
+                else:
+                    current, peak = tracemalloc.get_traced_memory()
+                    event["traced_bytes"] = current - traced
+                    event["peak_bytes"] = peak - traced
+            self.events.append(event)
+
+    def flush(self):
+        """
+        Description
+        -----------
+        Append the recorded events to <directory>/events-<pid>.jsonl and save the cProfile
+        statistics, the events are then removed from memory
+        """
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"events-{self.pid}.jsonl"), "a") as file:
+            file.writelines(json.dumps(event) + "\n" for event in self.events)
+        self.events = []
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(os.path.join(self.directory, f"cprofile-{self.pid}.prof"))
+
+_profiler = None
+
+def enable_profiling(directory : str = None, hook_stage : str = None, hook : str = "cprofile"):
+    """
+    Description
+    -----------
+    Record the timings of all stages from now on. With a directory, the setting is passed to
+    worker processes through environment variables and run_sweep flushes their events to the directory.
+    Use disable_profiling to stop.
+
+    Parameters
+    ----------
+    directory : str
+        Directory for the events of all processes, see Profiler
+    hook_stage : str
+        Stage that runs under cProfile or tracemalloc, one of stages
+    hook : str
+        'cprofile' or 'tracemalloc'
+
+    Returns
+    -------
+    profiler : Profiler
+        Profiler of the current process
+
+    Raises
+    ------
+    ValueError
+        If the stage or hook is not recognized
+    """
+    global _profiler
+    if hook_stage is not None and hook_stage not in stages:
+        raise ValueError(f"Stage {hook_stage} not recognized. Choose one of: {', '.join(stages)}")
+    _profiler = Profiler(directory, hook_stage, hook)
+    if directory is None:
+        os.environ.pop(profile_variable, None)
+        os.environ.pop(hook_variable, None)
+    else:
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "events-*.jsonl")) + glob.glob(os.path.join(directory, "cprofile-*.prof")):
+            os.remove(path)
+        os.environ[profile_variable] = os.path.abspath(directory)
+        os.environ[hook_variable] = json.dumps([hook_stage, hook])
+    return _profiler
+
+def disable_profiling():
+    """
+    Description
+    -----------
+    Stop recording, the events recorded so far are returned
+
+    Returns
+    -------
+    events : list
+        See profile_events
+    """
+    global _profiler
+    events = profile_events()
+    _profiler = None
+    os.environ.pop(profile_variable, None)
+    os.environ.pop(hook_variable, None)
+    return events
+
+def get_profiler():
+    """
+    Description
+    -----------
+    Profiler of the current process, None if profiling is disabled.
+    Worker processes create their own profiler from the environment variables.
+    """
+    global _profiler
+    if _profiler is not None and _profiler.pid == os.getpid():
+        return _profiler
+    directory = os.environ.get(profile_variable)
+    if not directory:
+        # A profiler copied into a forked worker without a directory records nothing
+        return None
+    hook_stage, hook = json.loads(os.environ.get(hook_variable, '[null, "cprofile"]'))
+    _profiler = Profiler(directory, hook_stage, hook)
+    return _profiler
+
+_disabled = contextlib.nullcontext()
+
+def stage(name : str):
+    """
+    Description
+    -----------
+    Context manager around one stage of the model, records its timing when profiling is enabled
+
+    Examples
+    --------
+    >>> with stage("POA"):
+    ...     poa = pvlib.irradiance.get_total_irradiance(...)
+    """
+    profiler = get_profiler()
+    return _disabled if profiler is None else profiler.stage(name)
+
+def profiled(name : str):
+    """
+    Description
+    -----------
+    Decorator that records every call of a function as the stage name, see stage
+
+    Examples
+    --------
+    >>> @profiled("economics")
+    ... def economics_batch(...):
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def flush_profile():
+    """
+    Description
+    -----------
+    Write the events of the current process to the profiling directory, e.g. at the end of a worker task
+    """
+    profiler = get_profiler()
+    if profiler is not None:
+        profiler.flush()
+
+def profile_events():
+    """
+    Description
+    -----------
+    All recorded events: those in memory of the current process and those flushed
+    to the profiling directory by any process
+
+    Returns
+    -------
+    events : list
+        One dictionary per call of a stage, see Profiler
+    """
+    profiler = get_profiler()
+    if profiler is None:
+        return []
+    events = list(profiler.events)
+    if profiler.directory is not None:
+        for path in sorted(glob.glob(os.path.join(profiler.directory, "events-*.jsonl"))):
+            with open(path) as file:
+                events.extend(json.loads(line) for line in file if line.strip())
+    return events
+
+def profile_summary(events : list = None):
+    """
+    Description
+    -----------
+    Statistics of every stage over all its calls
+
+    Parameters
+    ----------
+    events : list
+        Events of profile_events, defaults to all recorded events
+
+    Returns
+    -------
+    summary : pd.DataFrame
+        One row per stage (in pipeline order) with the number of calls, total, mean, median, 95th percentile
+        and maximum wall time, the total CPU time and the mean net number of allocated blocks
+    """
+    events = profile_events() if events is None else events
+    df = pd.DataFrame(events, columns=["stage", "wall_ns", "cpu_ns", "blocks"])
+    rows = {}
+    order = [name for name in stages if name in set(df["stage"])] + sorted(set(df["stage"]) - set(stages))
+    for name in order:
+        wall = df.loc[df["stage"] == name, "wall_ns"].to_numpy() / 1e9
+        cpu = df.loc[df["stage"] == name, "cpu_ns"].to_numpy() / 1e9
+        rows[name] = {"Calls" : len(wall),
+                      "Wall total [s]" : wall.sum(),
+                      "Wall mean [ms]" : 1e3 * wall.mean(),
+                      "Wall median [ms]" : 1e3 * np.median(wall),
+                      "Wall p95 [ms]" : 1e3 * np.percentile(wall, 95),
+                      "Wall max [ms]" : 1e3 * wall.max(),
+                      "CPU total [s]" : cpu.sum(),
+                      "Allocated blocks" : df.loc[df["stage"] == name, "blocks"].mean()}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+def profile_histograms(events : list = None, bins : int = 20):
+    """
+    Description
+    -----------
+    Histograms of the wall time of every stage, on logarithmic bins shared by all stages
+
+    Parameters
+    ----------
+    events : list
+        Events of profile_events, defaults to all recorded events
+    bins : int
+        Number of bins
+
+    Returns
+    -------
+    histograms : dict
+        {stage : (counts, edges)} with the bin edges in seconds
+    """
+    events = profile_events() if events is None else events
+    if not events:
+        return {}
+    wall = np.array([event["wall_ns"] for event in events], dtype=float) / 1e9
+    edges = np.geomspace(max(wall.min(), 1e-9), max(wall.max(), 2e-9), bins + 1)
+    names = [event["stage"] for event in events]
+    return {name : (np.histogram(wall[np.array(names) == name], edges)[0], edges) for name in dict.fromkeys(names)}
+
+def export_profile(path : str, events : list = None, format : str = "json"):
+    """
+    Description
+    -----------
+    Save the recorded events
+
+    Parameters
+    ----------
+    path : str
+        Output file
+    events : list
+        Events of profile_events, defaults to all recorded events
+    format : str
+        'json' for the events, summary and histograms, or
+        'chrome' for the Chrome trace event format (chrome://tracing or https://ui.perfetto.dev),
+        with one row per process
+
+    Raises
+    ------
+    ValueError
+        If the format is not recognized
+    """
+    events = profile_events() if events is None else events
+    if format == "json":
+        content = {"events" : events,
+                   "summary" : json.loads(profile_summary(events).to_json(orient="index")),
+                   "histograms" : {name : {"counts" : counts.tolist(), "edges [s]" : edges.tolist()}
+                                   for name, (counts, edges) in profile_histograms(events).items()}}
+    elif format == "chrome":
+        content = {"traceEvents" : [{"name" : event["stage"], "cat" : "stage", "ph" : "X",
+                                     "ts" : event["start_ns"] / 1e3, "dur" : event["wall_ns"] / 1e3,
+                                     "pid" : event["pid"], "tid" : event["pid"],
+                                     "args" : {key : value for key, value in event.items()
+                                               if key not in ["stage", "pid", "start_ns", "wall_ns"]}}
+                                    for event in events],
+                   "displayTimeUnit" : "ms"}
+    else:
+        raise ValueError(f"Format {format} not recognized. Choose one of: json, chrome")
+    with open(path, "w") as file:
+        json.dump(content, file)
+
+def hook_report(limit : int = 30):
+    """
+    Description
+    -----------
+    cProfile statistics of the hooked stage, combined over all processes
+
+    Parameters
+    ----------
+    limit : int
+        Number of functions, sorted by cumulative time
+
+    Returns
+    -------
+    report : str
+        Output of pstats, empty if no stage is hooked with cProfile
+    """
+    profiler = get_profiler()
+    if profiler is None or profiler.cprofile is None:
+        return ""
+    profiler.cprofile.create_stats()
+    sources = [profiler.cprofile] if profiler.cprofile.stats else []
+    if profiler.directory is not None:
+        sources += [path for path in glob.glob(os.path.join(profiler.directory, "cprofile-*.prof"))
+                    if path != os.path.join(profiler.directory, f"cprofile-{profiler.pid}.prof")]
+    if not sources:
+        return ""
+    stream = io.StringIO()
+    pstats.Stats(*sources, stream=stream).sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+@contextlib.contextmanager
+def measured():
+    """
+    Description
+    -----------
+    Record the stages of a block of code in the current process only, without changing the
+    profiling settings outside the block
+
+    Examples
+    --------
+    >>> with measured() as profiler:
+    ...     interface()
+    >>> print(profile_summary(profiler.events))
+    """
+    global _profiler
+    previous = _profiler, os.environ.pop(profile_variable, None), os.environ.pop(hook_variable, None)
+    _profiler = Profiler()
+    try:
+        yield _profiler
+    finally:
+        _profiler = previous[0]
+        if previous[1] is not None:
+            os.environ[profile_variable] = previous[1]
+            os.environ[hook_variable] = previous[2]
@@ -0,0 +1,278 @@
+import os
+import pickle
+import hashlib
+import inspect
+import zipfile
+import functools
+import numpy as np
+import pandas as pd
+
+# Environment variables with the store directory and size, also seen by worker processes
+store_variable = "MAGRIVOLTAICS_STORE"
+max_bytes_variable = "MAGRIVOLTAICS_STORE_MAX_BYTES"
+default_max_bytes = 2 * 1024**3
+
+# A full store is pruned to this fraction of its maximum size, so that not every next put prunes again
+prune_fraction = 0.8
+
+def _normalize(value):
+    """
+    Description
+    -----------
+    Convert a function argument to a picklable structure that only depends on its content,
+    so that e.g. 36 and 36.0 or two equal arrays give the same hash
+    """
+    if isinstance(value, (bool, str, type(None))):
+        return value
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.dtype.str, value.shape, np.ascontiguousarray(value).tobytes())
+    if isinstance(value, pd.Series):
+        return ("Series", _normalize(value.to_numpy()), tuple(map(str, value.index)), str(value.name))
+    if isinstance(value, pd.DataFrame):
+        return ("DataFrame", _normalize(value.to_numpy()), tuple(map(str, value.index)), tuple(map(str, value.columns)))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize(v)) for k, v in value.items()))
+    return repr(value)
+
+def content_hash(*values):
+    """
+    Description
+    -----------
+    SHA-256 hash of the content of the given values
+
+    Parameters
+    ----------
+    values : any
+        Numbers, strings, arrays, DataFrames or (nested) lists/dicts of them
+
+    Returns
+    -------
+    hash : str
+        Hexadecimal hash
+    """
+    return hashlib.sha256(pickle.dumps(_normalize(values), protocol=4)).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def code_version(function):
+    """
+    Description
+    -----------
+    Hash of the source file of a function, so stored results are not reused after the code changed
+    """
+    with open(inspect.getsourcefile(inspect.unwrap(function)), 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+def frame_to_arrays(df : pd.DataFrame):
+    """
+    Description
+    -----------
+    Convert a numeric DataFrame to a dictionary of arrays that can be stored in the result store.
+    A numeric index keeps its dtype, any other index is stored as strings
+    """
+    numeric = pd.api.types.is_numeric_dtype(df.index.dtype)
+    return {"values" : df.to_numpy(dtype=float),
+            "index" : np.asarray(df.index) if numeric else np.array(df.index, dtype=str),
+            "index_dtype" : np.array(df.index.dtype.str if numeric else "object"),
+            "columns" : np.array(df.columns, dtype=str),
+            "dtypes" : np.array([dtype.str for dtype in df.dtypes], dtype=str)}
+
+def arrays_to_frame(arrays : dict):
+    """
+    Description
+    -----------
+    Inverse of frame_to_arrays
+    """
+    columns = arrays["columns"].tolist()
+    index = pd.Index(arrays["index"].tolist())
+    if "index_dtype" in arrays and str(arrays["index_dtype"]) != "object":
+        index = index.astype(str(arrays["index_dtype"]))
+    df = pd.DataFrame(arrays["values"], index=index, columns=columns)
+    return df.astype(dict(zip(columns, arrays["dtypes"])))
+
+class ResultStore:
+    """
+    Description
+    -----------
+    Directory of NPZ files with computed results, e.g. the hourly solar geometry of a site
+    or the monthly output of a batch of designs. Every entry is stored as <kind>/<key>.npz,
+    where the key is a hash of the inputs and the code version.
+    The modification time of a file is its last use, the least recently used entries are
+    removed when the store grows beyond max_bytes, until it is below prune_fraction of max_bytes.
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the store, created if it does not exist
+    max_bytes : int
+        Maximum total size of the store [bytes]
+
+    Notes
+    -----
+    Files are written to a temporary file and renamed, so several processes can share the store.
+    """
+    def __init__(self, directory : str, max_bytes : int = default_max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._bytes = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, kind, key):
+        return os.path.join(self.directory, kind, f"{key}.npz")
+
+    def get(self, kind : str, key : str):
+        """
+        Description
+        -----------
+        Load an entry, returns a dictionary of arrays or None if it is not in the store
+        """
+        path = self._path(kind, key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name : data[name] for name in data.files}
+            os.utime(path)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+        return arrays
+
+    def put(self, kind : str, key : str, arrays : dict):
+        """
+        Description
+        -----------
+        Store a dictionary of arrays and prune the store if it became too large
+        """
+        path = self._path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as file:
+            np.savez(file, **arrays)
+        # An overwritten entry no longer counts
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(temporary, path)
+
+        if self._bytes is None:
+            self._bytes = self.size()
+        else:
+            self._bytes += os.path.getsize(path) - replaced
+        if self._bytes > self.max_bytes:
+            self.prune(int(prune_fraction * self.max_bytes))
+
+    def index(self):
+        """
+        Description
+        -----------
+        Table of all entries, least recently used first. Also written to index.csv in the store.
+
+        Returns
+        -------
+        index : pd.DataFrame
+            | kind | key | Size [bytes] | Last used |
+        """
+        entries = []
+        for kind in sorted(os.listdir(self.directory)):
+            if not os.path.isdir(os.path.join(self.directory, kind)):
+                continue
+            for file in os.listdir(os.path.join(self.directory, kind)):
+                if not file.endswith(".npz"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, kind, file))
+                except OSError:
+                    continue
+                entries.append({"kind" : kind,
+                                "key" : file[:-len(".npz")],
+                                "Size [bytes]" : stat.st_size,
+                                "Last used" : stat.st_mtime})
+        index = pd.DataFrame(entries, columns=["kind", "key", "Size [bytes]", "Last used"])
+        index = index.sort_values("Last used", ignore_index=True)
+        temporary = os.path.join(self.directory, f"index.csv.{os.getpid()}.tmp")
+        index.to_csv(temporary, index=False)
+        os.replace(temporary, os.path.join(self.directory, "index.csv"))
+        return index
+
+    def size(self):
+        """
+        Description
+        -----------
+        Total size of the stored entries [bytes]
+        """
+        return int(self.index()["Size [bytes]"].sum())
+
+    def prune(self, max_bytes : int = None):
+        """
+        Description
+        -----------
+        Remove the least recently used entries until the store is smaller than max_bytes
+
+        Returns
+        -------
+        removed : int
+            Number of removed bytes
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        index = self.index()
+        total = int(index["Size [bytes]"].sum())
+        removed = 0
+        for kind, key, size in zip(index["kind"], index["key"], index["Size [bytes]"]):
+            if total - removed <= max_bytes:
+                break
+            try:
+                os.remove(self._path(kind, key))
+                removed += size
+            except OSError:
+                pass
+        self._bytes = total - removed
+        self.index()
+        return removed
+
+    def clear(self, kind : str = None):
+        """
+        Description
+        -----------
+        Remove all entries, or all entries of one kind
+        """
+        index = self.index()
+        for entry_kind, key in zip(index["kind"], index["key"]):
+            if kind is None or entry_kind == kind:
+                try:
+                    os.remove(self._path(entry_kind, key))
+                except OSError:
+                    pass
+        self._bytes = None
+        self.index()
+
+def enable_result_store(directory : str, max_bytes : int = default_max_bytes):
+    """
+    Description
+    -----------
+    Use the result store in directory for the site weather, batched energy outputs and interface stages.
+    The setting is passed to worker processes through environment variables.
+    Use enable_result_store(None) to disable the store.
+    """
+    if directory is None:
+        os.environ.pop(store_variable, None)
+        os.environ.pop(max_bytes_variable, None)
+    else:
+        os.environ[store_variable] = os.path.abspath(directory)
+        os.environ[max_bytes_variable] = str(int(max_bytes))
+
+@functools.lru_cache(maxsize=None)
+def _open_store(directory, max_bytes):
+    return ResultStore(directory, max_bytes)
+
+def get_result_store():
+    """
+    Description
+    -----------
+    The enabled result store, or None if no store is enabled
+    """
+    directory = os.environ.get(store_variable)
+    if not directory:
+        return None
+    return _open_store(directory, int(os.environ.get(max_bytes_variable, default_max_bytes)))
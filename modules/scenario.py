@@ -0,0 +1,197 @@
+import os
+import csv
+import math
+import dataclasses
+from dataclasses import dataclass, field, fields
+from modules.agriculture import crop_library
+
+input_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "inputs")
+
+# Allowed (lower, upper) range of the numeric inputs, None for no limit
+scenario_limits = {"area" : (0, None),
+                   "latitude" : (-90, 90),
+                   "longitude" : (-180, 180),
+                   "height" : (0, None),
+                   "azimuth" : (0, 360),
+                   "tilt" : (0, 90),
+                   "row_width" : (0, None),
+                   "pitch" : (0, None),
+                   "panel_area" : (0, None),
+                   "rated_power" : (0, None),
+                   "lifetime" : (0, None),
+                   "max_angle" : (0, 90)}
+
+# Inputs of which the lower limit is excluded, the model divides by them or scales with them
+positive_inputs = ["area", "row_width", "pitch", "panel_area", "rated_power", "lifetime"]
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        if value.strip().lower() in ["true", "1"]:
+            return True
+        if value.strip().lower() in ["false", "0", ""]:
+            return False
+        raise ValueError(f"{value} is not a boolean. Choose one of: True, False")
+    return bool(value)
+
+@dataclass(frozen=True, slots=True)
+class Scenario:
+    """
+    Description
+    -----------
+    All inputs of interface for one farm, parsed and validated once.
+    Scenarios are immutable and hashable, so they can be used as cache keys,
+    and replace gives a copy with some inputs changed, e.g. for sweeps.
+
+    Attributes
+    ----------
+    See interface, strings such as "30" or "True" (from input files) are converted to the field types
+
+    Raises
+    ------
+    ValueError
+        If an input can not be converted, is outside scenario_limits,
+        the pitch is not larger than the row width or the crop is not in the crop library
+
+    Notes
+    -----
+    measure_time does not change the results, so it is not part of the hash or comparison.
+
+    Examples
+    --------
+    >>> scenario = Scenario.from_file("ideal_inputs.csv")
+    >>> monthly_df, single_df = interface(**scenario.replace(tilt=20).to_dict())
+    """
+    crop_type : str = "potatoes"
+    area : float = 100000
+    latitude : float = 36
+    longitude : float = 14.5
+    elevation : float = 10
+    height : float = 3
+    azimuth : float = 180
+    tilt : float = 30
+    row_width : float = 4
+    pitch : float = 9
+    panel_area : float = 2.42
+    rated_power : float = 580
+    lifetime : float = 30
+    weather_file : str = None
+    measure_time : bool = field(default=False, compare=False)
+    tilt_tracking : bool = False
+    max_angle : float = 60
+
+    def __post_init__(self):
+        # Frozen dataclass, the converted values are set with object.__setattr__
+        set_field = lambda name, value: object.__setattr__(self, name, value)
+        set_field("crop_type", str(self.crop_type).strip().strip('"').lower())
+        weather_file = None if self.weather_file is None else str(self.weather_file).strip()
+        set_field("weather_file", None if weather_file in ["", "None"] else weather_file)
+        for name in ["measure_time", "tilt_tracking"]:
+            set_field(name, _parse_bool(getattr(self, name)))
+        for item in fields(self):
+            if item.type is float:
+                try:
+                    value = float(getattr(self, item.name))
+                except (TypeError, ValueError):
+                    raise ValueError(f"{item.name} = {getattr(self, item.name)} is not a number")
+                if not math.isfinite(value):
+                    raise ValueError(f"{item.name} = {value} is not finite")
+                set_field(item.name, value)
+
+        for name, (lower, upper) in scenario_limits.items():
+            value = getattr(self, name)
+            exclusive = name in positive_inputs
+            if (lower is not None and (value < lower or (exclusive and value == lower))) or (upper is not None and value > upper):
+                raise ValueError(f"{name} = {value} is outside the range {'(' if exclusive else '['}{lower}, {upper}]")
+        if self.pitch <= self.row_width:
+            raise ValueError(f"The pitch ({self.pitch}) must be larger than the row width ({self.row_width})")
+        if self.crop_type not in crop_library()["names"]:
+            raise ValueError(f"Crop type {self.crop_type} not recognized. Choose one of: {', '.join(crop_library()['names'])}")
+
+    def replace(self, **overrides):
+        """
+        Description
+        -----------
+        Validated copy of the scenario with the given inputs changed
+        """
+        return dataclasses.replace(self, **overrides)
+
+    def to_dict(self, measure_time : bool = True):
+        """
+        Description
+        -----------
+        Inputs as keyword arguments of interface, without measure_time for
+        functions that do not accept it (e.g. parameter_sweep and evaluate_points)
+        """
+        return {item.name : getattr(self, item.name) for item in fields(self)
+                if measure_time or item.name != "measure_time"}
+
+    @classmethod
+    def from_file(cls, input_file : str = "verification_inputs.csv"):
+        """
+        Description
+        -----------
+        Read a scenario from a file with one "name,value" row per input, such as inputs/ideal_inputs.csv.
+        A file name without a directory is looked up in inputs/, missing inputs use the defaults
+        """
+        if not input_file.endswith(".csv"):
+            input_file = f"{input_file}.csv"
+        if os.path.dirname(input_file) == "":
+            input_file = os.path.join(input_directory, input_file)
+        with open(input_file, newline="") as file:
+            rows = [row for row in csv.reader(file, skipinitialspace=True) if row]
+        return cls(**{name.strip() : value for name, value in rows})
+
+def load_scenarios(path : str):
+    """
+    Description
+    -----------
+    Read many scenarios from a single csv file with a header of input names and one row per scenario.
+    Missing columns and empty values use the defaults of Scenario
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+
+    Returns
+    -------
+    scenarios : list
+        List of Scenario
+
+    Raises
+    ------
+    ValueError
+        If a column is not an input or a row is not valid, with the line number of the row
+    """
+    names = [item.name for item in fields(Scenario)]
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file, skipinitialspace=True)
+        unknown = [name for name in reader.fieldnames or [] if name not in names]
+        if unknown:
+            raise ValueError(f"Columns {unknown} of {path} not recognized. Choose from: {names}")
+        scenarios = []
+        for row in reader:
+            try:
+                scenarios.append(Scenario(**{name : value for name, value in row.items() if value != ""}))
+            except ValueError as error:
+                raise ValueError(f"{path}, line {reader.line_num}: {error}") from error
+    return scenarios
+
+def save_scenarios(path : str, scenarios : list):
+    """
+    Description
+    -----------
+    Write scenarios to a single csv file that can be read with load_scenarios
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+    scenarios : list
+        List of Scenario
+    """
+    names = [item.name for item in fields(Scenario)]
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(names)
+        writer.writerows([["" if value is None else value for value in scenario.to_dict().values()] for scenario in scenarios])
@@ -0,0 +1,197 @@
+import numpy as np
+
+def saltelli_sample(bounds, N : int = 1024, seed : int = None):
+    """
+    Description
+    -----------
+    Saltelli sample matrix for first- and total-order Sobol indices
+
+    Parameters
+    ----------
+    bounds : list
+        (lower, upper) for every input
+    N : int
+        Number of base samples, preferably a power of 2
+    seed : int
+        Seed of the scrambled Sobol sequence
+
+    Returns
+    -------
+    X : np.array
+        Sample of shape (N * (inputs + 2) x inputs), the blocks of N rows are A, B and
+        A with column i taken from B (AB_i) for every input i
+    """
+    from scipy.stats import qmc
+    bounds = np.asarray(bounds, dtype=float)
+    dimension = len(bounds)
+    base = qmc.Sobol(d=2 * dimension, scramble=True, seed=seed).random(N)
+    A, B = base[:, :dimension], base[:, dimension:]
+    blocks = [A, B]
+    for i in range(dimension):
+        AB = A.copy()
+        AB[:, i] = B[:, i]
+        blocks.append(AB)
+    return qmc.scale(np.vstack(blocks), bounds[:, 0], bounds[:, 1])
+
+def sobol_indices(Y, dimension : int, n_bootstrap : int = 1000, confidence : float = 0.95, seed : int = None):
+    """
+    Description
+    -----------
+    First- and total-order Sobol indices of the outputs of a Saltelli sample,
+    with bootstrap confidence intervals
+
+    Parameters
+    ----------
+    Y : np.array
+        Outputs of the rows of saltelli_sample, shape (N * (dimension + 2)) or (N * (dimension + 2) x output)
+    dimension : int
+        Number of inputs
+    n_bootstrap : int
+        Number of bootstrap resamples
+    confidence : float
+        Confidence level of the intervals
+    seed : int
+        Seed of the bootstrap
+
+    Returns
+    -------
+    indices : dict
+        'S1', 'ST' and their 'S1 low', 'S1 high', 'ST low', 'ST high' bounds,
+        each of shape (dimension) or (dimension x output)
+
+    Notes
+    -----
+    Estimators of Saltelli et al. (2010) for S1 and Jansen (1999) for ST,
+    A. Saltelli et al., Variance based sensitivity analysis of model output,
+    Computer Physics Communications 181 (2010)
+    """
+    Y = np.asarray(Y, dtype=float)
+    single = Y.ndim == 1
+    Y = Y.reshape(dimension + 2, -1, *([1] if single else Y.shape[1:]))
+    N = Y.shape[1]
+    fA, fB, fAB = Y[0], Y[1], Y[2:]
+
+    def estimate(rows):
+        # rows : (resample x N) indices, results of shape (resample x dimension x output)
+        A, B, AB = fA[rows], fB[rows], fAB[:, rows]
+        variance = np.var(np.concatenate([A, B], axis=1), axis=1)
+        S1 = np.mean(B * (AB - A), axis=2) / variance
+        ST = 0.5 * np.mean((A - AB) ** 2, axis=2) / variance
+        return np.moveaxis(S1, 0, 1), np.moveaxis(ST, 0, 1)
+
+    S1, ST = estimate(np.arange(N)[np.newaxis])
+    generator = np.random.default_rng(seed)
+    S1_boot, ST_boot = [], []
+    for start in range(0, n_bootstrap, 100):
+        s1, st = estimate(generator.integers(N, size=(min(100, n_bootstrap - start), N)))
+        S1_boot.append(s1)
+        ST_boot.append(st)
+    S1_boot, ST_boot = np.concatenate(S1_boot), np.concatenate(ST_boot)
+
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+    indices = {"S1" : S1[0], "ST" : ST[0]}
+    indices["S1 low"], indices["S1 high"] = np.quantile(S1_boot, quantiles, axis=0)
+    indices["ST low"], indices["ST high"] = np.quantile(ST_boot, quantiles, axis=0)
+    if single:
+        indices = {name : value[..., 0] for name, value in indices.items()}
+    return indices
+
+def morris_sample(bounds, trajectories : int = 100, levels : int = 4, seed : int = None):
+    """
+    Description
+    -----------
+    Sample of Morris elementary-effect trajectories, every trajectory changes one input at a time
+
+    Parameters
+    ----------
+    bounds : list
+        (lower, upper) for every input
+    trajectories : int
+        Number of trajectories
+    levels : int
+        Number of grid levels of every input (even)
+    seed : int
+        Seed of the random generator
+
+    Returns
+    -------
+    X : np.array
+        Sample of shape (trajectories * (inputs + 1) x inputs)
+    """
+    from scipy.stats import qmc
+    bounds = np.asarray(bounds, dtype=float)
+    dimension = len(bounds)
+    generator = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+
+    # Start on the lower half of the grid, so that every step of +delta stays inside [0, 1]
+    start = generator.integers(levels // 2, size=(trajectories, 1, dimension)) / (levels - 1)
+    order = np.argsort(generator.random((trajectories, dimension)), axis=1)
+    sign = generator.choice([-1, 1], size=(trajectories, 1, dimension))
+    steps = np.zeros((trajectories, dimension + 1, dimension))
+    for j in range(dimension):
+        steps[np.arange(trajectories), j + 1:, order[:, j]] = delta
+    # A negative direction starts at the upper end and steps down
+    unit = np.where(sign > 0, start + steps, start + delta - steps)
+    return qmc.scale(unit.reshape(-1, dimension), bounds[:, 0], bounds[:, 1])
+
+def morris_indices(X, Y, bounds, n_bootstrap : int = 1000, confidence : float = 0.95, seed : int = None):
+    """
+    Description
+    -----------
+    Morris elementary-effect statistics of the outputs of a morris_sample,
+    with a bootstrap confidence interval of mu_star
+
+    Parameters
+    ----------
+    X : np.array
+        Rows of morris_sample
+    Y : np.array
+        Outputs of the rows, shape (rows) or (rows x output)
+    bounds : list
+        Bounds used for the sample, the effects are per unit of the normalized input
+    n_bootstrap : int
+        Number of bootstrap resamples
+    confidence : float
+        Confidence level of the interval
+    seed : int
+        Seed of the bootstrap
+
+    Returns
+    -------
+    indices : dict
+        'mu', 'mu_star', 'sigma', 'mu_star low' and 'mu_star high' of shape (dimension) or (dimension x output)
+
+    Notes
+    -----
+    F. Campolongo, J. Cariboni and A. Saltelli, An effective screening design for sensitivity
+    analysis of large models, Environmental Modelling & Software 22 (2007)
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    dimension = len(bounds)
+    Y = np.asarray(Y, dtype=float)
+    single = Y.ndim == 1
+    Y = Y.reshape(-1, dimension + 1, *([1] if single else Y.shape[1:]))
+    unit = ((np.asarray(X, dtype=float) - bounds[:, 0]) / (bounds[:, 1] - bounds[:, 0])).reshape(-1, dimension + 1, dimension)
+
+    # Input changed in every step of every trajectory, and the effect of that step
+    step = np.diff(unit, axis=1)
+    changed = np.argmax(np.abs(step), axis=2)
+    size = np.take_along_axis(step, changed[..., np.newaxis], axis=2)
+    effects = np.diff(Y, axis=1) / size.reshape(size.shape[:2] + (1,) * (Y.ndim - 2))
+    trajectories = len(Y)
+    ordered = np.empty((trajectories, dimension) + Y.shape[2:])
+    ordered[np.arange(trajectories)[:, np.newaxis], changed] = effects
+
+    generator = np.random.default_rng(seed)
+    rows = generator.integers(trajectories, size=(n_bootstrap, trajectories))
+    mu_star_boot = np.mean(np.abs(ordered[rows]), axis=1)
+    quantiles = [(1 - confidence) / 2, (1 + confidence) / 2]
+
+    indices = {"mu" : ordered.mean(axis=0),
+               "mu_star" : np.abs(ordered).mean(axis=0),
+               "sigma" : ordered.std(axis=0, ddof=1)}
+    indices["mu_star low"], indices["mu_star high"] = np.quantile(mu_star_boot, quantiles, axis=0)
+    if single:
+        indices = {name : value[..., 0] for name, value in indices.items()}
+    return indices
@@ -0,0 +1,111 @@
+import copy
+import inspect
+import functools
+import pandas as pd
+from collections import OrderedDict
+from modules.resultStore import (content_hash, code_version, frame_to_arrays, arrays_to_frame, 
+                                 enable_result_store, get_result_store)
+
+# Maximum number of stage results kept in memory
+cache_size = 256
+
+_memory = OrderedDict()
+_stats = {"hits" : 0, "disk hits" : 0, "misses" : 0}
+
+def enable_disk_cache(directory):
+    """
+    Description
+    -----------
+    Also keep the stage results in the result store in directory, so they survive a restart.
+    Same as enable_result_store, use enable_disk_cache(None) to only cache in memory.
+    """
+    enable_result_store(directory)
+
+def clear_stage_cache(disk : bool = False):
+    """
+    Description
+    -----------
+    Empty the in-memory cache, and the stage results in the result store if disk=True
+    """
+    _memory.clear()
+    store = get_result_store()
+    if disk and store is not None:
+        store.clear(kind="stages")
+
+def stage_cache_info():
+    """
+    Description
+    -----------
+    Number of hits, disk hits and misses and the number of results in memory
+    """
+    return dict(_stats, size=len(_memory))
+
+def memoize_stage(function, version = None, file_versions : dict = None):
+    """
+    Description
+    -----------
+    Memoize a module of the interface on exactly the inputs of its signature.
+    Results are stored in a bounded LRU cache (cache_size) keyed on a content hash of the
+    arguments and the source file of the function. DataFrame results are also kept in the 
+    result store when it is enabled (enable_disk_cache or enable_result_store).
+
+    Parameters
+    ----------
+    function : callable
+        Module function, e.g. energy_output
+    version : callable
+        Optional function that returns the version of data files used by the module,
+        e.g. crop_library_version, added to the key
+    file_versions : dict
+        {argument : function} for arguments that are paths to data files. The function returns the version
+        of the file (e.g. weather_version), which is added to the key so an edited file is not served 
+        from the cache. Arguments that are None are skipped
+
+    Returns
+    -------
+    wrapper : callable
+        Function with the same signature that returns a copy of the cached result
+
+    Examples
+    --------
+    >>> cached_economics = memoize_stage(economics)
+    >>> single = cached_economics(area=70000)  # computed
+    >>> single = cached_economics(area=70000)  # from the cache
+    """
+    signature = inspect.signature(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        data_version = None if version is None else version()
+        if file_versions:
+            data_version = (data_version, {name : file_version(bound.arguments[name]) for name, file_version in file_versions.items() 
+                                           if bound.arguments[name] is not None})
+        key = f"{function.__name__}_{content_hash(function.__module__, code_version(function), data_version, bound.arguments)}"
+
+        if key in _memory:
+            _memory.move_to_end(key)
+            _stats["hits"] += 1
+            return copy.deepcopy(_memory[key])
+
+        store = get_result_store()
+        arrays = None if store is None else store.get("stages", key)
+        if arrays is not None:
+            result = arrays_to_frame(arrays)
+            _stats["disk hits"] += 1
+        else:
+            result = function(*args, **kwargs)
+            _stats["misses"] += 1
+            if store is not None and isinstance(result, pd.DataFrame):
+                try:
+                    store.put("stages", key, frame_to_arrays(result))
+                except (ValueError, TypeError):
+                    pass  # Non-numeric results are only cached in memory
+
+        _memory[key] = result
+        while len(_memory) > cache_size:
+            _memory.popitem(last=False)
+        return copy.deepcopy(result)
+
+    return wrapper
@@ -0,0 +1,147 @@
+import numpy as np
+from dataclasses import dataclass
+
+@dataclass
+class SurrogateResult:
+    """
+    Description
+    -----------
+    Result of surrogate_minimize
+
+    Attributes
+    ----------
+    x : np.array
+        Best evaluated point
+    fun : float
+        Objective at x
+    X : np.array
+        All evaluated points (call x dimension), in the order of evaluation
+    y : np.array
+        Objective of all evaluated points
+    """
+    x : np.array
+    fun : float
+    X : np.array
+    y : np.array
+
+def _feasible(points, constraints):
+    """
+    Description
+    -----------
+    Mask of the points (n x dimension) that satisfy all constraints
+    """
+    mask = np.ones(len(points), dtype=bool)
+    for constraint in constraints or []:
+        mask &= np.asarray(constraint(points), dtype=bool)
+    return mask
+
+def surrogate_minimize(func,
+                       bounds,
+                       n_calls : int = 50,
+                       n_initial : int = None,
+                       constraints : list = None,
+                       n_candidates : int = 2000,
+                       seed : int = None,
+                       progress : bool = True):
+    """
+    Description
+    -----------
+    Minimize an expensive function with a radial basis function surrogate (stochastic RBF method).
+    After a Latin hypercube of initial points, every call evaluates the candidate point with the best
+    weighted sum of the surrogate value and the distance to the evaluated points. The weight cycles
+    between exploration and exploitation, candidates are perturbations of the best point and uniform samples.
+
+    Parameters
+    ----------
+    func : callable
+        Objective, called with a point (array of length dimension), returns a float
+    bounds : list
+        (lower, upper) for every dimension
+    n_calls : int
+        Total number of evaluations of func
+    n_initial : int
+        Number of initial Latin hypercube points, defaults to 2 * (dimension + 1)
+    constraints : list
+        Cheap constraints, callables that take points (n x dimension) and return True for feasible points.
+        Only feasible points are evaluated
+    n_candidates : int
+        Number of candidate points per call
+    seed : int
+        Seed of the random generator
+    progress : bool
+        Show a progress bar
+
+    Returns
+    -------
+    result : SurrogateResult
+        Best point and all evaluations
+
+    Raises
+    ------
+    ValueError
+        If no feasible initial points are found
+
+    Notes
+    -----
+    R. G. Regis and C. A. Shoemaker, A Stochastic Radial Basis Function Method for the Global
+    Optimization of Expensive Functions, INFORMS Journal on Computing 19 (2007)
+    """
+    from scipy.stats import qmc
+    from scipy.interpolate import RBFInterpolator
+    from tqdm import tqdm
+    bounds = np.asarray(bounds, dtype=float)
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    dimension = len(bounds)
+    n_initial = min(n_calls, n_initial or 2 * (dimension + 1))
+    generator = np.random.default_rng(seed)
+
+    # The surrogate works on the unit cube
+    scale = lambda unit: lower + unit * (upper - lower)
+    feasible = lambda unit: _feasible(scale(unit), constraints)
+
+    sample = qmc.LatinHypercube(d=dimension, seed=generator).random(20 * n_initial)
+    sample = sample[feasible(sample)][:n_initial]
+    if len(sample) == 0:
+        raise ValueError("No feasible initial points found, check the bounds and constraints")
+
+    X = []
+    y = []
+    bar = tqdm(total=n_calls, disable=not progress)
+    for point in sample:
+        X.append(point)
+        y.append(float(func(scale(point))))
+        bar.update()
+
+    weights = [0.3, 0.5, 0.8, 0.95]
+    sigmas = [0.2, 0.05, 0.01]
+    for call in range(len(X), n_calls):
+        values = np.array(y)
+        # Very large objectives would dominate the surrogate, they are clipped to the median
+        values = np.minimum(values, np.median(values))
+        surrogate = RBFInterpolator(np.array(X), values, kernel='cubic', degree=1, smoothing=1e-10)
+
+        best = np.array(X)[np.argmin(y)]
+        sigma = sigmas[call % len(sigmas)]
+        candidates = np.concatenate([
+            np.clip(best + sigma * generator.standard_normal((n_candidates // 2, dimension)), 0, 1),
+            generator.random((n_candidates - n_candidates // 2, dimension))])
+        candidates = candidates[feasible(candidates)]
+        if len(candidates) == 0:
+            continue
+
+        distance = np.min(np.linalg.norm(candidates[:, np.newaxis] - np.array(X)[np.newaxis], axis=-1), axis=1)
+        prediction = surrogate(candidates)
+        normalize = lambda v: (v - v.min()) / (v.max() - v.min()) if v.max() > v.min() else np.zeros_like(v)
+        weight = weights[call % len(weights)]
+        score = weight * normalize(prediction) + (1 - weight) * (1 - normalize(distance))
+        score[distance < 1e-6] = np.inf
+
+        point = candidates[np.argmin(score)]
+        X.append(point)
+        y.append(float(func(scale(point))))
+        bar.update()
+    bar.close()
+
+    X = scale(np.array(X))
+    y = np.array(y)
+    return SurrogateResult(x = X[np.argmin(y)], fun = float(y.min()), X = X, y = y)
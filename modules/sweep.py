@@ -0,0 +1,174 @@
+import os
+import warnings
+import numpy as np
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from modules.energyOutput import site_weather
+from modules.weather import file_weather
+from modules.agriculture import crop_library
+from modules.profiling import flush_profile
+
+@dataclass
+class SweepResult:
+    """
+    Description
+    -----------
+    Labeled N-dimensional result of a parameter sweep
+
+    Attributes
+    ----------
+    dims : list
+        Names of the swept parameters, in the order of the array axes
+    coords : dict
+        {parameter : np.array} with the values along every axis
+    monthly : dict
+        {column : np.array} of shape (*grid, 12) for the monthly outputs
+    single : dict
+        {column : np.array} of shape (grid) for the single-time outputs
+    """
+    dims : list
+    coords : dict
+    monthly : dict
+    single : dict
+
+def _warm_worker(sites):
+    """
+    Description
+    -----------
+    Initializer of every worker process: imports pvlib, fills the site cache of energy_output
+    and compiles the crop library once, so the points of the worker only do the design dependent work.
+
+    Parameters
+    ----------
+    sites : list
+        List of (latitude, longitude, elevation, weather_file) tuples
+    """
+    crop_library()
+    for latitude, longitude, elevation, weather_file in sites:
+        if weather_file is None:
+            site_weather(latitude, longitude, elevation)
+        else:
+            file_weather(weather_file, latitude, longitude, elevation)
+
+def _run_chunk(func, chunk):
+    """
+    Description
+    -----------
+    Evaluate func for a chunk of sweep points inside a worker.
+    An exception only loses the point that raised it.
+
+    Parameters
+    ----------
+    func : callable
+        Function evaluated for every point, e.g. interface
+    chunk : list
+        List of (index, kwargs) tuples
+
+    Returns
+    -------
+    results : list
+        List of (index, result, error) tuples, result is None if an error occurred
+    """
+    results = []
+    for index, kwargs in chunk:
+        try:
+            results.append((index, func(**kwargs), None))
+        except Exception as error:
+            results.append((index, None, repr(error)))
+    # Stage timings of a worker are only seen by the main process through the profiling directory
+    flush_profile()
+    return results
+
+def run_sweep(func, points, workers : int = None, chunk_size : int = None, progress : bool = True, callback = None):
+    """
+    Description
+    -----------
+    Evaluate func for a list of parameter sets over a pool of processes.
+    The points are sent to the workers in chunks, every worker warms the site cache once.
+
+    Parameters
+    ----------
+    func : callable
+        Function evaluated for every point, must be importable by the workers (e.g. interface)
+    points : list
+        List of keyword argument dictionaries, one per point
+    workers : int
+        Number of processes, defaults to the number of cores.
+        workers=1 runs the sweep in the current process
+    chunk_size : int
+        Number of points per task, defaults to about four tasks per worker
+    progress : bool
+        Show a progress bar
+    callback : callable
+        Called in the current process with (index, result) as soon as a point has finished,
+        e.g. to write the results of a long sweep incrementally
+
+    Returns
+    -------
+    results : list
+        Results of func in the same order as points.
+        Points that failed are None and a warning is given
+
+    Notes
+    -----
+    When a worker process crashes (instead of raising an exception), the pool breaks and all
+    unfinished chunks fail. These chunks are then retried in separate single-process pools, so
+    only the chunk of the crashing worker is lost.
+    On Windows the calling script must be protected by if __name__ == '__main__'.
+    """
+    from tqdm import tqdm
+    points = list(points)
+    results = [None] * len(points)
+    errors = {}
+    if len(points) == 0:
+        return results
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, int(np.ceil(len(points) / (4 * workers))))
+    indexed = list(enumerate(points))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+
+    site_keys = ("latitude", "longitude", "elevation")
+    sites = list(dict.fromkeys(tuple(float(point[key]) for key in site_keys) + (point.get("weather_file"),)
+                               for point in points if all(key in point for key in site_keys)))
+
+    def collect(chunk_results):
+        for index, result, error in chunk_results:
+            results[index] = result
+            if error is not None:
+                errors[index] = error
+            elif callback is not None:
+                callback(index, result)
+
+    if workers == 1:
+        _warm_worker(sites)
+        for chunk in tqdm(chunks, disable=not progress):
+            collect(_run_chunk(func, chunk))
+    else:
+        crashed = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker, initargs=(sites,)) as pool:
+            futures = {pool.submit(_run_chunk, func, chunk): chunk for chunk in chunks}
+            for future in tqdm(as_completed(futures), total=len(futures), disable=not progress):
+                try:
+                    collect(future.result())
+                except BrokenProcessPool:
+                    crashed.append(futures[future])
+
+        # Retry the chunks of the broken pool, each in its own process
+        for i in range(0, len(crashed), workers):
+            pools = [ProcessPoolExecutor(max_workers=1, initializer=_warm_worker, initargs=(sites,))
+                     for _ in crashed[i:i + workers]]
+            futures = {pool.submit(_run_chunk, func, chunk): chunk for pool, chunk in zip(pools, crashed[i:i + workers])}
+            for future, chunk in futures.items():
+                try:
+                    collect(future.result())
+                except BrokenProcessPool:
+                    errors.update({index: "worker process crashed" for index, _ in chunk})
+            for pool in pools:
+                pool.shutdown()
+
+    if errors:
+        first = min(errors)
+        warnings.warn(f"{len(errors)} of {len(points)} sweep points failed and are None, e.g. point {first}: {errors[first]}")
+    return results
@@ -0,0 +1,133 @@
+import os
+import shutil
+import pandas as pd
+
+class TableWriter:
+    """
+    Description
+    -----------
+    Writes a table in parts to a single file, so the finished parts of a long run are on disk
+    when it is interrupted. The format follows the extension of the path:
+    .parquet writes one row group per part (requires pyarrow), any other extension appends CSV rows.
+
+    Parameters
+    ----------
+    path : str
+        Output file, an existing file is overwritten unless append is True
+    append : bool
+        Continue an existing table. A Parquet file can not be extended after it is closed,
+        so in this mode the .parquet path is a directory (dataset) with one file per part,
+        which pandas.read_parquet reads as a single table
+
+    Raises
+    ------
+    ImportError
+        If a Parquet file is requested and pyarrow is not installed
+
+    Examples
+    --------
+    >>> with TableWriter("output/sites.csv") as writer:
+    ...     for part in parts:
+    ...         writer.write(part)
+    """
+    def __init__(self, path : str, append : bool = False):
+        self.path = path
+        self.parquet = os.path.splitext(path)[1].lower() == ".parquet"
+        self.append = append
+        self.columns = None
+        self._writer = None
+        if self.parquet:
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError as error:
+                raise ImportError("Writing Parquet files requires pyarrow, install it or use a .csv file") from error
+            self._pyarrow = pyarrow
+        if not append:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        elif self.parquet:
+            os.makedirs(path, exist_ok=True)
+        elif os.path.exists(path) and os.path.getsize(path) > 0:
+            self.columns = list(pd.read_csv(path, nrows=0).columns)
+
+    def _part(self, number):
+        return os.path.join(self.path, f"part-{number:06d}.parquet")
+
+    def position(self):
+        """
+        Description
+        -----------
+        Amount of data written so far: the size of a CSV file in bytes,
+        or the number of parts of a Parquet dataset (append mode), see truncate
+        """
+        if self.parquet and self.append:
+            return len([name for name in os.listdir(self.path) if name.startswith("part-") and name.endswith(".parquet")])
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def truncate(self, position : int):
+        """
+        Description
+        -----------
+        Remove everything written after position (from an earlier call to position),
+        e.g. a part that was written while a run was interrupted
+        """
+        if self.parquet and self.append:
+            for name in os.listdir(self.path):
+                if name.startswith("part-") and name.endswith(".parquet") and int(name[5:11]) >= position:
+                    os.remove(os.path.join(self.path, name))
+        elif self.parquet:
+            raise ValueError("A Parquet file can only be truncated in append mode")
+        elif os.path.exists(self.path):
+            with open(self.path, "r+b") as file:
+                file.truncate(position)
+            if position == 0:
+                self.columns = None
+
+    def write(self, df : pd.DataFrame):
+        """
+        Description
+        -----------
+        Append the rows of df. The columns of the first part define the table,
+        later parts are aligned to them.
+
+        Returns
+        -------
+        position : int
+            Position after the part, see position
+        """
+        if self.columns is None:
+            self.columns = list(df.columns)
+        df = df.reindex(columns=self.columns)
+        if self.parquet and self.append:
+            # Written under a hidden temporary name, so an interrupted write leaves no broken part
+            number = self.position()
+            temporary = os.path.join(self.path, f".part-{number:06d}.tmp")
+            df.to_parquet(temporary, index=False)
+            os.replace(temporary, self._part(number))
+        elif self.parquet:
+            table = self._pyarrow.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = self._pyarrow.parquet.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+        else:
+            df.to_csv(self.path, mode="a", header=not os.path.exists(self.path) or os.path.getsize(self.path) == 0, index=False)
+        return self.position()
+
+    def close(self):
+        """
+        Description
+        -----------
+        Finish the file, a Parquet file is only readable after it is closed
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
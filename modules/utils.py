@@ -1,11 +1,47 @@
 import subprocess
 import shutil
-import matplotlib.pyplot as plt
-import scienceplots
 import warnings
 import os
+import sys
+import importlib.util
+
+def lazy_import(name):
+    """
+    Description
+    -----------
+    Import a top-level package on first attribute access instead of now,
+    so that e.g. batch workers that never plot do not pay for importing it.
+
+    Parameters
+    ----------
+    name : str
+        Name of the package, e.g. "pvlib"
+
+    Returns
+    -------
+    module : module
+        The package, loaded when one of its attributes is used
+
+    Raises
+    ------
+    ModuleNotFoundError
+        If the package is not installed
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
 
 def plot_style():
+    import matplotlib.pyplot as plt
+    import scienceplots
     plt.style.use(['science', 'ieee'])
 
 def optimize_svg(path):
@@ -14,9 +50,10 @@ def optimize_svg(path):
         subprocess.run([shutil.which("svgo"), path])
 
 def save_plot(path):
+    import matplotlib.pyplot as plt
     if path.split(".")[-1] != 'svg':
         warnings.warn(f"Filepath: {path} doesn't end with .svg and is added in code")
-        path = f"{path}.svg" 
+        path = f"{path}.svg"
 
     plt.tight_layout()
     plt.savefig(path, transparent=True)
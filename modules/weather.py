@@ -0,0 +1,223 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from modules.resultStore import content_hash
+from modules.utils import lazy_import
+from modules.profiling import stage
+
+pvlib = lazy_import("pvlib")
+
+# Columns that are kept from a weather file, in pvlib naming
+weather_columns = ['ghi', 'dni', 'dhi', 'temp_air', 'wind_speed']
+
+def read_weather_file(path : str):
+    """
+    Description
+    -----------
+    Read a local weather file with pvlib (TMY3 or EPW) or pandas (CSV)
+
+    Parameters
+    ----------
+    path : str
+        Path to a .epw, TMY3 .csv or plain .csv file. A plain CSV file has the time in the
+        first column (UTC if no time zone is given) and the columns 'ghi', 'dni', 'dhi' [W/m^2]
+        and optionally 'temp_air' [°C] and 'wind_speed' [m/s]
+
+    Returns
+    -------
+    weather : pd.DataFrame
+        Weather data with the available weather_columns, indexed by time (UTC) in increasing order
+
+    Raises
+    ------
+    ValueError
+        If the file misses one of the irradiance columns
+
+    Notes
+    -----
+    Typical years (TMY3, EPW) combine months of different years, they are coerced to 2023.
+    """
+    if path.lower().endswith(".epw"):
+        data, _ = pvlib.iotools.read_epw(path, coerce_year=2023)
+    else:
+        with open(path, 'r') as file:
+            header = file.readline().split(",")
+        if header[0].strip().isdigit():
+            # TMY3 files start with a line of site metadata (station number, name, ...)
+            data, _ = pvlib.iotools.read_tmy3(path, coerce_year=2023, map_variables=True)
+        else:
+            data = pd.read_csv(path, index_col=0, parse_dates=True)
+
+    missing = [column for column in ['ghi', 'dni', 'dhi'] if column not in data]
+    if missing:
+        raise ValueError(f"Weather file {path} misses the columns {missing}")
+
+    data = data[[column for column in weather_columns if column in data]]
+    if data.index.tz is None:
+        data.index = data.index.tz_localize('UTC')
+    data.index = data.index.tz_convert('UTC')
+    return data.sort_index()
+
+def weather_version(path : str):
+    """
+    Description
+    -----------
+    Hash of the path, size and modification time of a weather file, changes when the file is edited
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    return content_hash(path, stat.st_size, stat.st_mtime_ns)[:16]
+
+def weather_memmap(path : str, cache_directory : str = None):
+    """
+    Description
+    -----------
+    Memory-mapped columns of a weather file. On first use the file is parsed once and every
+    column is written as a float32 .npy file, later calls (and other processes) map the same
+    files without parsing. weather_chunks only reads (and converts) the chunk it yields,
+    file_weather converts the full columns once per process, see its notes.
+
+    Parameters
+    ----------
+    path : str
+        Weather file, see read_weather_file
+    cache_directory : str
+        Directory of the binary files, defaults to .weather_cache next to the weather file
+
+    Returns
+    -------
+    arrays : dict
+        {'times' : int64 nanoseconds since 1970 (UTC), column : float32 array} as read-only memory maps
+    """
+    path = os.path.abspath(path)
+    cache_directory = cache_directory or os.path.join(os.path.dirname(path), ".weather_cache")
+    directory = os.path.join(cache_directory, f"{os.path.basename(path)}_{weather_version(path)}")
+
+    if not os.path.exists(os.path.join(directory, "columns.json")):
+        data = read_weather_file(path)
+        temporary = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(temporary, exist_ok=True)
+        np.save(os.path.join(temporary, "times.npy"), data.index.asi8)
+        for column in data:
+            np.save(os.path.join(temporary, f"{column}.npy"), data[column].to_numpy(dtype=np.float32))
+        with open(os.path.join(temporary, "columns.json"), 'w') as file:
+            json.dump(list(data.columns), file)
+        try:
+            os.rename(temporary, directory)
+        except OSError:
+            # Another process converted the file at the same time
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    with open(os.path.join(directory, "columns.json"), 'r') as file:
+        columns = json.load(file)
+    return {name : np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in ["times"] + columns}
+
+def weather_chunks(path : str, chunk : str = 'MS', start : str = None, end : str = None, cache_directory : str = None):
+    """
+    Description
+    -----------
+    Generator of the weather in a file in chunks of one month (or year), to be used as the weather
+    of energy_output_stream. Only the chunk that is processed is read from the memory map.
+
+    Parameters
+    ----------
+    path : str
+        Weather file, see read_weather_file
+    chunk : str
+        Length of a chunk as a pandas frequency, 'MS' for months or 'YS' for years
+    start : str
+        First timestamp (UTC), defaults to the start of the file
+    end : str
+        End (UTC, not included), defaults to the end of the file
+    cache_directory : str
+        See weather_memmap
+
+    Yields
+    ------
+    weather : pd.DataFrame
+        Chunk with the columns of the weather file, indexed by time (UTC)
+    """
+    arrays = weather_memmap(path, cache_directory)
+    times = arrays["times"]
+    columns = [name for name in arrays if name != "times"]
+
+    first = pd.Timestamp(times[0], tz='UTC') if start is None else pd.Timestamp(start, tz='UTC')
+    last = pd.Timestamp(times[-1], tz='UTC') + pd.Timedelta(1) if end is None else pd.Timestamp(end, tz='UTC')
+    edges = sorted({first, last, *pd.date_range(first, last, freq=chunk)})
+    positions = np.searchsorted(times, [edge.value for edge in edges])
+
+    for a, b in zip(positions[:-1], positions[1:]):
+        if b > a:
+            yield pd.DataFrame({name : np.asarray(arrays[name][a:b], dtype=float) for name in columns},
+                               index=pd.to_datetime(np.asarray(times[a:b]), utc=True))
+
+def file_weather(path : str,
+                 latitude : float = 35,
+                 longitude : float = 15,
+                 elevation : float = 10,
+                 cache_directory : str = None):
+    """
+    Description
+    -----------
+    Site data of energy_output from a weather file instead of the clear-sky model,
+    in the same format as site_weather. Cached like site_weather, on the path and the version
+    of the file (weather_version), so an edited file is read again.
+
+    Parameters
+    ----------
+    path : str
+        Hourly weather file of a single year, see read_weather_file
+    latitude : float
+        Latitude of the farm
+    longitude : float
+        Longitude of the farm
+    elevation : float
+        Elevation of the farm
+    cache_directory : str
+        See weather_memmap
+
+    Returns
+    -------
+    site : dict
+        Dictionary with the keys 'times', 'solpos', 'irradiance', 'dni_extra' and
+        'temp_air' / 'wind_speed' when they are in the file
+
+    Raises
+    ------
+    ValueError
+        If the file is not hourly or covers more than a year, use energy_output_stream with weather_chunks instead
+
+    Notes
+    -----
+    The float32 columns of the memory map are copied to float64 Series, because the model
+    (pvlib and the scalar arithmetic of energy_output) works in float64. The copy is made once per
+    process and file (about 0.4 MB for a year), so the pages of the memory map are only shared
+    while the file is parsed and by weather_chunks.
+    """
+    return _file_weather(path, weather_version(path), latitude, longitude, elevation, cache_directory)
+
+@lru_cache(maxsize=8)
+def _file_weather(path, version, latitude, longitude, elevation, cache_directory):
+    arrays = weather_memmap(path, cache_directory)
+    times = pd.to_datetime(np.asarray(arrays["times"]), utc=True)
+    if len(times) < 2 or np.median(np.diff(times.asi8)) != pd.Timedelta('1h').value:
+        raise ValueError(f"Weather file {path} is not hourly, use energy_output_stream with weather_chunks")
+    if times[-1] - times[0] > pd.Timedelta(days=366):
+        raise ValueError(f"Weather file {path} covers more than a year, use energy_output_stream with weather_chunks")
+
+    location = pvlib.location.Location(latitude, longitude, altitude=elevation)
+    with stage("solar position"):
+        solpos = location.get_solarposition(times)
+    site = {
+        'times' : times,
+        'solpos' : solpos,
+        'irradiance' : pd.DataFrame({column : np.asarray(arrays[column], dtype=float) for column in ['ghi', 'dni', 'dhi']}, index=times),
+        'dni_extra' : pvlib.irradiance.get_extra_radiation(times),
+    }
+    for column in ['temp_air', 'wind_speed']:
+        if column in arrays:
+            site[column] = pd.Series(np.asarray(arrays[column], dtype=float), index=times)
+    return site
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules are imported from the repository root, as in interface.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from modules.agriculture import agricultural, agricultural_batch, compiled_requirements, library_days
+
+irradiation = np.random.default_rng(0).uniform(0, 300, (50, 12))
+
+def _reference(irradiation_crop, min_req_Wm2, max_req_Wm2, dormant):
+    impact = np.zeros(len(irradiation_crop))
+    for i, value in enumerate(irradiation_crop):
+        if dormant[i]:
+            continue
+        if value < min_req_Wm2[i]:
+            impact[i] = value - min_req_Wm2[i]
+        elif value > max_req_Wm2[i]:
+            impact[i] = value - max_req_Wm2[i]
+    return impact
+
+def test_batch_matches_agricultural():
+    impact = agricultural_batch(irradiation, "potatoes")
+    requirements = compiled_requirements("potatoes", 12)
+    for batch, design in zip(impact, irradiation):
+        np.testing.assert_allclose(batch, agricultural("potatoes", design)["Crop impact [W/m^2]"].to_numpy())
+        np.testing.assert_allclose(batch, _reference(design, *requirements))
+
+def test_batch_crop_list():
+    impact = agricultural_batch(irradiation, ["potatoes"])
+    assert impact.shape == (50, 1, 12)
+    np.testing.assert_array_equal(impact[:, 0], agricultural_batch(irradiation, "potatoes"))
+
+def test_batch_daily():
+    # The stages of potatoes start at the first of a month, so a month of constant days equals the monthly impact
+    daily = irradiation[:, library_days.month - 1]
+    impact = agricultural_batch(daily, "potatoes")
+    assert impact.shape == (50, 366)
+    np.testing.assert_allclose(impact, agricultural_batch(irradiation, "potatoes")[:, library_days.month - 1])
+    requirements = compiled_requirements("potatoes", 366)
+    np.testing.assert_allclose(impact[0], _reference(daily[0], *requirements))
+
+    common = library_days != pd.Timestamp("2024-02-29")
+    np.testing.assert_array_equal(agricultural_batch(daily[:, common], "potatoes"), impact[:, common])
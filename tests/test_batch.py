@@ -0,0 +1,38 @@
+import json
+import pandas as pd
+import pytest
+from batch import run_job, read_checkpoint
+
+def _job(tmp_path, axes):
+    job_file = tmp_path / "job.json"
+    job_file.write_text(json.dumps({"base" : {"lifetime" : 25}, "axes" : axes}))
+    return str(job_file)
+
+def test_resume_after_interruption(tmp_path):
+    job_file = _job(tmp_path, {"tilt" : [10, 20, 30], "pitch" : [8, 10]})
+    full = run_job(job_file, output=str(tmp_path / "full.csv"), workers=1, chunk_size=2, progress=False)
+
+    output = run_job(job_file, output=str(tmp_path / "resumed.csv"), workers=1, chunk_size=2, progress=False)
+    # Interrupt during the last chunk: its checkpoint line is incomplete and the output is cut off
+    checkpoint_file = output + ".checkpoint"
+    with open(checkpoint_file) as file:
+        lines = file.readlines()
+    with open(checkpoint_file, "w") as file:
+        file.writelines(lines[:-1])
+        file.write(lines[-1][:10])
+    with open(output, "rb") as file:
+        content = file.read()
+    with open(output, "wb") as file:
+        file.write(content[:-20])
+    _, done, _ = read_checkpoint(checkpoint_file)
+    assert len(done) == 4
+
+    run_job(job_file, output=output, workers=1, chunk_size=2, progress=False)
+    pd.testing.assert_frame_equal(pd.read_csv(output), pd.read_csv(full))
+    assert len(read_checkpoint(checkpoint_file)[1]) == 6
+
+def test_output_of_other_job(tmp_path):
+    output = str(tmp_path / "output.csv")
+    run_job(_job(tmp_path, {"tilt" : [10]}), output=output, workers=1, progress=False)
+    with pytest.raises(ValueError, match="different job"):
+        run_job(_job(tmp_path, {"tilt" : [20]}), output=output, workers=1, progress=False)
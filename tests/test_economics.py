@@ -0,0 +1,42 @@
+import numpy as np
+from scipy.optimize import brentq
+from modules.economics import economics, economics_batch, cash_flow, internal_rate_of_return
+
+area = np.array([2e4, 5e4, 7e4, 1e5])
+coverage = np.array([0.2, 0.3, 0.4, 0.6])
+annual_energy = np.array([3e6, 8e6, 1.2e7, 2.5e7])
+lifetime = np.array([20, 25, 30, 35])
+
+def test_batch_matches_economics():
+    batch = economics_batch(area, coverage, 2.42, annual_energy, 1e5, lifetime)
+    for i in range(len(area)):
+        single = economics(area[i], coverage[i], 2.42, np.full(12, annual_energy[i] / 12), 1e5, lifetime[i])
+        for column, values in batch.items():
+            np.testing.assert_allclose(values[i], single[column].iloc[0], rtol=1e-12)
+
+def test_irr_matches_brentq():
+    single, matrices = cash_flow(area, coverage, 2.42, annual_energy, 0.0, lifetime, return_matrices=True)
+    flows = matrices["Cash flow [EUR]"]
+    years = np.arange(flows.shape[-1])
+    for i, flow in enumerate(flows):
+        reference = brentq(lambda rate: np.sum(flow * (1 + rate) ** -years), -0.99, 1.0, xtol=1e-14)
+        np.testing.assert_allclose(single["IRR"][i], reference, rtol=1e-9)
+        np.testing.assert_allclose(internal_rate_of_return(flow), reference, rtol=1e-9)
+
+def test_irr_without_sign_change():
+    assert np.isnan(internal_rate_of_return([-100.0, -1.0, -1.0]))
+
+def test_discounted_lcoe_matches_lcoe():
+    single = cash_flow(area, coverage, 2.42, annual_energy, 1e5, lifetime,
+                       degradation=0.0, price_escalation=0.0, inverter_cost=0.0)
+    batch = economics_batch(area, coverage, 2.42, annual_energy, 1e5, lifetime)
+    np.testing.assert_allclose(single["Discounted LCOE [EUR/MWh]"], batch["LCOE [EUR/MWh]"], rtol=1e-10)
+
+def test_payback_without_investment():
+    single = cash_flow(annual_energy=1e8, subsidy=[0.0, 1e9])
+    assert single["Payback time [y]"][0] > 0
+    assert single["Payback time [y]"][1] == 0.0
+
+def test_payback_never():
+    single = cash_flow(annual_energy=1.0)
+    assert np.isnan(single["Payback time [y]"])
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from modules.energyOutput import (energy_output, energy_output_batch, energy_output_tracking_batch,
+                                  energy_output_stream, crop_irradiance, energy_output_gradient,
+                                  gradient_parameters, output_columns)
+
+designs = [dict(tilt=0, azimuth=186, pitch=7, height=2.5),
+           dict(tilt=30, azimuth=150, pitch=10, height=3.0)]
+
+columns = {name : [design[name] for design in designs] for name in designs[0]}
+
+def _batch(**kwargs):
+    return energy_output_batch(**columns, **kwargs)
+
+def test_batch_matches_energy_output():
+    monthly = _batch()
+    for design, batch in zip(designs, monthly):
+        np.testing.assert_allclose(batch, energy_output(**design)[output_columns].to_numpy(), rtol=1e-6)
+
+def test_batch_float32():
+    monthly = _batch()
+    compact = _batch(dtype=np.float32)
+    assert compact.dtype == np.float64
+    for batch, reference in zip(compact, monthly):
+        np.testing.assert_allclose(batch, reference, rtol=1e-4, atol=1e-4 * np.abs(reference).max())
+
+def test_tracking_batch_matches_energy_output():
+    max_angle, pitch = [30, 60], [7, 10]
+    monthly = energy_output_tracking_batch(azimuth=180, max_angle=max_angle, pitch=pitch)
+    for i in range(2):
+        single = energy_output(azimuth=180, tilt_tracking=True, max_angle=max_angle[i], pitch=pitch[i])
+        np.testing.assert_allclose(monthly[i], single[output_columns].to_numpy(), rtol=1e-6)
+
+def test_crop_irradiance_matches_batch():
+    crop = _batch()[..., output_columns.index('Irradiation crops [W/m^2]')]
+    np.testing.assert_allclose(crop_irradiance(**columns, interpolate=False), crop, rtol=1e-10)
+    # The tabulated view factor only changes the diffuse part a little
+    np.testing.assert_allclose(crop_irradiance(**columns), crop, rtol=1e-3)
+
+def test_gradient_matches_finite_differences():
+    # A large area, so that the rounding of the number of modules is small compared to a step in pitch and row width
+    values = dict(columns, row_width=np.full(2, 4.0), area=1e7)
+    monthly, gradient = energy_output_gradient(**values)
+    np.testing.assert_allclose(monthly, energy_output_batch(**values), rtol=1e-10)
+    steps = {'tilt' : 1e-2, 'azimuth' : 1e-2, 'pitch' : 1e-2, 'height' : 1e-4, 'row_width' : 1e-2}
+    for i, name in enumerate(gradient_parameters):
+        upper = dict(values, **{name : np.asarray(values[name]) + steps[name]})
+        lower = dict(values, **{name : np.asarray(values[name]) - steps[name]})
+        difference = (energy_output_batch(**upper) - energy_output_batch(**lower)) / (2 * steps[name])
+        for metric in [0, 2]:
+            np.testing.assert_allclose(gradient[..., metric, i], difference[..., metric], rtol=1e-3, 
+                                       atol=1e-3 * np.abs(difference[..., metric]).max())
+
+def test_stream_without_weather_chunks():
+    with pytest.raises(ValueError, match="no chunks"):
+        energy_output_stream(weather=[])
+
+def test_stream_empty_period():
+    with pytest.raises(ValueError, match="no chunks"):
+        energy_output_stream(start="2024-01-01", end="2024-01-01")
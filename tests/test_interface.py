@@ -0,0 +1,44 @@
+import numpy as np
+from interface import interface, evaluate_points, parameter_sweep, site_group, months
+from modules.energyOutput import sites_weather
+from modules.scenario import Scenario
+
+def test_workers_use_precomputed_sites():
+    points = [Scenario(latitude=latitude, longitude=15.0, elevation=10.0, tilt=tilt) for latitude in (40.0, 50.0) for tilt in (10.0, 30.0)]
+    keys = [(40.0, 15.0, 10.0), (50.0, 15.0, 10.0)]
+    sites = dict(zip(keys, sites_weather(*np.array(keys).T)))
+    # Half the irradiance, so results that ignore the precomputed sites differ
+    for site in sites.values():
+        site["irradiance"] = site["irradiance"] / 2
+
+    serial, _ = evaluate_points(points, sites=sites)
+    parallel, _ = evaluate_points(points, workers=2, sites=sites)
+    recomputed, _ = evaluate_points(points, workers=2)
+    for column in serial:
+        np.testing.assert_array_equal(parallel[column], serial[column])
+    assert not np.allclose(recomputed["Energy output [kWh]"], serial["Energy output [kWh]"])
+
+def test_parameter_sweep_matches_interface():
+    result = parameter_sweep({"tilt" : (10, 50, 3), "lifetime" : [20, 30]}, base={"pitch" : 10}, progress=False)
+    assert result.dims == ["tilt", "lifetime"]
+    for i, tilt in enumerate(result.coords["tilt"]):
+        for j, lifetime in enumerate(result.coords["lifetime"]):
+            monthly, single = interface(tilt=tilt, lifetime=lifetime, pitch=10)
+            assert set(monthly.columns) == set(result.monthly) and set(single.columns) == set(result.single)
+            for column in monthly:
+                np.testing.assert_allclose(result.monthly[column][i, j], monthly[column].to_numpy(float), rtol=1e-10)
+            for column in single:
+                np.testing.assert_allclose(result.single[column][i, j], single[column].iloc[0], rtol=1e-10)
+
+def test_site_group_matches_interface():
+    sites = [{"site" : "south", "latitude" : 36.0, "longitude" : 14.5},
+             {"site" : "north", "latitude" : 52.0, "longitude" : 5.0, "elevation" : 0.0}]
+    df = site_group(sites, base={"tilt" : 20})
+    assert list(df["site"]) == ["south", "north"]
+    for i, site in enumerate(sites):
+        monthly, single = interface(tilt=20, **{name : value for name, value in site.items() if name != "site"})
+        for column in monthly:
+            np.testing.assert_allclose(df.loc[i, [f"{column} {month}" for month in months]].to_numpy(float),
+                                       monthly[column].to_numpy(float), rtol=1e-10)
+        for column in single:
+            np.testing.assert_allclose(df.loc[i, column], single[column].iloc[0], rtol=1e-10)
@@ -0,0 +1,12 @@
+from interface import interface
+from modules.profiling import disable_profiling, profile_summary, stages
+
+def test_measure_time_records_stages(capsys):
+    disable_profiling()
+    interface(latitude=41.5, measure_time=True)
+    summary = profile_summary()
+    disable_profiling()
+    assert capsys.readouterr().out == ""
+    assert set(summary.index) <= set(stages)
+    assert (summary["Calls"] == 1).all()
+    assert {"POA", "PVWatts", "agriculture", "economics"} <= set(summary.index)
@@ -0,0 +1,34 @@
+import os
+import numpy as np
+import pandas as pd
+from modules.resultStore import ResultStore, frame_to_arrays, arrays_to_frame, prune_fraction
+
+def test_frame_survives_store(tmp_path):
+    store = ResultStore(str(tmp_path))
+    frames = [pd.DataFrame({"LCOE [EUR/MWh]" : [69.9], "ROI" : [5.6]}),
+              pd.DataFrame({"Energy output [kWh]" : np.arange(12.0), "Count" : np.arange(12)},
+                           index=["January", "February", "March", "April", "May", "June", "July",
+                                  "August", "September", "October", "November", "December"])]
+    for i, df in enumerate(frames):
+        store.put("stages", str(i), frame_to_arrays(df))
+        pd.testing.assert_frame_equal(arrays_to_frame(store.get("stages", str(i))), df)
+    assert arrays_to_frame(store.get("stages", "0")).loc[0, "ROI"] == 5.6
+
+def test_overwrite_does_not_grow_size(tmp_path):
+    store = ResultStore(str(tmp_path))
+    for _ in range(5):
+        store.put("designs", "key", {"monthly" : np.zeros(1000)})
+    assert store._bytes == store.size()
+
+def test_prune_to_low_water_mark(tmp_path):
+    entry = {"monthly" : np.zeros(1000)}
+    ResultStore(str(tmp_path / "probe")).put("designs", "key", entry)
+    size = os.path.getsize(tmp_path / "probe" / "designs" / "key.npz")
+    store = ResultStore(str(tmp_path / "store"), max_bytes=10 * size)
+    for i in range(11):
+        store.put("designs", str(i), entry)
+    assert store.size() <= prune_fraction * store.max_bytes
+    # The next puts fit below max_bytes again without pruning
+    remaining = len(store.index())
+    store.put("designs", "new", entry)
+    assert len(store.index()) == remaining + 1
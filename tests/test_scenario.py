@@ -0,0 +1,14 @@
+import pytest
+from modules.scenario import Scenario, positive_inputs
+
+@pytest.mark.parametrize("name", positive_inputs)
+def test_zero_is_rejected(name):
+    with pytest.raises(ValueError, match=rf"{name} = 0.0 is outside the range \(0"):
+        Scenario(**{name : 0})
+
+def test_zero_is_allowed_for_inclusive_limits():
+    assert Scenario(tilt=0, height=0).tilt == 0.0
+
+def test_pitch_larger_than_row_width():
+    with pytest.raises(ValueError, match="must be larger than the row width"):
+        Scenario(row_width=5, pitch=5)
@@ -0,0 +1,68 @@
+import pandas as pd
+from modules.stageCache import memoize_stage, clear_stage_cache, stage_cache_info, enable_disk_cache
+
+calls = []
+
+def monthly(value = 1.0):
+    calls.append(value)
+    return pd.DataFrame({"Energy output [kWh]" : [value, 2 * value]})
+
+def _counted(cached, *args, **kwargs):
+    before = stage_cache_info()
+    result = cached(*args, **kwargs)
+    after = stage_cache_info()
+    return result, {name : after[name] - before[name] for name in ("hits", "disk hits", "misses")}
+
+def test_hit_returns_copy():
+    clear_stage_cache()
+    calls.clear()
+    cached = memoize_stage(monthly)
+    first, counts = _counted(cached, 3.0)
+    assert counts == {"hits" : 0, "disk hits" : 0, "misses" : 1}
+    first.iloc[0, 0] = -1.0
+    # Keyword and positional calls share the key, the cached result is not modified by the caller
+    second, counts = _counted(cached, value=3.0)
+    assert counts == {"hits" : 1, "disk hits" : 0, "misses" : 0}
+    assert second.iloc[0, 0] == 3.0
+    assert calls == [3.0]
+
+def test_version_change_invalidates():
+    clear_stage_cache()
+    calls.clear()
+    version = ["a"]
+    cached = memoize_stage(monthly, version=lambda: version[0])
+    cached()
+    cached()
+    version[0] = "b"
+    _, counts = _counted(cached)
+    assert counts["misses"] == 1
+    assert calls == [1.0, 1.0]
+
+def test_file_version_change_invalidates(tmp_path):
+    clear_stage_cache()
+    path = tmp_path / "weather.csv"
+    path.write_text("1")
+
+    def read(weather_file = None):
+        return pd.DataFrame({"Value" : [float(open(weather_file).read())]})
+
+    cached = memoize_stage(read, file_versions={"weather_file" : lambda name: open(name).read()})
+    assert cached(str(path)).iloc[0, 0] == 1.0
+    path.write_text("2")
+    assert cached(str(path)).iloc[0, 0] == 2.0
+
+def test_disk_hit(tmp_path):
+    clear_stage_cache()
+    calls.clear()
+    enable_disk_cache(str(tmp_path))
+    try:
+        cached = memoize_stage(monthly)
+        expected = cached(5.0)
+        clear_stage_cache()
+        result, counts = _counted(cached, 5.0)
+        assert counts["disk hits"] == 1
+        pd.testing.assert_frame_equal(result, expected)
+        assert calls == [5.0]
+    finally:
+        enable_disk_cache(None)
+        clear_stage_cache()
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from modules.surrogate import surrogate_minimize
+
+bounds = [(0, 60), (90, 270)]
+
+def quadratic(x):
+    return (x[0] - 25) ** 2 + 0.1 * (x[1] - 180) ** 2
+
+def test_finds_minimum():
+    result = surrogate_minimize(quadratic, bounds, n_calls=40, seed=0, progress=False)
+    assert len(result.y) == 40
+    assert result.fun == result.y.min() == quadratic(result.x)
+    np.testing.assert_allclose(result.x, [25, 180], atol=2)
+
+def test_constraints():
+    # The unconstrained minimum is infeasible, the minimum lies on the constraint tilt <= 20
+    result = surrogate_minimize(quadratic, bounds, n_calls=30, constraints=[lambda X: X[:, 0] <= 20], seed=0, progress=False)
+    assert np.all(result.X[:, 0] <= 20)
+    np.testing.assert_allclose(result.x, [20, 180], atol=2)
+
+def test_no_feasible_points():
+    with pytest.raises(ValueError, match="No feasible"):
+        surrogate_minimize(quadratic, bounds, constraints=[lambda X: X[:, 0] < 0], progress=False)